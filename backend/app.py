@@ -1,5 +1,6 @@
 from flask import Flask
 from flask_cors import CORS
+import storage
 from routes import api
 
 
@@ -12,9 +13,14 @@ def create_app():
     # Register blueprints
     app.register_blueprint(api, url_prefix='/api')
 
+    # Evict idle rooms in the background
+    storage.start_reaper()
+
     return app
 
 
 if __name__ == '__main__':
     app = create_app()
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # The reloader would run this module in a second process, and both would
+    # open the same journal when AVALON_STORAGE is memory:///path
+    app.run(host='0.0.0.0', port=5000, debug=True, threaded=True, use_reloader=False)
@@ -0,0 +1,338 @@
+"""
+Asyncio-native serving mode for the API. Needs an ASGI server, which is not
+in requirements.txt (e.g. ``pip install uvicorn``):
+
+    uvicorn --factory asgi:create_asgi_app --host 0.0.0.0 --port 5000
+
+Serves the same /api routes, with the same JSON, on the same storage as the
+threaded Flask server. Long-poll (/wait) and event stream (/events) requests
+run on the event loop: an idle client is a suspended coroutine instead of a
+parked thread, so one process can hold tens of thousands of them. Storage
+change listeners wake exactly the coroutines watching a room. Every other
+route is handed to the Flask app on a small thread pool, so there is one
+implementation of each endpoint.
+
+Storage reads on the async paths are in-memory lookups or single indexed
+SQLite queries, so they run directly on the loop. Backends shared between
+processes (those defining WAIT_POLL_SECONDS) only report this process's
+changes, so waiters also re-check at that interval.
+
+Bridged requests count towards the server load that paces pollers (see
+pacing.py) from the moment they arrive, time queued for a thread included,
+and the loop's own lag is sampled every LOOP_LAG_PROBE_SECONDS.
+"""
+import asyncio
+import io
+import math
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+import metrics
+import pacing
+import response_cache
+import storage
+from app import create_app
+from routes import HEARTBEAT_SECONDS, MAX_WAIT_SECONDS, _room_etag, _room_event
+
+# Threads running the Flask app for every route not served natively.
+WSGI_THREADS = 16
+
+# How often the event loop's scheduling lag is measured.
+LOOP_LAG_PROBE_SECONDS = 0.5
+
+_NATIVE_ROUTE = re.compile(r'^/api/rooms/([^/]+)/(wait|events)$')
+
+
+def _query_arg(query, name, default, type):
+    """First value of a query parameter converted with `type`, like Flask's request.args.get."""
+    try:
+        return type(query[name][0])
+    except (KeyError, ValueError):
+        return default
+
+
+class AsgiApp:
+    """ASGI application wrapping the Flask app built by create_app()."""
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.executor = ThreadPoolExecutor(WSGI_THREADS, thread_name_prefix='wsgi')
+        self.poll_seconds = getattr(storage.backend, 'WAIT_POLL_SECONDS', None)
+        self.loop = None
+        self.changed = {}  # room_code -> asyncio.Event set on its next change
+        self.lag_probe = None
+        storage.add_room_changed_listener(self._room_changed)
+        storage.add_room_removed_listener(self._room_changed)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            self.loop = asyncio.get_running_loop()
+            match = _NATIVE_ROUTE.match(scope['path'])
+            if match and scope['method'] == 'GET':
+                handler = self._wait if match.group(2) == 'wait' else self._events
+                await self._until_disconnect(receive, handler(scope, send, match.group(1)))
+            else:
+                await self._wsgi(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self.loop = asyncio.get_running_loop()
+                self.lag_probe = asyncio.ensure_future(self._probe_loop_lag())
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.lag_probe.cancel()
+                self.loop = None
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _probe_loop_lag(self):
+        while True:
+            scheduled = self.loop.time() + LOOP_LAG_PROBE_SECONDS
+            await asyncio.sleep(LOOP_LAG_PROBE_SECONDS)
+            pacing.report_loop_lag(max(self.loop.time() - scheduled, 0.0))
+
+    # Change notification
+
+    def _room_changed(self, room_code):
+        """Storage listener; runs on whichever thread changed the room."""
+        loop = self.loop
+        if loop is not None and room_code in self.changed:
+            loop.call_soon_threadsafe(self._wake, room_code)
+
+    def _wake(self, room_code):
+        event = self.changed.pop(room_code, None)
+        if event:
+            event.set()
+
+    async def _wait_for_change(self, room_code, since, timeout):
+        """Async twin of storage.wait_for_change."""
+        deadline = self.loop.time() + timeout
+        room_id = None
+        while True:
+            # Subscribe before reading so a change in between still wakes us
+            event = self.changed.get(room_code)
+            if event is None:
+                event = self.changed[room_code] = asyncio.Event()
+
+            room = storage.get_room(room_code)
+            if not room or room_id not in (None, room.id):
+                return None
+            room_id = room.id
+            remaining = deadline - self.loop.time()
+            if room.version > since or remaining <= 0:
+                return room
+
+            if self.poll_seconds:
+                remaining = min(remaining, self.poll_seconds)
+            try:
+                await asyncio.wait_for(event.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _until_disconnect(self, receive, handler):
+        """Run `handler`, cancelling it if the client goes away first."""
+        task = asyncio.ensure_future(handler)
+
+        async def watch():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+            task.cancel()
+
+        watcher = asyncio.ensure_future(watch())
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        finally:
+            watcher.cancel()
+
+    # Native routes
+
+    async def _send(self, send, status, body=b'', headers=()):
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'access-control-allow-origin', b'*'), *headers]
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def _send_json(self, send, status, data, etag=None):
+        with self.flask_app.app_context():
+            body = self.flask_app.json.response(data).get_data()
+        headers = [(b'content-type', b'application/json')]
+        if etag:
+            headers.append((b'etag', f'"{etag}"'.encode()))
+        await self._send(send, status, body, headers)
+
+    async def _wait(self, scope, send, room_code):
+        """Same contract as routes.wait_for_room."""
+        started = time.perf_counter()
+        status = 499  # client went away before we answered
+        try:
+            query = parse_qs(scope['query_string'].decode('latin-1'))
+            since = _query_arg(query, 'since', None, int)
+            timeout = _query_arg(query, 'timeout', 25, float)
+            # NaN passes through min/max and would make the wait never time out
+            if not math.isfinite(timeout):
+                status = 400
+                return await self._send_json(send, status, {'error': 'timeout must be a finite number'})
+            timeout = min(max(timeout, 0), MAX_WAIT_SECONDS)
+
+            if since is None:
+                room = storage.get_room(room_code)
+            else:
+                room = await self._wait_for_change(room_code, since, timeout)
+            if not room:
+                status = 404
+                return await self._send_json(send, status, {'error': 'Room not found'})
+
+            etag = _room_etag(room)
+            if since is not None and room.version <= since:
+                status = 304
+                return await self._send(send, status, headers=[(b'etag', f'"{etag}"'.encode())])
+
+            cached = response_cache.room_json(room_code, room)
+            if not cached:
+                status = 404
+                return await self._send_json(send, status, {'error': 'Room not found'})
+            status = 200
+            await self._send(send, status, b'{"room":' + cached[2] + b'}', [
+                (b'content-type', b'application/json'),
+                (b'etag', f'"{cached[0]}-{cached[1]}"'.encode())
+            ])
+
+        except Exception as e:
+            status = 500
+            await self._send_json(send, status, {'error': str(e)})
+        finally:
+            metrics.record('GET', '/api/rooms/<room_code>/wait', status, time.perf_counter() - started)
+
+    async def _events(self, scope, send, room_code):
+        """Same contract as routes.room_events."""
+        started = time.perf_counter()
+        if not storage.get_room(room_code):
+            metrics.record('GET', '/api/rooms/<room_code>/events', 404, time.perf_counter() - started)
+            return await self._send_json(send, 404, {'error': 'Room not found'})
+
+        headers = dict(scope['headers'])
+        try:
+            version = int(headers.get(b'last-event-id', b''))
+        except ValueError:
+            version = None
+
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'access-control-allow-origin', b'*'),
+                (b'content-type', b'text/event-stream; charset=utf-8'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no')
+            ]
+        })
+        metrics.record('GET', '/api/rooms/<room_code>/events', 200, time.perf_counter() - started)
+
+        event_name = b'snapshot' if version is None else b'change'
+        while True:
+            if version is None:
+                room = storage.get_room(room_code)
+            else:
+                room = await self._wait_for_change(room_code, version, HEARTBEAT_SECONDS)
+            if not room:
+                await send({'type': 'http.response.body', 'body': b'event: gone\ndata: {}\n\n'})
+                return
+            if version is not None and room.version <= version:
+                await send({'type': 'http.response.body', 'body': b': heartbeat\n\n', 'more_body': True})
+                continue
+
+            event = _room_event(room_code)
+            if not event:
+                continue
+            version, data = event
+            body = b'id: %d\nevent: %s\n' % (version, event_name) + data
+            await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+            event_name = b'change'
+
+    # Everything else goes through Flask
+
+    async def _wsgi(self, scope, receive, send):
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+
+        environ = self._environ(scope, bytes(body))
+        environ['avalon.counted'] = True
+        pacing.request_started()
+        try:
+            status, headers, payload = await self.loop.run_in_executor(self.executor, self._call_flask, environ)
+        finally:
+            pacing.request_finished()
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+        })
+        await send({'type': 'http.response.body', 'body': payload})
+
+    def _call_flask(self, environ):
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = headers
+
+        iterable = self.flask_app(environ, start_response)
+        try:
+            payload = b''.join(iterable)
+        finally:
+            if hasattr(iterable, 'close'):
+                iterable.close()
+        return response['status'], response['headers'], payload
+
+    @staticmethod
+    def _environ(scope, body):
+        server_name, server_port = scope.get('server') or ('localhost', 80)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode().decode('latin-1'),
+            'PATH_INFO': scope['path'].encode().decode('latin-1'),
+            'QUERY_STRING': scope['query_string'].decode('latin-1'),
+            'SERVER_NAME': server_name,
+            'SERVER_PORT': str(server_port),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False
+        }
+        for name, value in scope['headers']:
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name == 'CONTENT_TYPE':
+                environ['CONTENT_TYPE'] = value
+            elif name != 'CONTENT_LENGTH':
+                key = f'HTTP_{name}'
+                environ[key] = f'{environ[key]},{value}' if key in environ else value
+        return environ
+
+
+def create_asgi_app():
+    return AsgiApp(create_app())
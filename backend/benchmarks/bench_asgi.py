@@ -0,0 +1,193 @@
+"""
+Compare the threaded Flask server with the ASGI serving mode.
+
+Starts each server in a subprocess on the memory backend and measures:
+
+- request throughput and latency for GET /api/rooms/<code> from a few
+  keep-alive client threads;
+- holding N idle long-poll connections: server RSS and thread count while
+  they wait, then how long it takes to answer all of them after one change.
+
+The ASGI side needs uvicorn (pip install uvicorn) and is skipped without it.
+
+Usage: python benchmarks/bench_asgi.py [--idle 1000 5000] [--servers asgi]
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVERS = {
+    'flask': [sys.executable, '-c',
+              'import sys; from app import create_app; '
+              'create_app().run(host="127.0.0.1", port=int(sys.argv[1]), threaded=True)'],
+    'asgi': [sys.executable, '-m', 'uvicorn', '--factory', 'asgi:create_asgi_app',
+             '--host', '127.0.0.1', '--log-level', 'warning', '--backlog', '4096', '--port']
+}
+
+CLIENT_THREADS = 8
+REQUESTS_PER_THREAD = 1_000
+CONNECT_CONCURRENCY = 200
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(kind):
+    port = free_port()
+    env = dict(os.environ, AVALON_STORAGE='memory')
+    process = subprocess.Popen(SERVERS[kind] + [str(port)], cwd=BACKEND_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.2):
+                return process, port
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f'{kind} server did not start')
+
+
+def process_status(pid):
+    """(RSS in MB, thread count) from /proc."""
+    rss = threads = None
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                rss = int(line.split()[1]) / 1024
+            elif line.startswith('Threads:'):
+                threads = int(line.split()[1])
+    return rss, threads
+
+
+def api(port, method, path, body=None):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    conn.request(method, '/api' + path, body=json.dumps(body) if body is not None else None,
+                 headers={'Content-Type': 'application/json'})
+    response = conn.getresponse()
+    data = json.loads(response.read() or 'null')
+    conn.close()
+    return response.status, data
+
+
+def throughput(port, room_code):
+    latencies = []
+    lock = threading.Lock()
+
+    def worker():
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        mine = []
+        for _ in range(REQUESTS_PER_THREAD):
+            start = time.perf_counter()
+            conn.request('GET', f'/api/rooms/{room_code}')
+            response = conn.getresponse()
+            response.read()
+            mine.append(time.perf_counter() - start)
+            if response.getheader('Connection', '').lower() == 'close' or response.version == 10:
+                conn.close()
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=worker) for _ in range(CLIENT_THREADS)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return len(latencies) / elapsed, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)]
+
+
+async def idle_long_polls(port, pid, room_code, since, count):
+    """Park `count` long-polls, wake them all with one change, time the wake-up."""
+    request = (f'GET /api/rooms/{room_code}/wait?since={since}&timeout=30 HTTP/1.1\r\n'
+               f'Host: 127.0.0.1\r\nConnection: close\r\n\r\n').encode()
+    limit = asyncio.Semaphore(CONNECT_CONCURRENCY)
+    connections = []
+
+    async def open_one():
+        async with limit:
+            try:
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            except OSError:
+                return
+            writer.write(request)
+            await writer.drain()
+            connections.append((reader, writer))
+
+    await asyncio.gather(*(open_one() for _ in range(count)))
+    await asyncio.sleep(2)
+    rss, threads = process_status(pid)
+
+    async def read_one(reader, writer):
+        try:
+            status_line = await asyncio.wait_for(reader.readline(), 40)
+            await reader.read()
+            return status_line.split(b' ')[1:2] == [b'200']
+        except (OSError, asyncio.TimeoutError, IndexError):
+            return False
+        finally:
+            writer.close()
+
+    readers = [asyncio.ensure_future(read_one(r, w)) for r, w in connections]
+    start = time.perf_counter()
+    await asyncio.get_running_loop().run_in_executor(
+        None, api, port, 'POST', f'/rooms/{room_code}/join', {'player_name': f'late-{count}'})
+    results = await asyncio.gather(*readers)
+    return len(connections), sum(results), time.perf_counter() - start, rss, threads
+
+
+def bench(kind, idle_counts):
+    process, port = start_server(kind)
+    try:
+        status, data = api(port, 'POST', '/rooms', {'player_name': 'host'})
+        room_code = data['room']['room_code']
+        rate, p50, p99 = throughput(port, room_code)
+        print(f'{kind:>6} GET room: {rate:8.0f} req/s  p50 {p50 * 1000:6.2f} ms  p99 {p99 * 1000:6.2f} ms')
+
+        baseline_rss, baseline_threads = process_status(process.pid)
+        print(f'{kind:>6} idle server: {baseline_rss:7.1f} MB RSS, {baseline_threads} threads')
+        for count in idle_counts:
+            _, room = api(port, 'GET', f'/rooms/{room_code}')
+            since = room['room']['version']
+            opened, answered, wake, rss, threads = asyncio.run(
+                idle_long_polls(port, process.pid, room_code, since, count))
+            print(f'{kind:>6} {count:>6} idle long-polls: {opened} held, {rss:7.1f} MB RSS, '
+                  f'{threads:>6} threads, {answered} answered {wake * 1000:8.1f} ms after change')
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Threaded Flask vs ASGI serving mode')
+    parser.add_argument('--idle', type=int, nargs='+', default=[1000, 5000],
+                        help='idle long-poll connection counts to try')
+    parser.add_argument('--servers', nargs='+', choices=list(SERVERS), default=list(SERVERS))
+    args = parser.parse_args()
+
+    for kind in args.servers:
+        if kind == 'asgi':
+            try:
+                import uvicorn  # noqa: F401
+            except ImportError:
+                print('  asgi: skipped, uvicorn is not installed')
+                continue
+        bench(kind, args.idle)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""
+Compare full room responses with delta responses for a 10-player room.
+
+A poller that last saw the room one selection ago asks for it either in full
+(GET /api/rooms/<code>) or as a delta (?since=<version>). Prints response size
+and time per request for both.
+
+Usage: python benchmarks/bench_deltas.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import storage  # noqa: E402
+from app import create_app  # noqa: E402
+
+REQUESTS = 5_000
+
+
+def main():
+    storage.reset()
+    client = create_app().test_client()
+    data = client.post('/api/rooms', json={'player_name': 'host'}).get_json()
+    room_code = data['room']['room_code']
+    player_ids = [data['player']['id']]
+    for i in range(9):
+        data = client.post(f'/api/rooms/{room_code}/join', json={'player_name': f'player-{i}'}).get_json()
+        player_ids.append(data['player']['id'])
+    client.post(f'/api/players/{player_ids[0]}/select-character', json={'character': 'Merlin'})
+    version = client.get(f'/api/rooms/{room_code}').get_json()['room']['version']
+
+    paths = {
+        'full': f'/api/rooms/{room_code}',
+        'delta': f'/api/rooms/{room_code}?since={version - 1}'
+    }
+    print(f"{'response':>10} {'bytes':>8} {'us/request':>12}")
+    for name, path in paths.items():
+        size = len(client.get(path).data)
+        seconds = timeit.timeit(lambda: client.get(path), number=REQUESTS)
+        print(f'{name:>10} {size:>8} {seconds / REQUESTS * 1e6:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Benchmark room directory pages as the number of live rooms grows, against
+the full scan of storage.rooms that listing would otherwise take.
+
+A quarter of the rooms are in character selection, so 'waiting' pages skip
+past rooms that moved on; a third have the host alone, which min_players=2
+filters out.
+
+Usage: python benchmarks/bench_directory.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import memory_storage as storage  # noqa: E402
+
+ROOM_COUNTS = [1_000, 10_000, 100_000]
+PAGES = 2_000
+
+
+def populate(room_count):
+    storage.reset()
+    for i in range(room_count):
+        room, host = storage.create_room(f'host-{i}')
+        if i % 3:
+            storage.join_room(room.room_code, 'player')
+        if i % 4 == 0:
+            storage.configure_room(room.room_code, host.id, [])
+
+
+def scan(min_players):
+    """The full-scan listing the directory replaces."""
+    return [room for room in list(storage.rooms.values())
+            if room.status == 'waiting' and room.player_count >= min_players][:20]
+
+
+def main():
+    print(f"{'rooms':>8} {'first page us':>14} {'mid page us':>12} {'min_players=2 us':>17} {'full scan us':>13}")
+    for room_count in ROOM_COUNTS:
+        populate(room_count)
+        middle = storage.list_rooms('waiting', cursor=room_count // 2)['next_cursor']
+
+        def per_page(run, number=PAGES):
+            return timeit.timeit(run, number=number) / number * 1e6
+
+        first = per_page(lambda: storage.list_rooms('waiting'))
+        mid = per_page(lambda: storage.list_rooms('waiting', cursor=middle))
+        filtered = per_page(lambda: storage.list_rooms('waiting', min_players=2))
+        full = per_page(lambda: scan(2), number=max(PAGES * 1_000 // room_count, 5))
+        print(f'{room_count:>8} {first:>14.1f} {mid:>12.1f} {filtered:>17.1f} {full:>13.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""
+Measure what journaling costs the in-memory backend and how fast it restores.
+
+1. Mutation throughput from several threads playing room lifecycles, purely
+   in memory and with the journal on, alternating rounds and keeping the
+   best of each.
+2. Restore time for --rooms rooms of 7 players, in a fresh process, from a
+   snapshot alone and from a snapshot plus a journal tail, best of three.
+
+Usage: python benchmarks/bench_journal.py [--rooms 100000]
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import memory_storage as storage  # noqa: E402
+
+THREADS = 4
+ROOMS_PER_THREAD = 1_000
+ROUNDS = 3
+ROLES = ['Merlin', 'Assassin', 'Loyal Servant', 'Loyal Servant', 'Minion of Mordred']
+
+RESTORE = '''
+import sys, time
+sys.path.insert(0, {backend!r})
+import memory_storage
+start = time.perf_counter()
+memory_storage.open_journal({directory!r})
+print(time.perf_counter() - start, memory_storage.count_rooms(), len(memory_storage.players))
+'''
+
+
+def play_rooms(count):
+    """Full lifecycles; returns how many mutations were made."""
+    mutations = 0
+    for i in range(count):
+        room, host = storage.create_room('host')
+        code = room.room_code
+        ids = [host.id]
+        for j in range(4):
+            ids.append(storage.join_room(code, f'player-{j}')[1].id)
+        storage.configure_room(code, host.id, [])
+        for pid, role in zip(ids, ROLES):
+            storage.select_character(pid, role)
+        storage.start_game(code, host.id)
+        for pid in ids:
+            storage.leave_room(code, pid)
+        mutations += 17
+    return mutations
+
+
+def throughput():
+    threads = [threading.Thread(target=play_rooms, args=(ROOMS_PER_THREAD,)) for _ in range(THREADS)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return THREADS * ROOMS_PER_THREAD * 17 / (time.perf_counter() - start)
+
+
+def populate(room_count):
+    for i in range(room_count):
+        room, host = storage.create_room('host')
+        for j in range(6):
+            storage.join_room(room.room_code, f'player-{j}')
+
+
+def restore(directory):
+    """Best restore time over ROUNDS, each from a fresh copy since restoring compacts."""
+    runs = []
+    for _ in range(ROUNDS):
+        copy = directory + '-copy'
+        shutil.copytree(directory, copy)
+        try:
+            script = RESTORE.format(backend=BACKEND_DIR, directory=copy)
+            output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True,
+                                    check=True).stdout
+        finally:
+            shutil.rmtree(copy)
+        seconds, rooms, players = output.split()
+        runs.append((float(seconds), int(rooms), int(players)))
+    return min(runs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Journal overhead and restore time')
+    parser.add_argument('--rooms', type=int, default=100_000, help='rooms to restore')
+    args = parser.parse_args()
+    directory = tempfile.mkdtemp(prefix='avalon-journal-')
+
+    try:
+        storage.open_journal(directory)
+        journal = storage._journal
+        plain = journaled = 0
+        for _ in range(ROUNDS):
+            storage._journal = None
+            plain = max(plain, throughput())
+            storage._journal = journal
+            journaled = max(journaled, throughput())
+        print(f'{"in memory":>22}: {plain:10.0f} mutations/s')
+        print(f'{"journaled":>22}: {journaled:10.0f} mutations/s ({(plain / journaled - 1) * 100:.1f}% slower)')
+
+        storage.reset()
+        populate(args.rooms)
+        storage._journal.compact()
+        storage._journal.close()
+        size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+        seconds, rooms, players = restore(directory)
+        print(f'{"restore from snapshot":>22}: {seconds:8.3f} s for {rooms} rooms, {players} players '
+              f'({size / 1e6:.1f} MB on disk)')
+
+        # Leave a journal tail behind the snapshot
+        subprocess.run([sys.executable, '-c', (
+            f'import sys; sys.path.insert(0, {BACKEND_DIR!r}); import memory_storage as m; '
+            f'm.open_journal({directory!r}); m._journal.compact(); '
+            f'[m.join_room(code, "late") for code in list(m.rooms)[:{args.rooms // 10}]]'
+        )], check=True)
+        seconds, rooms, players = restore(directory)
+        print(f'{"snapshot + journal":>22}: {seconds:8.3f} s for {rooms} rooms, {players} players')
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
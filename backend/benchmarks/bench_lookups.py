@@ -0,0 +1,48 @@
+"""
+Benchmark player -> room lookups as the number of live rooms grows.
+
+Usage: python benchmarks/bench_lookups.py
+"""
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import memory_storage as storage  # noqa: E402
+
+ROOM_COUNTS = [10, 100, 1_000, 10_000, 100_000]
+PLAYERS_PER_ROOM = 5
+LOOKUPS = 20_000
+
+
+def populate(room_count):
+    storage.reset()
+    player_ids = []
+    for i in range(room_count):
+        room, host = storage.create_room(f'host-{i}')
+        player_ids.append(host.id)
+        for j in range(PLAYERS_PER_ROOM - 1):
+            _, player, _ = storage.join_room(room.room_code, f'player-{j}')
+            player_ids.append(player.id)
+    return player_ids
+
+
+def main():
+    print(f"{'rooms':>8} {'get_room_by_player_id':>24} {'select_character':>18}")
+    for room_count in ROOM_COUNTS:
+        player_ids = populate(room_count)
+        sample = random.choices(player_ids, k=LOOKUPS)
+        for room in storage.rooms.values():
+            room.status = 'character_selection'
+
+        lookup = timeit.timeit(lambda: [storage.get_room_by_player_id(pid) for pid in sample], number=1)
+        select = timeit.timeit(lambda: [storage.select_character(pid, 'Loyal Servant') for pid in sample], number=1)
+
+        print(f'{room_count:>8} {lookup / LOOKUPS * 1e9:>21.0f} ns {select / LOOKUPS * 1e9:>15.0f} ns')
+    storage.reset()
+
+
+if __name__ == '__main__':
+    main()
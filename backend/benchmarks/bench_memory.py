@@ -0,0 +1,106 @@
+"""
+Measure memory per room and per player with tracemalloc.
+
+Compares the dict layout storage used to keep (string keys, ISO-8601
+timestamp strings, a duplicated player_count) with the slotted records in
+records.py, and reports the full footprint of memory_storage including its
+indexes, locks and expiry bookkeeping.
+
+Usage: python benchmarks/bench_memory.py
+"""
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import memory_storage as storage  # noqa: E402
+from records import Player, Room, intern_role  # noqa: E402
+
+ROOMS = 20_000
+PLAYERS_PER_ROOM = 8
+ROLES = ['Merlin', 'Percival', 'Loyal Servant', 'Loyal Servant', 'Assassin', 'Morgana', 'Minion of Mordred', 'Loyal Servant']
+
+
+def role(i):
+    # Build a fresh string each time, the way roles arrive from request JSON
+    return ''.join(ROLES[i % len(ROLES)])
+
+
+def dict_records():
+    rooms, players = {}, {}
+    for r in range(ROOMS):
+        player_ids = list(range(r * PLAYERS_PER_ROOM, (r + 1) * PLAYERS_PER_ROOM))
+        for i, pid in enumerate(player_ids):
+            players[pid] = {
+                'id': pid,
+                'room_id': r,
+                'player_name': f'player-{i}',
+                'character_role': role(i),
+                'is_host': i == 0,
+                'joined_at': datetime.utcnow().isoformat(),
+                'last_active_at': time.time()
+            }
+        rooms[f'{r:06d}'] = {
+            'id': r,
+            'room_code': f'{r:06d}',
+            'host_player_id': player_ids[0],
+            'status': 'started',
+            'player_count': len(player_ids),
+            'optional_characters': ['Percival', 'Morgana'],
+            'created_at': datetime.utcnow().isoformat(),
+            'player_ids': player_ids,
+            'version': 1,
+            'last_active_at': time.time()
+        }
+    return rooms, players
+
+
+def slotted_records():
+    rooms, players = {}, {}
+    now = int(time.time())
+    for r in range(ROOMS):
+        player_ids = list(range(r * PLAYERS_PER_ROOM, (r + 1) * PLAYERS_PER_ROOM))
+        for i, pid in enumerate(player_ids):
+            players[pid] = Player(id=pid, room_id=r, player_name=f'player-{i}', character_role=intern_role(role(i)),
+                                  is_host=i == 0, joined_at=now, last_active_at=now)
+        rooms[f'{r:06d}'] = Room(id=r, room_code=f'{r:06d}', host_player_id=player_ids[0], status='started',
+                                 optional_characters=(intern_role('Percival'), intern_role('Morgana')),
+                                 created_at=now, player_ids=player_ids, last_active_at=now)
+    return rooms, players
+
+
+def full_storage():
+    for r in range(ROOMS):
+        room, _ = storage.create_room('player-0')
+        for i in range(1, PLAYERS_PER_ROOM):
+            storage.join_room(room.room_code, f'player-{i}')
+
+
+def measure(build):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return after - before
+
+
+def main():
+    print(f'{ROOMS} rooms x {PLAYERS_PER_ROOM} players')
+    per_room = PLAYERS_PER_ROOM + 1
+    for name, build in [('dict records', dict_records), ('slotted records', slotted_records)]:
+        size = measure(build)
+        print(f'{name:>16}: {size / ROOMS:>8.0f} bytes per room incl. players '
+              f'({size / (ROOMS * per_room):.0f} bytes per record)')
+    storage.reset()
+    size = measure(full_storage)
+    print(f"{'memory_storage':>16}: {size / ROOMS:>8.0f} bytes per room incl. players, indexes and locks")
+    storage.reset()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Measure what request metrics cost, under the load test's own traffic.
+
+Runs benchmarks/loadtest.py in-process, alternating rounds with metrics
+recording and with metrics.record stubbed out, so drift hits both sides
+alike. Polls are sent back to back (--poll-interval 0) so the run is bound
+by server CPU rather than by the frontend's cadence. For each side it prints
+the best round's req/s and p50/p99 of the room poll from loadtest's report,
+and the overhead of recording.
+
+Usage: python benchmarks/bench_metrics.py [--rooms 200 --duration 20 --rounds 3]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import loadtest  # noqa: E402
+import metrics  # noqa: E402
+import storage  # noqa: E402
+
+POLL_ROUTE = 'GET /api/rooms/<code>'
+
+
+def run_round(client, args):
+    """One load test run. Returns its report."""
+    storage.reset()
+    stats, elapsed, lag = loadtest.run(client, args.rooms, args.duration, args.workers,
+                                       args.poll_interval, args.game_seconds, args.seed)
+    return loadtest.report(stats, elapsed, lag, vars(args), None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Request metrics overhead under loadtest.py')
+    parser.add_argument('--rooms', type=int, default=200)
+    parser.add_argument('--duration', type=float, default=20, help='seconds per round')
+    parser.add_argument('--rounds', type=int, default=3, help='rounds per side')
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--poll-interval', type=float, default=0)
+    parser.add_argument('--game-seconds', type=float, default=30)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    client = loadtest.InProcessClient()
+    record = metrics.record
+    enabled, disabled = [], []
+    for _ in range(args.rounds):
+        metrics.record = record
+        enabled.append(run_round(client, args))
+        metrics.record = lambda *args: None
+        disabled.append(run_round(client, args))
+    metrics.record = record
+
+    with_metrics = max(enabled, key=lambda result: result['req_per_s'])
+    without_metrics = max(disabled, key=lambda result: result['req_per_s'])
+    print(f"{'':>16} {'req/s':>10} {'poll p50 ms':>12} {'poll p99 ms':>12}")
+    for name, result in (('without metrics', without_metrics), ('with metrics', with_metrics)):
+        poll = result['routes'][POLL_ROUTE]
+        print(f"{name:>16} {result['req_per_s']:>10.0f} {poll['p50_ms']:>12.3f} {poll['p99_ms']:>12.3f}")
+    overhead = (without_metrics['req_per_s'] / with_metrics['req_per_s'] - 1) * 100
+    print(f'{"overhead":>16}: {overhead:9.2f} %')
+
+    start = time.perf_counter()
+    metrics.render(storage.get_room_stats())
+    print(f'{"scrape":>16}: {(time.perf_counter() - start) * 1000:9.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,250 @@
+"""
+Check the compiled role rules in game_logic against the hand-written rules
+they replaced, then time both.
+
+Parity covers every multiset of roles for 5 to 10 players, seated in a
+random order, under every combination of enabled optional roles, plus
+seats with no role or an unknown one. Timings are per room: reveals for
+every player, one validation and one available-characters lookup.
+
+Usage: python benchmarks/bench_roles.py
+"""
+import itertools
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import game_logic  # noqa: E402
+from game_logic import PLAYER_CONFIGURATIONS  # noqa: E402
+
+OPTIONAL = ['Percival', 'Mordred', 'Oberon', 'Morgana']
+ROOMS = 20_000
+
+
+# The hand-written rules game_logic used before they were compiled, verbatim
+
+LEGACY_GOOD = ['Merlin', 'Percival', 'Loyal Servant']
+LEGACY_EVIL = ['Assassin', 'Mordred', 'Oberon', 'Morgana', 'Minion of Mordred']
+
+def legacy_is_good(character):
+    """Check if a character is on the Good side."""
+    return character in LEGACY_GOOD
+
+def legacy_is_evil(character):
+    """Check if a character is on the Evil side."""
+    return character in LEGACY_EVIL
+
+def legacy_get_character_reveals(player_character, all_players):
+    """
+    Get the information that should be revealed to a player based on their character.
+
+    Args:
+        player_character: The character of the player requesting reveals
+        all_players: List of dicts with 'player_name' and 'character_role' keys
+
+    Returns:
+        Dict with revelation information for the player
+    """
+    reveals = {
+        'your_character': player_character,
+        'your_allegiance': 'Good' if legacy_is_good(player_character) else 'Evil',
+        'revealed_players': [],
+        'message': ''
+    }
+
+    # Get all evil players (excluding Oberon for most purposes)
+    evil_players = [p for p in all_players if legacy_is_evil(p['character_role'])]
+    evil_players_except_oberon = [p for p in evil_players if p['character_role'] != 'Oberon']
+
+    if player_character == 'Merlin':
+        # Merlin sees all evil players except Mordred
+        visible_evil = [p for p in evil_players if p['character_role'] != 'Mordred']
+        reveals['revealed_players'] = [p['player_name'] for p in visible_evil]
+        reveals['message'] = 'You are Merlin. You know the agents of Evil (except Mordred if present).'
+
+    elif player_character == 'Percival':
+        # Percival sees Merlin and Morgana (if present)
+        merlin_and_morgana = [p for p in all_players if p['character_role'] in ['Merlin', 'Morgana']]
+        reveals['revealed_players'] = [p['player_name'] for p in merlin_and_morgana]
+        reveals['message'] = 'You are Percival. You see Merlin (and Morgana if present), but you must discern which is which.'
+
+    elif player_character == 'Loyal Servant':
+        reveals['message'] = 'You are a Loyal Servant of Arthur. You have no special knowledge, but you fight for Good!'
+
+    elif player_character == 'Oberon':
+        # Oberon knows he's evil but doesn't know other evil players
+        reveals['message'] = 'You are Oberon, a Minion of Mordred. You do not know your fellow agents of Evil, nor do they know you.'
+
+    elif player_character in ['Assassin', 'Mordred', 'Morgana', 'Minion of Mordred']:
+        # All other evil players know each other (except Oberon)
+        allies = [p for p in evil_players_except_oberon if p['character_role'] != player_character]
+        reveals['revealed_players'] = [p['player_name'] for p in allies]
+
+        if player_character == 'Assassin':
+            reveals['message'] = 'You are the Assassin, a Minion of Mordred. You know your fellow agents of Evil (except Oberon). If Good wins, you can assassinate Merlin to win the game!'
+        elif player_character == 'Mordred':
+            reveals['message'] = 'You are Mordred, a Minion of Mordred. You know your fellow agents of Evil (except Oberon). Your identity is hidden from Merlin!'
+        elif player_character == 'Morgana':
+            reveals['message'] = 'You are Morgana, a Minion of Mordred. You know your fellow agents of Evil (except Oberon). You appear as Merlin to Percival!'
+        else:
+            reveals['message'] = 'You are a Minion of Mordred. You know your fellow agents of Evil (except Oberon).'
+
+    return reveals
+
+def legacy_validate_character_selection(players, optional_characters):
+    """
+    Validate that the character selection follows Avalon rules.
+
+    Args:
+        players: List of player dicts with character_role
+        optional_characters: List of optional characters enabled for this game
+
+    Returns:
+        Tuple of (is_valid: bool, error_message: str or None)
+    """
+    player_count = len(players)
+
+    # Check if player count is valid
+    if player_count < 5 or player_count > 10:
+        return False, f"Invalid player count: {player_count}. Must be between 5 and 10."
+
+    config = PLAYER_CONFIGURATIONS[player_count]
+
+    # Count good and evil players
+    good_count = sum(1 for p in players if legacy_is_good(p['character_role']))
+    evil_count = sum(1 for p in players if legacy_is_evil(p['character_role']))
+
+    if good_count != config['good'] or evil_count != config['evil']:
+        return False, f"Invalid team distribution. Need {config['good']} Good and {config['evil']} Evil players."
+
+    # Check for required characters
+    characters = [p['character_role'] for p in players]
+    if 'Merlin' not in characters:
+        return False, "Merlin is required in all games."
+    if 'Assassin' not in characters:
+        return False, "Assassin is required in all games."
+
+    # Check for duplicate special characters
+    special_chars = ['Merlin', 'Percival', 'Assassin', 'Mordred', 'Oberon', 'Morgana']
+    for char in special_chars:
+        if characters.count(char) > 1:
+            return False, f"Cannot have multiple {char} characters."
+
+    # Check that optional characters are only used if enabled
+    for char in characters:
+        if char in ['Percival', 'Mordred', 'Oberon', 'Morgana'] and char not in optional_characters:
+            return False, f"{char} is not enabled for this game."
+
+    return True, None
+
+def legacy_get_available_characters(player_count, optional_characters):
+    """
+    Get the list of available characters based on player count and optional characters.
+
+    Args:
+        player_count: Number of players in the game
+        optional_characters: List of optional characters enabled
+
+    Returns:
+        Dict with 'good' and 'evil' character lists
+    """
+    if player_count not in PLAYER_CONFIGURATIONS:
+        return {'good': [], 'evil': []}
+
+    config = PLAYER_CONFIGURATIONS[player_count]
+
+    # Required characters
+    good_chars = ['Merlin'] + ['Loyal Servant'] * (config['good'] - 1)
+    evil_chars = ['Assassin'] + ['Minion of Mordred'] * (config['evil'] - 1)
+
+    # Add optional characters to the pool
+    available_good = ['Merlin', 'Loyal Servant']
+    available_evil = ['Assassin', 'Minion of Mordred']
+
+    if 'Percival' in optional_characters:
+        available_good.append('Percival')
+    if 'Mordred' in optional_characters:
+        available_evil.append('Mordred')
+    if 'Oberon' in optional_characters:
+        available_evil.append('Oberon')
+    if 'Morgana' in optional_characters:
+        available_evil.append('Morgana')
+
+    return {
+        'good': available_good,
+        'evil': available_evil,
+        'good_count': config['good'],
+        'evil_count': config['evil']
+    }
+
+
+def rooms(rng):
+    """Every multiset of roles for every player count, in a random seat order."""
+    roles = game_logic.GOOD_CHARACTERS + game_logic.EVIL_CHARACTERS
+    for count in PLAYER_CONFIGURATIONS:
+        for combination in itertools.combinations_with_replacement(roles, count):
+            seats = list(combination)
+            rng.shuffle(seats)
+            yield [{'player_name': f'player-{i}', 'character_role': role} for i, role in enumerate(seats)]
+    for count in (4, 5, 11):
+        for _ in range(1000):
+            seats = rng.choices(roles + [None, 'Lancelot'], k=count)
+            yield [{'player_name': f'player-{i}', 'character_role': role} for i, role in enumerate(seats)]
+
+
+def check_parity():
+    rng = random.Random(0)
+    enabled_sets = [list(c) for n in range(len(OPTIONAL) + 1) for c in itertools.combinations(OPTIONAL, n)]
+    checked = 0
+    for players in rooms(rng):
+        expected = [legacy_get_character_reveals(p['character_role'], players) for p in players]
+        assert game_logic.get_room_reveals(players) == expected, players
+        for player, reveal in zip(players, expected):
+            assert game_logic.get_character_reveals(player['character_role'], players) == reveal, players
+        for enabled in enabled_sets:
+            assert (game_logic.validate_character_selection(players, enabled)
+                    == legacy_validate_character_selection(players, enabled)), (players, enabled)
+        checked += 1
+    for count in range(0, 12):
+        for enabled in enabled_sets:
+            assert (game_logic.get_available_characters(count, enabled)
+                    == legacy_get_available_characters(count, enabled)), (count, enabled)
+    return checked
+
+
+def main():
+    print(f'parity: {check_parity()} rooms identical')
+
+    rng = random.Random(1)
+    sample = []
+    for _ in range(ROOMS):
+        count = rng.choice(list(PLAYER_CONFIGURATIONS))
+        config = PLAYER_CONFIGURATIONS[count]
+        roles = (['Merlin', 'Percival'] + ['Loyal Servant'] * (config['good'] - 2)
+                 + ['Assassin', 'Morgana'] + ['Minion of Mordred'] * (config['evil'] - 2))
+        rng.shuffle(roles)
+        sample.append([{'player_name': f'player-{i}', 'character_role': role} for i, role in enumerate(roles)])
+
+    def legacy():
+        for players in sample:
+            [legacy_get_character_reveals(p['character_role'], players) for p in players]
+            legacy_validate_character_selection(players, OPTIONAL)
+            legacy_get_available_characters(len(players), OPTIONAL)
+
+    def compiled():
+        for players in sample:
+            game_logic.get_room_reveals(players)
+            game_logic.validate_character_selection(players, OPTIONAL)
+            game_logic.get_available_characters(len(players), OPTIONAL)
+
+    print(f"{'rules':>10} {'us/room':>10}")
+    for name, run in (('legacy', legacy), ('compiled', compiled)):
+        seconds = min(timeit.repeat(run, number=1, repeat=3))
+        print(f'{name:>10} {seconds / ROOMS * 1e6:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
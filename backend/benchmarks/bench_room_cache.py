@@ -0,0 +1,88 @@
+"""
+CPU time per GET /api/rooms/<code> for a 10-player room that isn't changing,
+the way a room full of pollers sees it, with the response cache warm and
+with the room's entry evicted before every request (as before the cache).
+
+Times three layers, so it is clear where the time goes:
+
+- encode: the room with its players, from scratch with
+  get_room_with_players + jsonify as every route used to, and through
+  response_cache
+- view: the get_room handler alone, inside a request context
+- request: the whole Flask app called as WSGI (routing, hooks, CORS), with
+  no test client around it
+
+Caching cuts encoding and the view several-fold, but not the whole request:
+Flask's per-request machinery costs more than the view ever did, and is the
+same with or without the cache.
+
+Usage: python benchmarks/bench_room_cache.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import response_cache  # noqa: E402
+import storage  # noqa: E402
+from app import create_app  # noqa: E402
+from flask import jsonify  # noqa: E402
+from routes import get_room  # noqa: E402
+from werkzeug.test import EnvironBuilder  # noqa: E402
+
+REQUESTS = 5_000
+
+
+def cpu_us(run, number=REQUESTS):
+    """Best CPU microseconds per call over three rounds."""
+    best = float('inf')
+    for _ in range(3):
+        start = time.process_time()
+        for _ in range(number):
+            run()
+        best = min(best, time.process_time() - start)
+    return best / number * 1e6
+
+
+def main():
+    storage.reset()
+    app = create_app()
+    client = app.test_client()
+    data = client.post('/api/rooms', json={'player_name': 'host'}).get_json()
+    room_code = data['room']['room_code']
+    for i in range(9):
+        client.post(f'/api/rooms/{room_code}/join', json={'player_name': f'player-{i}'})
+    path = f'/api/rooms/{room_code}'
+    size = len(client.get(path).data)
+
+    environ = EnvironBuilder(path=path).get_environ()
+
+    def request():
+        body = app(dict(environ), lambda status, headers, exc_info=None: None)
+        b''.join(body)
+        body.close()
+
+    def uncached(run):
+        def evicted():
+            response_cache.evict(room_code)
+            run()
+        return evicted
+
+    with app.test_request_context(path):
+        rows = [
+            ('encode', lambda: jsonify({'room': storage.get_room_with_players(room_code)}),
+             lambda: response_cache.room_json(room_code)),
+            ('view', uncached(lambda: get_room(room_code)), lambda: get_room(room_code)),
+        ]
+        timings = [(name, cpu_us(scratch), cpu_us(cached)) for name, scratch, cached in rows]
+    timings.append(('request', cpu_us(uncached(request)), cpu_us(request)))
+
+    print(f'encoder: {response_cache.ENCODER}, response: {size} bytes')
+    print(f"{'cpu us':>8} {'uncached':>9} {'cached':>8} {'speedup':>8}")
+    for name, scratch, cached in timings:
+        print(f'{name:>8} {scratch:>9.1f} {cached:>8.1f} {scratch / cached:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
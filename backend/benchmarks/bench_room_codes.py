@@ -0,0 +1,57 @@
+"""
+Benchmark room code allocation as the code space fills up.
+
+Compares RoomCodeAllocator with the old approach of drawing random codes
+until one is unused, reporting mean time per allocation in each occupancy
+band up to 95% full.
+
+Usage: python benchmarks/bench_room_codes.py
+"""
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from room_codes import RoomCodeAllocator  # noqa: E402
+
+SPACE = 10 ** 6
+BANDS = [0.0, 0.5, 0.8, 0.9, 0.95]
+
+
+def rejection_sampler():
+    used = set()
+
+    def allocate():
+        while True:
+            code = ''.join(random.choices(string.digits, k=6))
+            if code not in used:
+                used.add(code)
+                return code
+    return allocate
+
+
+def measure(allocate):
+    """Mean allocation time per occupancy band, filling the space as we go."""
+    results = []
+    for low, high in zip(BANDS, BANDS[1:]):
+        count = int((high - low) * SPACE)
+        start = time.perf_counter()
+        for _ in range(count):
+            allocate()
+        results.append((time.perf_counter() - start) / count)
+    return results
+
+
+def main():
+    allocator = RoomCodeAllocator()
+    rows = zip(BANDS, BANDS[1:], measure(allocator.allocate), measure(rejection_sampler()))
+    print(f"{'occupancy':>12} {'allocator':>12} {'rejection':>12}")
+    for low, high, ours, theirs in rows:
+        print(f'{low:>5.0%}-{high:<5.0%} {ours * 1e9:>9.0f} ns {theirs * 1e9:>9.0f} ns')
+
+
+if __name__ == '__main__':
+    main()
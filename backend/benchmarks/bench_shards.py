@@ -0,0 +1,120 @@
+"""
+Compare end-to-end API throughput with 1, 2 and 4 shards behind router.py.
+
+For each shard count the benchmark starts `router.py --shards N` and drives
+it over HTTP from several client processes, each holding one keep-alive
+connection and playing full games: create, join, configure, select, start,
+then poll the room and reveals the way the frontend does. Rooms are created
+round-robin across shards, so every shard gets an equal share of the games.
+
+Throughput can only grow with the shard count when there are cores to spare
+for the extra workers; on an N-core machine expect near-linear scaling up to
+roughly N - 1 shards, the rest going to the router and the clients.
+
+Usage: python benchmarks/bench_shards.py [seconds] [--clients 8]
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+SHARD_COUNTS = [1, 2, 4]
+ROUTER_PORT = 5700
+POLLS_PER_GAME = 20
+ROLES = ['Merlin', 'Loyal Servant', 'Loyal Servant', 'Assassin', 'Minion of Mordred']
+
+
+def play_games(deadline):
+    """Run games through the router until the deadline; returns the number of requests made."""
+    conn = http.client.HTTPConnection('127.0.0.1', ROUTER_PORT, timeout=30)
+
+    def call(method, path, body=None):
+        payload = json.dumps(body) if body is not None else None
+        headers = {'Content-Type': 'application/json'} if payload else {}
+        conn.request(method, path, body=payload, headers=headers)
+        return json.loads(conn.getresponse().read())
+
+    requests = 0
+    while time.monotonic() < deadline:
+        data = call('POST', '/api/rooms', {'player_name': 'host'})
+        room_code = data['room']['room_code']
+        player_ids = [data['player']['id']]
+        for name in ('b', 'c', 'd', 'e'):
+            player_ids.append(call('POST', f'/api/rooms/{room_code}/join', {'player_name': name})['player']['id'])
+        call('POST', f'/api/rooms/{room_code}/configure', {'player_id': player_ids[0], 'optional_characters': []})
+        for pid, role in zip(player_ids, ROLES):
+            call('POST', f'/api/players/{pid}/select-character', {'character': role})
+        call('POST', f'/api/rooms/{room_code}/start', {'player_id': player_ids[0]})
+        for i in range(POLLS_PER_GAME):
+            call('GET', f'/api/rooms/{room_code}')
+            call('GET', f'/api/players/{player_ids[i % len(player_ids)]}/reveal')
+        requests += 1 + 4 + 1 + 5 + 1 + 2 * POLLS_PER_GAME
+    conn.close()
+    return requests
+
+
+def client(seconds, start, results):
+    start.wait()
+    results.put(play_games(time.monotonic() + seconds))
+
+
+def wait_for_router(timeout=30):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', ROUTER_PORT, timeout=1)
+            conn.request('GET', '/api/health')
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError('Router did not start')
+        time.sleep(0.2)
+
+
+def measure(shards, clients, seconds):
+    router = subprocess.Popen([sys.executable, os.path.join(BACKEND_DIR, 'router.py'), '--shards', str(shards),
+                               '--host', '127.0.0.1', '--port', str(ROUTER_PORT)], cwd=BACKEND_DIR)
+    try:
+        wait_for_router()
+        ctx = multiprocessing.get_context('spawn')
+        start = ctx.Event()
+        results = ctx.Queue()
+        procs = [ctx.Process(target=client, args=(seconds, start, results)) for _ in range(clients)]
+        for p in procs:
+            p.start()
+        start.set()
+        total = sum(results.get() for _ in procs)
+        for p in procs:
+            p.join()
+        return total / seconds
+    finally:
+        router.terminate()
+        router.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Throughput by shard count')
+    parser.add_argument('seconds', type=float, nargs='?', default=5)
+    parser.add_argument('--clients', type=int, default=8, help='client processes')
+    args = parser.parse_args()
+
+    print(f'{os.cpu_count()} CPUs, {args.clients} clients')
+    print(f"{'shards':>8} {'req/s':>10} {'speedup':>8}")
+    baseline = None
+    for shards in SHARD_COUNTS:
+        rate = measure(shards, args.clients, args.seconds)
+        baseline = baseline or rate
+        print(f'{shards:>8} {rate:>10.0f} {rate / baseline:>7.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Compare API throughput with 1, 2, 4 and 8 worker processes.
+
+Each worker is a separate process with its own app instance, the way
+gunicorn runs them, sharing one SQLite database. Workers drive the API
+through Flask's test client so the numbers measure the app and storage
+rather than an HTTP stack. The single-process in-memory backend is included
+as a baseline. Every worker plays full games: create, join, configure,
+select, start, then polls the room the way the frontend does.
+
+Usage: python benchmarks/bench_workers.py [seconds]
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+WORKER_COUNTS = [1, 2, 4, 8]
+POLLS_PER_GAME = 20
+ROLES = ['Merlin', 'Loyal Servant', 'Loyal Servant', 'Assassin', 'Minion of Mordred']
+
+
+def play_games(client, deadline):
+    """Run games until the deadline; returns the number of requests made."""
+    requests = 0
+    while time.monotonic() < deadline:
+        data = client.post('/api/rooms', json={'player_name': 'host'}).get_json()
+        room_code = data['room']['room_code']
+        player_ids = [data['player']['id']]
+        for name in ('b', 'c', 'd', 'e'):
+            player_ids.append(client.post(f'/api/rooms/{room_code}/join', json={'player_name': name}).get_json()['player']['id'])
+        client.post(f'/api/rooms/{room_code}/configure', json={'player_id': player_ids[0], 'optional_characters': []})
+        for pid, role in zip(player_ids, ROLES):
+            client.post(f'/api/players/{pid}/select-character', json={'character': role})
+        client.post(f'/api/rooms/{room_code}/start', json={'player_id': player_ids[0]})
+        for i in range(POLLS_PER_GAME):
+            client.get(f'/api/rooms/{room_code}')
+            client.get(f'/api/players/{player_ids[i % len(player_ids)]}/reveal')
+        requests += 1 + 4 + 1 + 5 + 1 + 2 * POLLS_PER_GAME
+    return requests
+
+
+def worker(storage_url, seconds, ready, start, results):
+    os.environ['AVALON_STORAGE'] = storage_url
+    from app import create_app
+    client = create_app().test_client()
+    ready.wait()
+    start.wait()
+    results.put(play_games(client, time.monotonic() + seconds))
+
+
+def measure(storage_url, workers, seconds):
+    ctx = multiprocessing.get_context('spawn')
+    ready = ctx.Barrier(workers + 1)
+    start = ctx.Event()
+    results = ctx.Queue()
+    procs = [ctx.Process(target=worker, args=(storage_url, seconds, ready, start, results)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    ready.wait()
+    start.set()
+    total = sum(results.get() for _ in procs)
+    for p in procs:
+        p.join()
+    return total / seconds
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    print(f"{'backend':>8} {'workers':>8} {'req/s':>10}")
+    print(f"{'memory':>8} {1:>8} {measure('memory', 1, seconds):>10.0f}")
+    with tempfile.TemporaryDirectory() as tmp:
+        storage_url = f"sqlite:///{os.path.join(tmp, 'avalon.db')}"
+        for workers in WORKER_COUNTS:
+            print(f"{'sqlite':>8} {workers:>8} {measure(storage_url, workers, seconds):>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,312 @@
+"""
+Load test that plays thousands of concurrent games against the API.
+
+Each simulated room runs the lifecycle the frontend drives: create, 5-10
+joins, configure, every player selecting a character, start, then every
+player polling their reveal and the room at the frontend's 2 s cadence
+until the game ends and everyone leaves. Finished rooms are replaced with
+fresh ones so load stays steady for the whole run.
+
+Rooms are generators scheduled on a small pool of worker threads, so
+thousands of rooms don't need thousands of threads. Requests go either
+straight into create_app() through Flask's test client (the default) or over
+HTTP to a running server with --url.
+
+Prints a JSON report with p50/p95/p99 latency per route, total req/s, error
+counts and server RSS, for tracking regressions between runs.
+
+Usage:
+    python benchmarks/loadtest.py --rooms 200 --duration 60
+    python benchmarks/loadtest.py --url http://localhost:5001 --server-pid 1234
+"""
+import argparse
+import heapq
+import http.client
+import itertools
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+OPTIONAL_CHARACTERS = ['Percival', 'Mordred', 'Oberon', 'Morgana']
+SPECIAL_GOOD = ['Percival']
+SPECIAL_EVIL = ['Mordred', 'Oberon', 'Morgana']
+TEAM_SIZES = {5: (3, 2), 6: (4, 2), 7: (4, 3), 8: (5, 3), 9: (6, 3), 10: (6, 4)}
+
+
+class InProcessClient:
+    """Calls the app directly through Flask's test client."""
+
+    def __init__(self):
+        from app import create_app
+        self.app = create_app()
+        self.local = threading.local()
+
+    def request(self, method, path, body=None):
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = self.app.test_client()
+        response = client.open(path, method=method, json=body)
+        return response.status_code, response.get_json(silent=True)
+
+
+class HttpClient:
+    """Keep-alive HTTP connection per worker thread."""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.local = threading.local()
+
+    def request(self, method, path, body=None):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.local.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        payload = json.dumps(body) if body is not None else None
+        headers = {'Content-Type': 'application/json'} if payload else {}
+        try:
+            conn.request(method, path, body=payload, headers=headers)
+            response = conn.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            self.local.conn = None
+            return 599, None
+        return response.status, json.loads(data) if data else None
+
+
+class Stats:
+    """Latencies and status codes per route template."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    def record(self, route, status, seconds):
+        with self.lock:
+            self.latencies[route].append(seconds)
+            self.statuses[route][status] += 1
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def read_rss_bytes(pid):
+    """Resident set size of a process from /proc, or None if unavailable."""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def pick_roles(player_count, rng):
+    """A legal role for each seat, using a random subset of the optional characters."""
+    good, evil = TEAM_SIZES[player_count]
+    optional = [c for c in OPTIONAL_CHARACTERS if rng.random() < 0.5]
+    good_roles = ['Merlin'] + [c for c in SPECIAL_GOOD if c in optional][:good - 1]
+    evil_roles = ['Assassin'] + [c for c in SPECIAL_EVIL if c in optional][:evil - 1]
+    good_roles += ['Loyal Servant'] * (good - len(good_roles))
+    evil_roles += ['Minion of Mordred'] * (evil - len(evil_roles))
+    roles = good_roles + evil_roles
+    rng.shuffle(roles)
+    return optional, roles
+
+
+def room_lifecycle(call, rng, poll_interval, game_seconds, follow_hints=False):
+    """
+    One room from creation until everyone leaves.
+
+    A generator: it makes requests through `call` and yields how many seconds
+    to wait before it should be resumed. With `follow_hints`, the reveal screen
+    polls at the server's next_poll_ms instead of every `poll_interval`.
+    """
+    player_count = rng.randint(5, 10)
+    status, data = call('POST', '/api/rooms', 'POST /api/rooms', {'player_name': 'player-0'})
+    if status != 201:
+        return
+    room_code = data['room']['room_code']
+    player_ids = [data['player']['id']]
+    host_id = player_ids[0]
+
+    # Players trickle in while everyone already inside polls the room
+    for i in range(1, player_count):
+        yield rng.uniform(0.2, 1.0)
+        status, data = call('POST', f'/api/rooms/{room_code}/join', 'POST /api/rooms/<code>/join',
+                            {'player_name': f'player-{i}'})
+        if status == 200:
+            player_ids.append(data['player']['id'])
+        for pid in player_ids:
+            call('GET', f'/api/rooms/{room_code}?player_id={pid}', 'GET /api/rooms/<code>')
+
+    optional, roles = pick_roles(len(player_ids), rng)
+    yield rng.uniform(0.5, 2.0)
+    call('POST', f'/api/rooms/{room_code}/configure', 'POST /api/rooms/<code>/configure',
+         {'player_id': host_id, 'optional_characters': optional})
+
+    for pid, role in zip(player_ids, roles):
+        yield rng.uniform(0.2, 1.0)
+        call('POST', f'/api/players/{pid}/select-character', 'POST /api/players/<id>/select-character',
+             {'character': role})
+        for poller in player_ids:
+            call('GET', f'/api/players/{poller}/session', 'GET /api/players/<id>/session')
+
+    yield rng.uniform(0.5, 2.0)
+    call('POST', f'/api/rooms/{room_code}/start', 'POST /api/rooms/<code>/start', {'player_id': host_id})
+
+    # Everyone sits on the reveal screen, polling at the frontend's cadence
+    deadline = time.monotonic() + game_seconds
+    while time.monotonic() < deadline:
+        hints = []
+        for pid in player_ids:
+            for method, path, route in (('GET', f'/api/players/{pid}/reveal', 'GET /api/players/<id>/reveal'),
+                                        ('GET', f'/api/rooms/{room_code}?player_id={pid}', 'GET /api/rooms/<code>')):
+                status, data = call(method, path, route)
+                if data and 'next_poll_ms' in data:
+                    hints.append(data['next_poll_ms'])
+        yield max(hints) / 1000 if follow_hints and hints else poll_interval
+
+    for pid in reversed(player_ids):
+        call('POST', f'/api/rooms/{room_code}/leave', 'POST /api/rooms/<code>/leave', {'player_id': pid})
+
+
+def run(client, rooms, duration, workers, poll_interval, game_seconds, seed, follow_hints=False):
+    stats = Stats()
+    rng = random.Random(seed)
+    sequence = itertools.count()
+    schedule = []  # (due, seq, generator)
+    schedule_lock = threading.Condition()
+    stop_at = time.monotonic() + duration
+    lag = []
+
+    def call(method, path, route, body=None):
+        start = time.perf_counter()
+        status, data = client.request(method, path, body)
+        stats.record(route, status, time.perf_counter() - start)
+        return status, data
+
+    def new_room(due):
+        generator = room_lifecycle(call, random.Random(rng.random()), poll_interval, game_seconds, follow_hints)
+        heapq.heappush(schedule, (due, next(sequence), generator))
+
+    # Stagger room creation across the first poll interval
+    now = time.monotonic()
+    for i in range(rooms):
+        new_room(now + poll_interval * i / rooms)
+
+    def worker():
+        while True:
+            with schedule_lock:
+                while True:
+                    now = time.monotonic()
+                    if now >= stop_at:
+                        schedule_lock.notify_all()
+                        return
+                    if schedule and schedule[0][0] <= now:
+                        due, _, generator = heapq.heappop(schedule)
+                        break
+                    timeout = (schedule[0][0] - now) if schedule else stop_at - now
+                    schedule_lock.wait(min(timeout, stop_at - now))
+            lag.append(now - due)
+            try:
+                delay = next(generator)
+                due = time.monotonic() + delay
+            except StopIteration:
+                generator = None
+                due = time.monotonic()
+            with schedule_lock:
+                if generator is None:
+                    new_room(due)
+                else:
+                    heapq.heappush(schedule, (due, next(sequence), generator))
+                schedule_lock.notify()
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=worker) for _ in range(workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - started
+    return stats, elapsed, lag
+
+
+def report(stats, elapsed, lag, config, rss_bytes):
+    routes = {}
+    total = 0
+    errors = defaultdict(int)
+    for route, latencies in sorted(stats.latencies.items()):
+        latencies.sort()
+        statuses = stats.statuses[route]
+        route_errors = {str(code): n for code, n in statuses.items() if code >= 400}
+        for code, n in route_errors.items():
+            errors[code] += n
+        total += len(latencies)
+        routes[route] = {
+            'count': len(latencies),
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+            'max_ms': round(latencies[-1] * 1000, 3),
+            'errors': route_errors
+        }
+    lag.sort()
+    return {
+        'config': config,
+        'elapsed_s': round(elapsed, 3),
+        'requests': total,
+        'req_per_s': round(total / elapsed, 1),
+        'errors': dict(errors),
+        'schedule_lag_p99_ms': round((percentile(lag, 0.99) or 0) * 1000, 3),
+        'server_rss_bytes': rss_bytes,
+        'routes': routes
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--rooms', type=int, default=100, help='concurrent rooms to keep alive')
+    parser.add_argument('--duration', type=float, default=30, help='seconds to run')
+    parser.add_argument('--workers', type=int, default=16, help='client worker threads')
+    parser.add_argument('--poll-interval', type=float, default=2.0, help='seconds between polls')
+    parser.add_argument('--game-seconds', type=float, default=30, help='seconds each game polls reveals')
+    parser.add_argument('--follow-hints', action='store_true', help="poll reveals at the server's next_poll_ms")
+    parser.add_argument('--url', help='base URL of a running server; default runs the app in-process')
+    parser.add_argument('--server-pid', type=int, help='pid of the server, to report its RSS')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    client = HttpClient(args.url) if args.url else InProcessClient()
+    stats, elapsed, lag = run(client, args.rooms, args.duration, args.workers,
+                              args.poll_interval, args.game_seconds, args.seed, args.follow_hints)
+
+    pid = args.server_pid if args.url else os.getpid()
+    config = {key: value for key, value in vars(args).items() if key != 'output'}
+    config['storage'] = os.environ.get('AVALON_STORAGE', 'memory')
+    result = report(stats, elapsed, lag, config, read_rss_bytes(pid) if pid else None)
+
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
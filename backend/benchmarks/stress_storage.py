@@ -0,0 +1,117 @@
+"""
+Multithreaded stress test for storage.
+
+Hammers storage from many threads, then checks the invariants that
+unsynchronized access used to break: unique ids, consistent indexes, and at
+most one holder of each unique character per room. Also reports throughput
+of independent room lifecycles as the thread count grows.
+
+Usage: python benchmarks/stress_storage.py
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import memory_storage as storage  # noqa: E402
+
+THREAD_COUNTS = [1, 2, 4, 8, 16]
+ROOMS_PER_THREAD = 2_000
+UNIQUE_ROLES = ['Merlin', 'Percival', 'Assassin', 'Mordred', 'Oberon', 'Morgana']
+
+
+def run_threads(count, target):
+    barrier = threading.Barrier(count)
+
+    def run(index):
+        barrier.wait()
+        target(index)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - start
+
+
+def check_invariants():
+    player_ids = set()
+    for room_code, room in storage.rooms.items():
+        assert storage.room_codes_by_id[room.id] == room_code
+        names = storage.player_ids_by_name[room_code]
+        assert len(names) == len(room.player_ids)
+        roles = []
+        for pid in room.player_ids:
+            assert pid not in player_ids, f'player id {pid} handed out twice'
+            player_ids.add(pid)
+            player = storage.players[pid]
+            assert storage.room_codes_by_player_id[pid] == room_code
+            assert names[player.player_name] == pid
+            roles.append(player.character_role)
+        for role in UNIQUE_ROLES:
+            assert roles.count(role) <= 1, f'{role} selected twice in room {room_code}'
+    assert player_ids == set(storage.players)
+    assert len(storage.room_codes_by_id) == len(storage.rooms)
+
+
+def contended_room(threads):
+    """Many threads join one room and race for the same unique characters."""
+    storage.reset()
+    room, host = storage.create_room('host')
+    room_code = room.room_code
+    storage.configure_room(room_code, host.id, ['Percival', 'Mordred', 'Oberon', 'Morgana'])
+
+    def worker(index):
+        for attempt in range(200):
+            _, player, error = storage.join_room(room_code, f'p{index}-{attempt % 3}')
+            if error:
+                continue
+            for role in UNIQUE_ROLES:
+                storage.select_character(player.id, role)
+            storage.leave_room(room_code, player.id)
+
+    run_threads(threads, worker)
+    check_invariants()
+
+
+def independent_rooms(threads):
+    """Each thread runs full lifecycles in its own rooms; returns lifecycles/s."""
+    storage.reset()
+
+    def worker(index):
+        for _ in range(ROOMS_PER_THREAD):
+            room, host = storage.create_room('host')
+            room_code = room.room_code
+            player_ids = [host.id]
+            for name in ('b', 'c', 'd', 'e'):
+                _, player, _ = storage.join_room(room_code, name)
+                player_ids.append(player.id)
+            storage.configure_room(room_code, host.id, [])
+            for pid, role in zip(player_ids, ['Merlin', 'Loyal Servant', 'Loyal Servant', 'Assassin', 'Minion of Mordred']):
+                storage.select_character(pid, role)
+            _, error = storage.start_game(room_code, host.id)
+            assert error is None, error
+            storage.get_room_with_players(room_code)
+
+    elapsed = run_threads(threads, worker)
+    check_invariants()
+    return threads * ROOMS_PER_THREAD / elapsed
+
+
+def main():
+    for threads in THREAD_COUNTS:
+        contended_room(threads)
+    print('invariants held under contention')
+
+    print(f"{'threads':>8} {'lifecycles/s':>14}")
+    for threads in THREAD_COUNTS:
+        print(f'{threads:>8} {independent_rooms(threads):>14.0f}')
+    storage.reset()
+
+
+if __name__ == '__main__':
+    main()
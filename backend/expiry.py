@@ -0,0 +1,15 @@
+"""
+When idle rooms are evicted. Shared by every storage backend.
+"""
+
+# Idle rooms are evicted once they go this long without activity. Rooms with
+# no players left use the 'empty' TTL regardless of status.
+ROOM_TTL_SECONDS = {
+    'waiting': 2 * 60 * 60,
+    'character_selection': 2 * 60 * 60,
+    'started': 6 * 60 * 60,
+    'empty': 5 * 60,
+}
+
+# How often the background reaper looks for expired rooms
+REAP_INTERVAL_SECONDS = 30
@@ -8,11 +8,51 @@ Character reveal rules:
 - Percival knows Merlin (and Morgana if she's in the game)
 - Mordred's identity is not revealed to Merlin
 - Morgana appears as Merlin to Percival
-"""
 
-# Character definitions
-GOOD_CHARACTERS = ['Merlin', 'Percival', 'Loyal Servant']
-EVIL_CHARACTERS = ['Assassin', 'Mordred', 'Oberon', 'Morgana', 'Minion of Mordred']
+The rules live in ROLES as data and are compiled once into bitmasks: every
+role gets a bit, and each role's team, flags and the roles it sees become
+integer masks. A room's reveals then come from one pass that ORs each
+player's seat into their role's seat mask, and one mask lookup per player.
+Adding a role such as Lancelot means adding a RoleRule.
+"""
+import secrets
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class RoleRule:
+    name: str
+    team: str  # 'Good' or 'Evil'
+    message: str
+    sees: tuple = ()  # roles whose players this role is shown
+    unique: bool = True  # at most one per game
+    optional: bool = False  # only allowed when the host enables it
+    required: bool = False  # every game must have one
+
+
+# Character definitions. Order matters: it is the order roles are offered in
+# and the order validation reports problems in.
+ROLES = (
+    RoleRule('Merlin', 'Good', 'You are Merlin. You know the agents of Evil (except Mordred if present).',
+             sees=('Assassin', 'Oberon', 'Morgana', 'Minion of Mordred'), required=True),
+    RoleRule('Percival', 'Good', 'You are Percival. You see Merlin (and Morgana if present), but you must discern which is which.',
+             sees=('Merlin', 'Morgana'), optional=True),
+    RoleRule('Loyal Servant', 'Good', 'You are a Loyal Servant of Arthur. You have no special knowledge, but you fight for Good!',
+             unique=False),
+    RoleRule('Assassin', 'Evil', 'You are the Assassin, a Minion of Mordred. You know your fellow agents of Evil (except Oberon). If Good wins, you can assassinate Merlin to win the game!',
+             sees=('Mordred', 'Morgana', 'Minion of Mordred'), required=True),
+    RoleRule('Mordred', 'Evil', 'You are Mordred, a Minion of Mordred. You know your fellow agents of Evil (except Oberon). Your identity is hidden from Merlin!',
+             sees=('Assassin', 'Morgana', 'Minion of Mordred'), optional=True),
+    RoleRule('Oberon', 'Evil', 'You are Oberon, a Minion of Mordred. You do not know your fellow agents of Evil, nor do they know you.',
+             optional=True),
+    RoleRule('Morgana', 'Evil', 'You are Morgana, a Minion of Mordred. You know your fellow agents of Evil (except Oberon). You appear as Merlin to Percival!',
+             sees=('Assassin', 'Mordred', 'Minion of Mordred'), optional=True),
+    RoleRule('Minion of Mordred', 'Evil', 'You are a Minion of Mordred. You know your fellow agents of Evil (except Oberon).',
+             sees=('Assassin', 'Mordred', 'Morgana'), unique=False),
+)
+
+GOOD_CHARACTERS = [role.name for role in ROLES if role.team == 'Good']
+EVIL_CHARACTERS = [role.name for role in ROLES if role.team == 'Evil']
 
 # Player count configurations (from rules)
 PLAYER_CONFIGURATIONS = {
@@ -24,13 +64,87 @@ PLAYER_CONFIGURATIONS = {
     10: {'good': 6, 'evil': 4}
 }
 
+# Compiled rules: role i is bit 1 << i
+_ROLE_INDEX = {role.name: i for i, role in enumerate(ROLES)}
+_ROLE_BIT = {role.name: 1 << i for i, role in enumerate(ROLES)}
+_SEES = [tuple(_ROLE_INDEX[seen] for seen in role.sees) for role in ROLES]
+
+
+def _mask(predicate):
+    return sum(1 << i for i, role in enumerate(ROLES) if predicate(role))
+
+
+_GOOD_MASK = _mask(lambda role: role.team == 'Good')
+_EVIL_MASK = _mask(lambda role: role.team == 'Evil')
+_UNIQUE_MASK = _mask(lambda role: role.unique)
+_OPTIONAL_MASK = _mask(lambda role: role.optional)
+_REQUIRED_MASK = _mask(lambda role: role.required)
+
+
+def _offered(team, enabled):
+    """A team's standard roles, then its optional roles enabled in the `enabled` mask."""
+    return ([role.name for role in ROLES if role.team == team and not role.optional]
+            + [role.name for i, role in enumerate(ROLES) if role.team == team and enabled >> i & 1])
+
+
+# (good, evil) roles on offer for every possible mask of enabled optional roles
+_AVAILABLE = {
+    enabled: (_offered('Good', enabled), _offered('Evil', enabled))
+    for enabled in range(1 << len(ROLES)) if not enabled & ~_OPTIONAL_MASK
+}
+
+
+def _first_role(mask):
+    """Name of the lowest role bit set in `mask`."""
+    return ROLES[(mask & -mask).bit_length() - 1].name
+
+
 def is_good_character(character):
     """Check if a character is on the Good side."""
-    return character in GOOD_CHARACTERS
+    return bool(_ROLE_BIT.get(character, 0) & _GOOD_MASK)
+
 
 def is_evil_character(character):
     """Check if a character is on the Evil side."""
-    return character in EVIL_CHARACTERS
+    return bool(_ROLE_BIT.get(character, 0) & _EVIL_MASK)
+
+
+def _seat_masks(all_players):
+    """Seat bitmask of the players holding each role, indexed like ROLES."""
+    seats = [0] * len(ROLES)
+    for seat, player in enumerate(all_players):
+        index = _ROLE_INDEX.get(player['character_role'])
+        if index is not None:
+            seats[index] |= 1 << seat
+    return seats
+
+
+def _reveal(player_character, seats, names):
+    index = _ROLE_INDEX.get(player_character)
+    if index is None:
+        return {
+            'your_character': player_character,
+            'your_allegiance': 'Evil',
+            'revealed_players': [],
+            'message': ''
+        }
+
+    visible = 0
+    for seen in _SEES[index]:
+        visible |= seats[seen]
+    revealed = []
+    while visible:
+        low = visible & -visible
+        revealed.append(names[low.bit_length() - 1])
+        visible ^= low
+    role = ROLES[index]
+    return {
+        'your_character': player_character,
+        'your_allegiance': role.team,
+        'revealed_players': revealed,
+        'message': role.message
+    }
+
 
 def get_character_reveals(player_character, all_players):
     """
@@ -43,51 +157,21 @@ def get_character_reveals(player_character, all_players):
     Returns:
         Dict with revelation information for the player
     """
-    reveals = {
-        'your_character': player_character,
-        'your_allegiance': 'Good' if is_good_character(player_character) else 'Evil',
-        'revealed_players': [],
-        'message': ''
-    }
+    names = [p['player_name'] for p in all_players]
+    return _reveal(player_character, _seat_masks(all_players), names)
 
-    # Get all evil players (excluding Oberon for most purposes)
-    evil_players = [p for p in all_players if is_evil_character(p['character_role'])]
-    evil_players_except_oberon = [p for p in evil_players if p['character_role'] != 'Oberon']
-
-    if player_character == 'Merlin':
-        # Merlin sees all evil players except Mordred
-        visible_evil = [p for p in evil_players if p['character_role'] != 'Mordred']
-        reveals['revealed_players'] = [p['player_name'] for p in visible_evil]
-        reveals['message'] = 'You are Merlin. You know the agents of Evil (except Mordred if present).'
-
-    elif player_character == 'Percival':
-        # Percival sees Merlin and Morgana (if present)
-        merlin_and_morgana = [p for p in all_players if p['character_role'] in ['Merlin', 'Morgana']]
-        reveals['revealed_players'] = [p['player_name'] for p in merlin_and_morgana]
-        reveals['message'] = 'You are Percival. You see Merlin (and Morgana if present), but you must discern which is which.'
-
-    elif player_character == 'Loyal Servant':
-        reveals['message'] = 'You are a Loyal Servant of Arthur. You have no special knowledge, but you fight for Good!'
-
-    elif player_character == 'Oberon':
-        # Oberon knows he's evil but doesn't know other evil players
-        reveals['message'] = 'You are Oberon, a Minion of Mordred. You do not know your fellow agents of Evil, nor do they know you.'
-
-    elif player_character in ['Assassin', 'Mordred', 'Morgana', 'Minion of Mordred']:
-        # All other evil players know each other (except Oberon)
-        allies = [p for p in evil_players_except_oberon if p['character_role'] != player_character]
-        reveals['revealed_players'] = [p['player_name'] for p in allies]
-
-        if player_character == 'Assassin':
-            reveals['message'] = 'You are the Assassin, a Minion of Mordred. You know your fellow agents of Evil (except Oberon). If Good wins, you can assassinate Merlin to win the game!'
-        elif player_character == 'Mordred':
-            reveals['message'] = 'You are Mordred, a Minion of Mordred. You know your fellow agents of Evil (except Oberon). Your identity is hidden from Merlin!'
-        elif player_character == 'Morgana':
-            reveals['message'] = 'You are Morgana, a Minion of Mordred. You know your fellow agents of Evil (except Oberon). You appear as Merlin to Percival!'
-        else:
-            reveals['message'] = 'You are a Minion of Mordred. You know your fellow agents of Evil (except Oberon).'
 
-    return reveals
+def get_room_reveals(all_players):
+    """
+    Reveals for every player in a room at once, in the order of `all_players`.
+
+    Same result as calling get_character_reveals for each player, with the
+    seat masks built only once.
+    """
+    seats = _seat_masks(all_players)
+    names = [p['player_name'] for p in all_players]
+    return [_reveal(p['character_role'], seats, names) for p in all_players]
+
 
 def validate_character_selection(players, optional_characters):
     """
@@ -100,40 +184,53 @@ def validate_character_selection(players, optional_characters):
     Returns:
         Tuple of (is_valid: bool, error_message: str or None)
     """
-    player_count = len(players)
+    # Count teams, and note which roles are present and which are repeated
+    good_count = evil_count = present = repeated = 0
+    bits = [_ROLE_BIT.get(p['character_role'], 0) for p in players]
+    for bit in bits:
+        good_count += bool(bit & _GOOD_MASK)
+        evil_count += bool(bit & _EVIL_MASK)
+        repeated |= present & bit
+        present |= bit
+
+    error = _selection_error(len(players), good_count, evil_count, present, repeated)
+    if error:
+        return False, error
+
+    # Check that optional characters are only used if enabled, in seat order
+    disabled = present & _OPTIONAL_MASK & ~_enabled_mask(optional_characters)
+    for bit in bits:
+        if bit & disabled:
+            return False, f"{_first_role(bit)} is not enabled for this game."
 
-    # Check if player count is valid
+    return True, None
+
+
+def _selection_error(player_count, good_count, evil_count, present, repeated):
+    """First rule a selection breaks, short of the optional-role check, or None."""
     if player_count < 5 or player_count > 10:
-        return False, f"Invalid player count: {player_count}. Must be between 5 and 10."
+        return f"Invalid player count: {player_count}. Must be between 5 and 10."
 
     config = PLAYER_CONFIGURATIONS[player_count]
+    if good_count != config['good'] or evil_count != config['evil']:
+        return f"Invalid team distribution. Need {config['good']} Good and {config['evil']} Evil players."
 
-    # Count good and evil players
-    good_count = sum(1 for p in players if is_good_character(p['character_role']))
-    evil_count = sum(1 for p in players if is_evil_character(p['character_role']))
+    missing = _REQUIRED_MASK & ~present
+    if missing:
+        return f"{_first_role(missing)} is required in all games."
 
-    if good_count != config['good'] or evil_count != config['evil']:
-        return False, f"Invalid team distribution. Need {config['good']} Good and {config['evil']} Evil players."
-
-    # Check for required characters
-    characters = [p['character_role'] for p in players]
-    if 'Merlin' not in characters:
-        return False, "Merlin is required in all games."
-    if 'Assassin' not in characters:
-        return False, "Assassin is required in all games."
-
-    # Check for duplicate special characters
-    special_chars = ['Merlin', 'Percival', 'Assassin', 'Mordred', 'Oberon', 'Morgana']
-    for char in special_chars:
-        if characters.count(char) > 1:
-            return False, f"Cannot have multiple {char} characters."
-
-    # Check that optional characters are only used if enabled
-    for char in characters:
-        if char in ['Percival', 'Mordred', 'Oberon', 'Morgana'] and char not in optional_characters:
-            return False, f"{char} is not enabled for this game."
+    repeated &= _UNIQUE_MASK
+    if repeated:
+        return f"Cannot have multiple {_first_role(repeated)} characters."
+    return None
+
+
+def _enabled_mask(optional_characters):
+    enabled = 0
+    for name in optional_characters:
+        enabled |= _ROLE_BIT.get(name, 0)
+    return enabled & _OPTIONAL_MASK
 
-    return True, None
 
 def get_available_characters(player_count, optional_characters):
     """
@@ -151,26 +248,165 @@ def get_available_characters(player_count, optional_characters):
 
     config = PLAYER_CONFIGURATIONS[player_count]
 
-    # Required characters
-    good_chars = ['Merlin'] + ['Loyal Servant'] * (config['good'] - 1)
-    evil_chars = ['Assassin'] + ['Minion of Mordred'] * (config['evil'] - 1)
-
-    # Add optional characters to the pool
-    available_good = ['Merlin', 'Loyal Servant']
-    available_evil = ['Assassin', 'Minion of Mordred']
-
-    if 'Percival' in optional_characters:
-        available_good.append('Percival')
-    if 'Mordred' in optional_characters:
-        available_evil.append('Mordred')
-    if 'Oberon' in optional_characters:
-        available_evil.append('Oberon')
-    if 'Morgana' in optional_characters:
-        available_evil.append('Morgana')
-
+    good, evil = _AVAILABLE[_enabled_mask(optional_characters)]
     return {
-        'good': available_good,
-        'evil': available_evil,
+        'good': list(good),
+        'evil': list(evil),
         'good_count': config['good'],
         'evil_count': config['evil']
     }
+
+
+def is_optional_role(character):
+    """Whether `character` is a role the host has to enable."""
+    return bool(_ROLE_BIT.get(character, 0) & _OPTIONAL_MASK)
+
+
+def is_unique_role(character):
+    """Whether at most one player may hold `character`. Unknown roles count as unique."""
+    return not _ROLE_BIT.get(character, 0) & ~_UNIQUE_MASK
+
+
+# Shuffles dealt roles; backed by the OS CSPRNG so seats can't be predicted
+_dealer = secrets.SystemRandom()
+
+# The role that fills each team's seats once its named roles are dealt
+_FILLER = {
+    team: next(role.name for role in ROLES if role.team == team and not role.unique and not role.optional)
+    for team in ('Good', 'Evil')
+}
+
+
+def role_setup(player_count, optional_characters):
+    """
+    The roles a game deals: the required roles, every enabled optional role,
+    and Loyal Servants or Minions of Mordred for the seats left.
+
+    Args:
+        player_count: Number of players in the game
+        optional_characters: List of optional characters enabled
+
+    Returns:
+        Tuple of (roles: list in ROLES order or None, error_message: str or None)
+    """
+    if player_count not in PLAYER_CONFIGURATIONS:
+        return None, f"Invalid player count: {player_count}. Must be between 5 and 10."
+
+    config = PLAYER_CONFIGURATIONS[player_count]
+    dealt = _REQUIRED_MASK | _enabled_mask(optional_characters)
+    roles = []
+    for team in ('Good', 'Evil'):
+        seats = config[team.lower()]
+        named = [role.name for i, role in enumerate(ROLES) if role.team == team and dealt >> i & 1]
+        if len(named) > seats:
+            return None, f"Too many {team} characters enabled. {player_count} players have {seats} {team} seats."
+        roles += named + [_FILLER[team]] * (seats - len(named))
+    return roles, None
+
+
+def deal_characters(player_count, optional_characters):
+    """
+    role_setup() in a cryptographically secure random seat order.
+
+    Returns:
+        Tuple of (roles: list in seat order or None, error_message: str or None)
+    """
+    roles, error = role_setup(player_count, optional_characters)
+    if error:
+        return None, error
+    _dealer.shuffle(roles)
+    return roles, None
+
+
+class SelectionTally:
+    """
+    Running totals of a room's role selection.
+
+    Storage updates a room's tally on every join, pick, kick, leave and reset,
+    so checking a pick, validating the whole selection and counting open
+    slots never rescan the room's players.
+    """
+    __slots__ = ('players', 'unassigned', 'good', 'evil', 'counts', 'present', 'repeated')
+
+    def __init__(self, roles=()):
+        """Tally for players holding `roles` (None for no role yet)."""
+        self.players = 0
+        self.unassigned = 0  # players without a role
+        self.good = 0
+        self.evil = 0
+        self.counts = [0] * len(ROLES)  # players per role, indexed like ROLES
+        self.present = 0  # mask of roles held by at least one player
+        self.repeated = 0  # mask of roles held by more than one
+        for role in roles:
+            self.add(role)
+
+    def _count(self, role, delta):
+        if role is None:
+            self.unassigned += delta
+            return
+        index = _ROLE_INDEX.get(role)
+        if index is None:
+            return
+        bit = 1 << index
+        count = self.counts[index] = self.counts[index] + delta
+        if bit & _GOOD_MASK:
+            self.good += delta
+        else:
+            self.evil += delta
+        self.present = self.present | bit if count > 0 else self.present & ~bit
+        self.repeated = self.repeated | bit if count > 1 else self.repeated & ~bit
+
+    def add(self, role=None):
+        """A player joined holding `role`."""
+        self.players += 1
+        self._count(role, 1)
+
+    def remove(self, role):
+        """A player holding `role` left."""
+        self.players -= 1
+        self._count(role, -1)
+
+    def change(self, old_role, new_role):
+        """A player swapped `old_role` for `new_role`."""
+        self._count(old_role, -1)
+        self._count(new_role, 1)
+
+    def clear(self):
+        """Every player's role was cleared."""
+        self.unassigned = self.players
+        self.good = self.evil = self.present = self.repeated = 0
+        self.counts = [0] * len(ROLES)
+
+    def is_taken(self, character):
+        """Whether a unique `character` is already held."""
+        bit = _ROLE_BIT.get(character, 0)
+        return bool(bit & self.present & _UNIQUE_MASK)
+
+    def validate(self, optional_characters):
+        """
+        Same result as validate_character_selection on the tallied players.
+
+        When several disabled optional roles are held, the first in ROLES
+        order is reported rather than the first in seat order.
+        """
+        error = _selection_error(self.players, self.good, self.evil, self.present, self.repeated)
+        if error:
+            return False, error
+        disabled = self.present & _OPTIONAL_MASK & ~_enabled_mask(optional_characters)
+        if disabled:
+            return False, f"{_first_role(disabled)} is not enabled for this game."
+        return True, None
+
+    def selected_characters(self):
+        """Every role held, repeated once per holder, in ROLES order."""
+        selected = []
+        for role, count in zip(ROLES, self.counts):
+            selected += [role.name] * count
+        return selected
+
+    def remaining_slots(self):
+        """Good and Evil roles still to be picked, or None for an unplayable player count."""
+        config = PLAYER_CONFIGURATIONS.get(self.players)
+        if not config:
+            return None
+        return {'good': max(config['good'] - self.good, 0), 'evil': max(config['evil'] - self.evil, 0)}
@@ -0,0 +1,102 @@
+"""
+Replays of mutating requests retried with the same Idempotency-Key.
+
+A client on a flaky connection sends a fresh key with each action and the
+same key on every retry of it. The first request with a key runs and its
+response is stored. Later requests with that key and the same body get the
+stored response back without the action running again, so a retried create
+doesn't make a second room and a retried join doesn't fail with "Player
+name already taken".
+
+A retry that arrives while the first attempt is still running gets 409, and
+one with the same key but a different body gets 422. 5xx responses aren't
+stored, so those can be retried for real.
+
+Responses are held in an LRU bounded by entry count, total body size and
+age. Each process keeps its own; router.py sends key-carrying room creates
+to the shard the key hashes to, and every other request already reaches the
+one process that owns its room.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+# Retries come within seconds or minutes; keep responses well past that.
+TTL_SECONDS = 10 * 60
+MAX_ENTRIES = 10_000
+MAX_BYTES = 16 * 2**20
+
+
+class ResultCache:
+    """Stored responses by key, least recently used first."""
+
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES, ttl_seconds=TTL_SECONDS):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (expires_at, fingerprint, (status, headers, body))
+        self._pending = {}  # key -> fingerprint of the request still running
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def claim(self, key, fingerprint):
+        """
+        Start a request with `key`. Returns (stored response or None, error).
+
+        (None, None) means the caller runs the request and must then call
+        store() or release(). A stored (status, headers, body) is the
+        response to replay.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] <= time.monotonic():
+                self._drop(key)
+                entry = None
+            if entry:
+                if entry[1] != fingerprint:
+                    return None, 'Idempotency-Key was already used with a different request'
+                self._entries.move_to_end(key)
+                return entry[2], None
+
+            if key in self._pending:
+                return None, 'A request with this Idempotency-Key is still in progress'
+            self._pending[key] = fingerprint
+            return None, None
+
+    def store(self, key, status, headers, body):
+        """Keep the response to a claimed request for replay."""
+        with self._lock:
+            fingerprint = self._pending.pop(key, None)
+            if fingerprint is None:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, fingerprint, (status, headers, body))
+            self._bytes += len(body)
+
+            now = time.monotonic()
+            while self._entries:
+                oldest = next(iter(self._entries))
+                expires_at = self._entries[oldest][0]
+                if (len(self._entries) <= self.max_entries and self._bytes <= self.max_bytes
+                        and expires_at > now):
+                    break
+                self._drop(oldest)
+
+    def release(self, key):
+        """Give up a claim without storing anything, so the key can be retried."""
+        with self._lock:
+            self._pending.pop(key, None)
+
+    def _drop(self, key):
+        self._bytes -= len(self._entries.pop(key)[2][2])
+
+
+def fingerprint(method, path, body):
+    """Identifies a request, so a key reused for something else is caught."""
+    return hashlib.sha256(b'%s %s\n%s' % (method.encode(), path.encode(), body)).digest()
+
+
+results = ResultCache()
@@ -0,0 +1,240 @@
+"""
+Append-only journal with snapshots, so in-memory state survives restarts.
+
+The journal stores key -> value state: every record carries the full new
+value for a key (None deletes it) plus `meta`, a tuple of counters that
+only ever grow, such as id counters. Replay keeps the last record per key,
+so records are idempotent and order only matters per key. Meta is read
+without a lock, so a record can carry older counters than one queued
+before it; replay keeps the element-wise maximum.
+
+append() just queues the record. A writer thread wakes on the first record,
+waits GROUP_COMMIT_SECONDS for more to arrive, then encodes the whole batch
+as one frame, writes it and fsyncs once (group commit), so callers never
+wait on the disk. A crash loses at most the batch being gathered or written.
+
+Compaction writes every live value into a snapshot without stopping
+writers. The journal first rolls over to a new segment, then the snapshot
+is built from live state, and on restore the new segment is replayed on
+top of it. Anything the snapshot missed, or caught only half-way, is
+corrected by the later records. Segments older than the snapshot are then
+deleted.
+
+Only one process may own a directory: each rolls, compacts and deletes
+segments as if it were alone, so a second owner would delete the first
+one's records. The journal holds an exclusive flock on journal.lock from
+load() or start() until close(), and a second process fails to open it.
+
+Files:
+    journal.lock           flocked by the process that owns the directory
+    snapshot.bin           header, then one marshal blob of (values, meta)
+    journal-00000042.log   frames of: length, crc32, marshal([(key, value, meta), ...])
+
+marshal is the fastest way to store and load plain tuples, strings and
+ints. Its format depends on the Python version, so the header records the
+marshal version and a mismatched snapshot is rejected rather than misread.
+"""
+import fcntl
+import marshal
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import deque
+
+# Roll over and snapshot once the current segment grows past this.
+SNAPSHOT_AFTER_BYTES = 64 * 1024 * 1024
+
+# How long the writer lets records pile up before writing them as one batch.
+GROUP_COMMIT_SECONDS = 0.005
+
+SNAPSHOT_FILE = 'snapshot.bin'
+LOCK_FILE = 'journal.lock'
+_SNAPSHOT_HEADER = struct.Struct('<7sBQ')  # magic, marshal version, first segment to replay
+_SNAPSHOT_MAGIC = b'AVSNAP1'
+_FRAME = struct.Struct('<II')  # payload length, crc32
+
+
+def _segment_name(seq):
+    return f'journal-{seq:08d}.log'
+
+
+def _max_meta(a, b):
+    """Element-wise maximum of two meta tuples, either of which may be None."""
+    if a is None or b is None:
+        return b if a is None else a
+    return tuple(map(max, a, b))
+
+
+class Journal:
+    """Durable key -> value log in `directory`."""
+
+    def __init__(self, directory, snapshot_source, snapshot_after_bytes=SNAPSHOT_AFTER_BYTES):
+        """`snapshot_source()` returns the live (values dict, meta) to compact into a snapshot."""
+        self.directory = directory
+        self.snapshot_source = snapshot_source
+        self.snapshot_after_bytes = snapshot_after_bytes
+        self._pending = deque()
+        self._wakeup = threading.Event()
+        self._write_lock = threading.Lock()  # held while writing; rollover takes it too
+        self._compact_lock = threading.Lock()
+        self._segment = None
+        self._segment_seq = 0
+        self._segment_bytes = 0
+        self._writer = None
+        self._closed = False
+        self._lock_fd = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _claim(self):
+        """Take the directory's lock, or raise if another process holds it."""
+        if self._lock_fd is not None:
+            return
+        fd = os.open(os.path.join(self.directory, LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            raise RuntimeError(f'{self.directory} is already journaled by another process') from None
+        self._lock_fd = fd
+
+    def _segments(self):
+        """Sequence numbers of the segment files on disk, oldest first."""
+        seqs = []
+        for name in os.listdir(self.directory):
+            if name.startswith('journal-') and name.endswith('.log'):
+                seqs.append(int(name[len('journal-'):-len('.log')]))
+        return sorted(seqs)
+
+    # Restore
+
+    def _load_snapshot(self):
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        if not os.path.exists(path):
+            return {}, None, 0
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            magic, version, first_seq = _SNAPSHOT_HEADER.unpack_from(mm)
+            if magic != _SNAPSHOT_MAGIC or version != marshal.version:
+                raise RuntimeError(f'{path} was written by an incompatible version')
+            with memoryview(mm) as view, view[_SNAPSHOT_HEADER.size:] as body:
+                values, meta = marshal.loads(body)
+        return values, meta, first_seq
+
+    def load(self):
+        """Rebuild the latest state from disk. Returns (values dict, meta)."""
+        self._claim()
+        values, meta, first_seq = self._load_snapshot()
+        for seq in self._segments():
+            if seq < first_seq:
+                continue
+            with open(os.path.join(self.directory, _segment_name(seq)), 'rb') as f:
+                data = f.read()
+            offset = 0
+            while offset + _FRAME.size <= len(data):
+                length, crc = _FRAME.unpack_from(data, offset)
+                payload = data[offset + _FRAME.size:offset + _FRAME.size + length]
+                if len(payload) < length or zlib.crc32(payload) != crc:
+                    break  # torn write at the tail of a crashed segment
+                for key, value, record_meta in marshal.loads(payload):
+                    if value is None:
+                        values.pop(key, None)
+                    else:
+                        values[key] = value
+                    meta = _max_meta(meta, record_meta)
+                offset += _FRAME.size + length
+            self._segment_seq = seq
+        return values, meta
+
+    # Writing
+
+    def _open_segment(self, seq):
+        if self._segment:
+            self._segment.close()
+        self._segment_seq = seq
+        self._segment = open(os.path.join(self.directory, _segment_name(seq)), 'ab', buffering=0)
+        self._segment_bytes = 0
+
+    def start(self):
+        """Open a fresh segment, start the writer and compact whatever was replayed."""
+        self._claim()
+        self._open_segment(self._segment_seq + 1)
+        self._writer = threading.Thread(target=self._run, name='journal-writer', daemon=True)
+        self._writer.start()
+        if len(self._segments()) > 1:
+            threading.Thread(target=self.compact, name='journal-compact', daemon=True).start()
+
+    def append(self, key, value, meta):
+        """Queue the new value of `key` (None deletes it). Returns without touching the disk."""
+        self._pending.append((key, value, meta))
+        if not self._wakeup.is_set():
+            self._wakeup.set()
+
+    def _flush(self):
+        """Write and fsync everything queued so far as one batch. Caller holds _write_lock."""
+        pending = self._pending
+        if not pending:
+            return
+        batch = [pending.popleft() for _ in range(len(pending))]
+        payload = marshal.dumps(batch)
+        self._segment.write(_FRAME.pack(len(payload), zlib.crc32(payload)) + payload)
+        os.fsync(self._segment.fileno())
+        self._segment_bytes += _FRAME.size + len(payload)
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait()
+            time.sleep(GROUP_COMMIT_SECONDS)
+            self._wakeup.clear()
+            with self._write_lock:
+                self._flush()
+            if self._segment_bytes >= self.snapshot_after_bytes and not self._compact_lock.locked():
+                threading.Thread(target=self.compact, name='journal-compact', daemon=True).start()
+
+    def compact(self):
+        """Snapshot the live state and delete the segments it replaces."""
+        if not self._compact_lock.acquire(blocking=False):
+            return
+        try:
+            if self._closed:
+                return
+            with self._write_lock:
+                self._flush()
+                first_seq = self._segment_seq + 1
+                self._open_segment(first_seq)
+
+            values, meta = self.snapshot_source()
+            path = os.path.join(self.directory, SNAPSHOT_FILE)
+            with open(path + '.tmp', 'wb') as f:
+                f.write(_SNAPSHOT_HEADER.pack(_SNAPSHOT_MAGIC, marshal.version, first_seq))
+                f.write(marshal.dumps((values, meta)))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(path + '.tmp', path)
+            dir_fd = os.open(self.directory, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+
+            for seq in self._segments():
+                if seq < first_seq:
+                    os.remove(os.path.join(self.directory, _segment_name(seq)))
+        finally:
+            self._compact_lock.release()
+
+    def close(self):
+        """Write out everything queued, let a running compaction finish and stop the writer."""
+        self._closed = True
+        self._wakeup.set()
+        if self._writer:
+            self._writer.join()
+        with self._compact_lock, self._write_lock:
+            self._flush()
+            if self._segment:
+                self._segment.close()
+                self._segment = None
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)  # releases the flock
+            self._lock_fd = None
@@ -0,0 +1,947 @@
+"""
+In-memory storage backend for rooms and players.
+Only one process can serve the API since no other process can see these
+records. Data is lost when the server restarts unless open_journal() points
+the backend at a directory, in which case every change is journaled there
+and restored on the next start (see journal.py).
+
+Safe to call from multiple threads. Each room is guarded by its own lock
+(the condition in `room_conditions`), so requests for different rooms never
+contend; ids and room codes are allocated under small dedicated locks.
+"""
+import atexit
+import gc
+import heapq
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+from expiry import REAP_INTERVAL_SECONDS, ROOM_TTL_SECONDS
+from game_logic import SelectionTally, deal_characters, get_room_reveals, validate_character_selection
+from journal import Journal
+from records import Player, Room, intern_role, isoformat
+from room_codes import RoomCodeAllocator
+from room_directory import PAGE_SIZE, RoomDirectory
+from room_deltas import CHANGE_LOG_LENGTH, collect_changes, diff_shapes, room_shape
+
+# In-memory storage
+rooms = {}  # room_code -> Room
+players = {}  # player_id -> Player
+
+# Secondary indexes, kept in sync by every function that adds or removes
+# rooms or players so lookups never have to scan `rooms`.
+room_codes_by_id = {}  # room_id -> room_code
+room_codes_by_player_id = {}  # player_id -> room_code
+player_ids_by_name = {}  # room_code -> {player_name: player_id}
+
+# Every player's reveal, computed once when the game starts. Dropped by
+# anything that changes who is in a started game or takes it out of 'started'.
+reveals_by_room = {}  # room_code -> {player_id: reveal dict}
+
+# Public room directory, partitioned by status (see room_directory.py)
+directory = RoomDirectory()
+
+# Running totals of each room's role selection. Rooms restored from the
+# journal get theirs on first use (see _selection).
+room_selections = {}  # room_code -> SelectionTally
+
+# Each room's condition doubles as its lock. Long-poll waiters park on it
+# until the version moves. Rooms restored from the journal get theirs on
+# first use (see _room_condition).
+room_conditions = {}  # room_code -> threading.Condition
+
+player_id_counter = 0
+room_id_counter = 0
+_id_lock = threading.Lock()
+
+# This process's shard as (index, count); see configure_shard(). Ids and
+# room codes are only drawn from the residue class `index` modulo `count`.
+_shard = (0, 1)
+_room_codes = RoomCodeAllocator()
+
+# Min-heap of (deadline, room_code, room_id). Each room has at most one live
+# entry, recorded in expiry_deadlines; anything else in the heap is stale.
+# Activity only moves a deadline later, so the reaper re-pushes rooms that
+# turn out to still be active instead of touching the heap on every request.
+_expiry_heap = []
+expiry_deadlines = {}  # room_code -> deadline of its live heap entry
+_expiry_lock = threading.Lock()
+eviction_counts = {reason: 0 for reason in ROOM_TTL_SECONDS}
+_reaper_thread = None
+
+# Set by open_journal(); receives every room's new state after each change
+_journal = None
+
+# Latest shape of each room and the patch ops of its recent versions
+room_shapes = {}  # room_code -> shape
+room_change_logs = {}  # room_code -> deque of (version, ops)
+
+# Called with the room code whenever a room is deleted.
+room_removed_listeners = []
+
+# Called with the room code after every change to a room, under its lock.
+room_changed_listeners = []
+
+
+def _shape(room):
+    return room_shape(room.status, room.host_player_id, room.optional_characters,
+                      [(pid, players[pid].character_role) for pid in room.player_ids])
+
+
+def _bump_version(room):
+    """Mark a room as changed and wake anyone waiting on it. Every mutation must call this."""
+    room.version += 1
+    room.last_active_at = int(time.time())
+    _schedule_expiry(room)
+    directory.place(room.room_code, room.status)
+
+    # Rooms restored from the journal start without a shape, so their first
+    # change can't be expressed as ops
+    room_code = room.room_code
+    shape = _shape(room)
+    previous = room_shapes.get(room_code)
+    ops = None if previous is None else diff_shapes(previous, shape, lambda pid: players[pid].to_dict())
+    room_shapes[room_code] = shape
+    log = room_change_logs.get(room_code)
+    if log is None:
+        log = room_change_logs[room_code] = deque(maxlen=CHANGE_LOG_LENGTH)
+    log.append((room.version, ops))
+
+    if _journal:
+        _journal.append(room_code, _room_record(room), (player_id_counter, room_id_counter))
+
+    condition = room_conditions.get(room.room_code)
+    if condition:
+        with condition:
+            condition.notify_all()
+    for listener in room_changed_listeners:
+        listener(room.room_code)
+
+
+def _expiry_reason(room):
+    """Which TTL applies to a room."""
+    return room.status if room.player_ids else 'empty'
+
+
+def _schedule_expiry(room):
+    """Make sure the room's heap entry is no later than its current deadline."""
+    room_code = room.room_code
+    deadline = room.last_active_at + ROOM_TTL_SECONDS[_expiry_reason(room)]
+    with _expiry_lock:
+        scheduled = expiry_deadlines.get(room_code)
+        if scheduled is None or deadline < scheduled:
+            expiry_deadlines[room_code] = deadline
+            heapq.heappush(_expiry_heap, (deadline, room_code, room.id))
+
+
+def _remove_room(room_code):
+    """Delete a room, its players and every index entry pointing at them. Caller holds the room lock."""
+    room = rooms.pop(room_code, None)
+    if not room:
+        return
+
+    room_codes_by_id.pop(room.id, None)
+    for pid in room.player_ids:
+        players.pop(pid, None)
+        room_codes_by_player_id.pop(pid, None)
+    player_ids_by_name.pop(room_code, None)
+    reveals_by_room.pop(room_code, None)
+    room_selections.pop(room_code, None)
+    directory.remove(room_code)
+    room_shapes.pop(room_code, None)
+    room_change_logs.pop(room_code, None)
+    with _expiry_lock:
+        expiry_deadlines.pop(room_code, None)
+
+    # Wake waiters so they see the room is gone
+    condition = room_conditions.pop(room_code, None)
+    if condition:
+        with condition:
+            condition.notify_all()
+
+    for listener in room_removed_listeners:
+        listener(room_code)
+
+    if _journal:
+        _journal.append(room_code, None, (player_id_counter, room_id_counter))
+    _room_codes.release(room_code)
+
+
+def reap_expired(now=None):
+    """
+    Evict every room whose TTL has passed.
+
+    Costs O(log n) per expired or rescheduled room rather than a sweep over
+    all rooms. Returns the number of rooms evicted.
+    """
+    if now is None:
+        now = time.time()
+
+    # Pop due entries first, then check each room under its own lock; room
+    # locks are always taken before _expiry_lock, never the other way round.
+    due = []
+    with _expiry_lock:
+        while _expiry_heap and _expiry_heap[0][0] <= now:
+            deadline, room_code, room_id = heapq.heappop(_expiry_heap)
+            if expiry_deadlines.get(room_code) == deadline:
+                del expiry_deadlines[room_code]
+                due.append((room_code, room_id))
+
+    evicted = 0
+    for room_code, room_id in due:
+        with _locked_room(room_code) as room:
+            if not room or room.id != room_id:
+                continue
+
+            reason = _expiry_reason(room)
+            if room.last_active_at + ROOM_TTL_SECONDS[reason] > now:
+                _schedule_expiry(room)
+                continue
+
+            with _expiry_lock:
+                eviction_counts[reason] += 1
+            evicted += 1
+            _remove_room(room_code)
+
+    return evicted
+
+
+def start_reaper(interval=None):
+    """Start the background thread that evicts idle rooms. Safe to call more than once."""
+    global _reaper_thread
+    if _reaper_thread and _reaper_thread.is_alive():
+        return
+
+    def run():
+        while True:
+            time.sleep(interval or REAP_INTERVAL_SECONDS)
+            reap_expired()
+
+    _reaper_thread = threading.Thread(target=run, name='room-reaper', daemon=True)
+    _reaper_thread.start()
+
+
+def get_expiry_stats():
+    """Eviction counters by reason plus the number of rooms awaiting expiry."""
+    return {
+        'evicted': dict(eviction_counts),
+        'scheduled': len(expiry_deadlines)
+    }
+
+
+def count_rooms():
+    """Number of live rooms."""
+    return len(rooms)
+
+
+def get_room_stats():
+    """Live rooms by status and by player count, plus the number of live players."""
+    by_status = defaultdict(int)
+    by_player_count = defaultdict(int)
+    for room in list(rooms.values()):
+        by_status[room.status] += 1
+        by_player_count[room.player_count] += 1
+    return {
+        'rooms_by_status': dict(by_status),
+        'rooms_by_player_count': dict(by_player_count),
+        'players': len(players)
+    }
+
+
+def add_room_removed_listener(listener):
+    """Call `listener(room_code)` whenever a room is deleted."""
+    room_removed_listeners.append(listener)
+
+
+def add_room_changed_listener(listener):
+    """Call `listener(room_code)` after every change to a room. It must not block."""
+    room_changed_listeners.append(listener)
+
+
+def touch_player(player_id):
+    """Record activity from a player without changing any state."""
+    player = players.get(player_id)
+    if not player:
+        return
+    now = int(time.time())
+    player.last_active_at = now
+    room = rooms.get(room_codes_by_player_id.get(player_id))
+    if room:
+        room.last_active_at = now
+
+
+def _forget_player(room_code, player_id):
+    """Remove a player record and its index entries."""
+    player = players.pop(player_id, None)
+    room_codes_by_player_id.pop(player_id, None)
+    if player:
+        player_ids_by_name[room_code].pop(player.player_name, None)
+
+
+def reset():
+    """Drop all rooms and players. Used by benchmarks."""
+    global player_id_counter, room_id_counter, _room_codes
+    if _journal:
+        for room_code in list(rooms):
+            _journal.append(room_code, None, (player_id_counter, room_id_counter))
+    rooms.clear()
+    players.clear()
+    room_codes_by_id.clear()
+    room_codes_by_player_id.clear()
+    player_ids_by_name.clear()
+    reveals_by_room.clear()
+    room_selections.clear()
+    directory.clear()
+    room_shapes.clear()
+    room_change_logs.clear()
+    room_conditions.clear()
+    with _expiry_lock:
+        _expiry_heap.clear()
+        expiry_deadlines.clear()
+    player_id_counter = 0
+    room_id_counter = 0
+    _room_codes = RoomCodeAllocator(offset=_shard[0], stride=_shard[1])
+
+
+def _room_record(room):
+    """
+    A room and its players as plain tuples for the journal. Caller holds the room lock.
+
+    Seats are flattened into one tuple of six fields per player, which keeps
+    snapshots small and quick to load.
+    """
+    seats = []
+    for player_id in room.player_ids:
+        p = players[player_id]
+        seats += (p.id, p.player_name, p.character_role, p.is_host, p.joined_at, p.last_active_at)
+    return (room.id, room.host_player_id, room.status, room.optional_characters,
+            room.created_at, room.version, room.last_active_at, tuple(seats))
+
+
+def _journal_snapshot():
+    """Every live room as journal values, for compaction."""
+    values = {}
+    for room_code in list(rooms):
+        with _locked_room(room_code) as room:
+            if room:
+                values[room_code] = _room_record(room)
+    return values, (player_id_counter, room_id_counter)
+
+
+def _restore(values, meta):
+    """Rebuild every structure from journaled rooms. Only called before serving starts."""
+    global player_id_counter, room_id_counter, _room_codes
+    player_id_counter, room_id_counter = meta or (0, 0)
+
+    # Positional construction and no per-room locks: this loop runs once per
+    # player and has to get through 100k rooms in well under a second
+    for room_code, record in values.items():
+        room_id, host_player_id, status, optional_characters, created_at, version, last_active_at, seats = record
+        player_ids = []
+        names = {}
+        fields = iter(seats)
+        for player_id, player_name, role, is_host, joined_at, player_last_active_at in zip(*[fields] * 6):
+            players[player_id] = Player(player_id, room_id, player_name, role and sys.intern(role),
+                                        is_host, joined_at, player_last_active_at)
+            room_codes_by_player_id[player_id] = room_code
+            player_ids.append(player_id)
+            names[player_name] = player_id
+        room = Room(room_id, room_code, host_player_id, sys.intern(status),
+                    tuple(map(intern_role, optional_characters)), created_at, player_ids, version, last_active_at)
+
+        rooms[room_code] = room
+        room_codes_by_id[room_id] = room_code
+        player_ids_by_name[room_code] = names
+        directory.place(room_code, room.status)
+        deadline = last_active_at + ROOM_TTL_SECONDS[_expiry_reason(room)]
+        expiry_deadlines[room_code] = deadline
+        _expiry_heap.append((deadline, room_code, room_id))
+
+    heapq.heapify(_expiry_heap)
+    index, count = _shard
+    # Never hand out an id a restored room or player already holds
+    player_id_counter = max(player_id_counter, max(players, default=0) // count)
+    room_id_counter = max(room_id_counter, max(room_codes_by_id, default=0) // count)
+    if any(int(room_code) % count != index for room_code in rooms):
+        raise RuntimeError(f'Journal holds rooms that belong to another shard than {index}/{count}')
+    _room_codes = RoomCodeAllocator(in_use=rooms, offset=index, stride=count)
+
+
+def open_journal(directory):
+    """
+    Restore the rooms journaled in `directory`, then journal every change there.
+
+    Must be called before any room is created.
+    """
+    global _journal
+    journal = Journal(directory, _journal_snapshot)
+
+    # Restoring creates millions of long-lived objects. Keeping the cyclic
+    # collector from rescanning them as they pile up halves the restore
+    # time, and freezing them afterwards keeps later collections cheap.
+    gc.disable()
+    try:
+        _restore(*journal.load())
+    finally:
+        gc.enable()
+    gc.freeze()
+
+    journal.start()
+    atexit.register(journal.close)
+    _journal = journal
+
+
+def configure_shard(index, count):
+    """
+    Make this process shard `index` of `count` (see sharding.py).
+
+    Must be called before any room is created or open_journal() is called.
+    """
+    global _shard, _room_codes
+    if rooms:
+        raise RuntimeError('configure_shard() must be called before any room exists')
+    _shard = (index, count)
+    _room_codes = RoomCodeAllocator(offset=index, stride=count)
+
+
+def generate_room_code():
+    """Generate a unique 6-digit room code."""
+    return _room_codes.allocate()
+
+
+def _allocate_player_id():
+    global player_id_counter
+    with _id_lock:
+        player_id_counter += 1
+        return player_id_counter * _shard[1] + _shard[0]
+
+
+def _allocate_room_id():
+    global room_id_counter
+    with _id_lock:
+        room_id_counter += 1
+        return room_id_counter * _shard[1] + _shard[0]
+
+
+def _selection(room):
+    """The room's SelectionTally, built from its players the first time. Caller holds the room lock."""
+    tally = room_selections.get(room.room_code)
+    if tally is None:
+        tally = room_selections[room.room_code] = SelectionTally(
+            [players[pid].character_role for pid in room.player_ids])
+    return tally
+
+
+def _room_condition(room_code):
+    """The room's condition, or None if there is no such room."""
+    condition = room_conditions.get(room_code)
+    if condition is None and room_code in rooms:
+        # If the room is deleted before this lands, _locked_room still sees
+        # it gone, and a new room with this code replaces the entry
+        condition = room_conditions.setdefault(room_code, threading.Condition())
+    return condition
+
+
+@contextmanager
+def _locked_room(room_code):
+    """
+    Hold a room's lock for the duration of the block.
+
+    Yields the room, or None if it does not exist (or was deleted while we
+    waited for the lock). Rooms never share a lock, so unrelated rooms never
+    contend.
+    """
+    condition = _room_condition(room_code)
+    if not condition:
+        yield None
+        return
+
+    with condition:
+        if room_conditions.get(room_code) is not condition:
+            yield None
+        else:
+            yield rooms.get(room_code)
+
+
+def create_room(player_name):
+    """Create a new room and add the creator as host."""
+    room_id = _allocate_room_id()
+    player_id = _allocate_player_id()
+    now = int(time.time())
+
+    player = Player(
+        id=player_id,
+        room_id=room_id,
+        player_name=player_name,
+        is_host=True,
+        joined_at=now,
+        last_active_at=now
+    )
+
+    room_code = generate_room_code()
+    room = Room(
+        id=room_id,
+        room_code=room_code,
+        host_player_id=player_id,
+        created_at=now,
+        player_ids=[player_id],
+        last_active_at=now
+    )
+
+    players[player_id] = player
+    room_codes_by_id[room_id] = room_code
+    room_codes_by_player_id[player_id] = room_code
+    player_ids_by_name[room_code] = {player_name: player_id}
+    room_selections[room_code] = SelectionTally([None])
+    room_conditions[room_code] = threading.Condition()
+    room_shapes[room_code] = _shape(room)
+    room_change_logs[room_code] = deque(maxlen=CHANGE_LOG_LENGTH)
+    if _journal:
+        _journal.append(room_code, _room_record(room), (player_id_counter, room_id_counter))
+    # Publish the room last so readers never see it half-indexed
+    rooms[room_code] = room
+    directory.place(room_code, room.status)
+    _schedule_expiry(room)
+
+    return room, player
+
+
+def join_room(room_code, player_name):
+    """Join an existing room."""
+    with _locked_room(room_code) as room:
+        if not room:
+            return None, None, 'Room not found'
+
+        if room.status == 'started':
+            return None, None, 'Game has already started'
+
+        # Check if player name is already taken
+        names = player_ids_by_name[room_code]
+        if player_name in names:
+            return None, None, 'Player name already taken in this room'
+
+        player_id = _allocate_player_id()
+
+        now = int(time.time())
+        player = Player(
+            id=player_id,
+            room_id=room.id,
+            player_name=player_name,
+            joined_at=now,
+            last_active_at=now
+        )
+
+        players[player_id] = player
+        room.player_ids.append(player_id)
+        room_codes_by_player_id[player_id] = room_code
+        names[player_name] = player_id
+        _selection(room).add()
+        _bump_version(room)
+
+        return room, player, None
+
+
+def get_room(room_code):
+    """Get room by code."""
+    return rooms.get(room_code)
+
+
+def get_room_with_players(room_code, cleanup=False):
+    """Get the room and its full player list as one consistent API dict."""
+    with _locked_room(room_code) as room:
+        if not room:
+            return None
+
+        room_data = room.to_dict()
+        room_data['players'] = [players[pid].to_dict() for pid in room.player_ids]
+        return room_data
+
+
+def wait_for_change(room_code, since, timeout):
+    """
+    Block until the room's version is greater than `since` or `timeout` seconds pass.
+
+    Returns the room (changed or not), or None if the room does not exist or
+    is deleted while waiting.
+    """
+    room = rooms.get(room_code)
+    condition = _room_condition(room_code)
+    if not room or not condition:
+        return None
+
+    def changed():
+        return rooms.get(room_code) is not room or room.version > since
+
+    with condition:
+        condition.wait_for(changed, timeout)
+    return room if rooms.get(room_code) is room else None
+
+
+def get_room_changes(room_code, since):
+    """
+    Patch ops taking the room from version `since` to its current version.
+
+    Returns {'since', 'version', 'changes'}, or None if the room does not exist
+    or `since` is older than its change log.
+    """
+    with _locked_room(room_code) as room:
+        if not room:
+            return None
+        return collect_changes(room_change_logs.get(room_code), since, room.version)
+
+
+def get_player(player_id):
+    """Get player by ID."""
+    return players.get(player_id)
+
+
+def configure_room(room_code, player_id, optional_characters):
+    """Configure optional characters for a room."""
+    with _locked_room(room_code) as room:
+        if not room:
+            return None, 'Room not found'
+
+        if room.host_player_id != player_id:
+            return None, 'Only the host can configure the room'
+
+        if room.status != 'waiting':
+            return None, 'Cannot configure room after character selection has started'
+
+        room.optional_characters = tuple(intern_role(c) for c in optional_characters)
+        room.status = 'character_selection'
+        _bump_version(room)
+
+        return room, None
+
+
+def select_character(player_id, character):
+    """Player selects their character."""
+    room_code = room_codes_by_player_id.get(player_id)
+    if room_code is None:
+        return None, 'Player not found'
+
+    with _locked_room(room_code) as room:
+        player = players.get(player_id)
+        if not player:
+            return None, 'Player not found'
+
+        if not room or player_id not in room.player_ids:
+            return None, 'Room not found'
+
+        if room.status != 'character_selection':
+            return None, 'Character selection is not active'
+
+        # Unique characters can only be held by one player
+        tally = _selection(room)
+        if player.character_role != character and tally.is_taken(character):
+            return None, 'Character already selected by another player'
+
+        tally.change(player.character_role, character)
+        player.character_role = intern_role(character)
+        _bump_version(room)
+        return player, None
+
+
+def start_game(room_code, player_id):
+    """Start the game once the selection is complete and valid."""
+    with _locked_room(room_code) as room:
+        if not room:
+            return None, 'Room not found'
+
+        if room.host_player_id != player_id:
+            return None, 'Only the host can start the game'
+
+        if room.status != 'character_selection':
+            return None, 'Cannot start game from current state'
+
+        tally = _selection(room)
+        if tally.unassigned:
+            return None, 'All players must select a character first'
+
+        # Validate under the lock so no one can change role between check and start
+        is_valid, error = tally.validate(room.optional_characters)
+        if not is_valid:
+            return None, error
+
+        room.status = 'started'
+        reveals_by_room[room_code] = _compute_reveals(room)
+        _bump_version(room)
+        return room, None
+
+
+def deal_game(room_code, player_id, optional_characters=None):
+    """
+    Deal every player a random role and start the game in one step (host
+    only). Uses `optional_characters` if given, else the room's own.
+    """
+    with _locked_room(room_code) as room:
+        if not room:
+            return None, 'Room not found'
+
+        if room.host_player_id != player_id:
+            return None, 'Only the host can deal characters'
+
+        if room.status not in ('waiting', 'character_selection'):
+            return None, 'Cannot deal characters from current state'
+
+        if optional_characters is None:
+            optional_characters = room.optional_characters
+        roles, error = deal_characters(len(room.player_ids), optional_characters)
+        if error:
+            return None, error
+
+        # A deal must pass the same rules a hand-picked selection does
+        is_valid, error = validate_character_selection(
+            [{'character_role': role} for role in roles], optional_characters)
+        if not is_valid:
+            return None, error
+
+        room.optional_characters = tuple(intern_role(c) for c in optional_characters)
+        for pid, role in zip(room.player_ids, roles):
+            players[pid].character_role = intern_role(role)
+        room_selections[room_code] = SelectionTally(roles)
+
+        room.status = 'started'
+        reveals_by_room[room_code] = _compute_reveals(room)
+        _bump_version(room)
+        return room, None
+
+
+def _compute_reveals(room):
+    """Reveal payload for every player in a started room. Caller holds the room lock."""
+    all_players = [{'player_name': players[pid].player_name, 'character_role': players[pid].character_role}
+                   for pid in room.player_ids]
+    return dict(zip(room.player_ids, get_room_reveals(all_players)))
+
+
+def get_reveal(player_id):
+    """Get what a player's character knows once the game has started."""
+    room_code = room_codes_by_player_id.get(player_id)
+    if room_code is None or player_id not in players:
+        return None, 'Player not found'
+
+    # Reveals only exist while the game is started, so a hit needs no checks
+    reveals = reveals_by_room.get(room_code)
+    if reveals and player_id in reveals:
+        return reveals[player_id], None
+
+    with _locked_room(room_code) as room:
+        if not room:
+            return None, 'Room not found'
+
+        if room.status != 'started':
+            return None, 'Game has not started yet'
+
+        player = players.get(player_id)
+        if not player or player_id not in room.player_ids:
+            return None, 'Player not found'
+
+        if not player.character_role:
+            return None, 'Player has not selected a character'
+
+        reveals = reveals_by_room.get(room_code)
+        if reveals is None:
+            reveals = reveals_by_room[room_code] = _compute_reveals(room)
+        return reveals[player_id], None
+
+
+def get_session(player_id):
+    """
+    Everything one player's client needs, read under a single room lock.
+
+    Returns (session, error). The session holds the room as an API dict with
+    its players, the player's own API dict, their reveal once the game has
+    started (None before that), every role held in role order, and the Good
+    and Evil slots still open.
+    """
+    room_code = room_codes_by_player_id.get(player_id)
+    if room_code is None:
+        return None, 'Player not found'
+
+    with _locked_room(room_code) as room:
+        player = players.get(player_id)
+        if not room or not player or player_id not in room.player_ids:
+            return None, 'Player not found'
+
+        room_data = room.to_dict()
+        room_data['players'] = [players[pid].to_dict() for pid in room.player_ids]
+
+        reveal = None
+        if room.status == 'started':
+            reveals = reveals_by_room.get(room_code)
+            if reveals is None:
+                reveals = reveals_by_room[room_code] = _compute_reveals(room)
+            reveal = reveals[player_id]
+
+        tally = _selection(room)
+        return {
+            'room': room_data,
+            'player': player.to_dict(),
+            'reveals': reveal,
+            'selected_characters': tally.selected_characters(),
+            'remaining_slots': tally.remaining_slots()
+        }, None
+
+
+def get_selection(room_code):
+    """
+    The room's role selection so far: every role held, in role order, and
+    the Good and Evil slots still open. None if the room doesn't exist.
+    """
+    with _locked_room(room_code) as room:
+        if not room:
+            return None
+        tally = _selection(room)
+        return {'selected_characters': tally.selected_characters(), 'remaining_slots': tally.remaining_slots()}
+
+
+def list_rooms(status, min_players=1, cursor=0, limit=PAGE_SIZE):
+    """
+    A page of the public room directory: rooms in `status` with at least
+    `min_players` players, in the order they entered that status. `cursor`
+    is the previous page's next_cursor, or 0 for the first page.
+    """
+    def accept(room_code):
+        room = rooms.get(room_code)
+        return room is not None and room.player_count >= min_players
+
+    room_codes, next_cursor = directory.page(status, cursor, limit, accept)
+    listed = []
+    for room_code in room_codes:
+        room = rooms.get(room_code)
+        host = room and players.get(room.host_player_id)
+        if room:
+            listed.append({
+                'room_code': room_code,
+                'status': room.status,
+                'player_count': room.player_count,
+                'host_name': host.player_name if host else None,
+                'created_at': isoformat(room.created_at)
+            })
+    return {'rooms': listed, 'next_cursor': next_cursor}
+
+
+def get_players_in_room(room_code):
+    """Get all players in a room."""
+    with _locked_room(room_code) as room:
+        if not room:
+            return []
+
+        return [players[pid] for pid in room.player_ids]
+
+
+def get_room_by_player_id(player_id):
+    """Get the room a player is in."""
+    room_code = room_codes_by_player_id.get(player_id)
+    if room_code is None:
+        return None
+    return rooms.get(room_code)
+
+
+def get_room_by_id(room_id):
+    """Get room by its numeric ID."""
+    room_code = room_codes_by_id.get(room_id)
+    if room_code is None:
+        return None
+    return rooms.get(room_code)
+
+
+def reset_game(room_code, player_id):
+    """Reset game back to character selection (host only)."""
+    with _locked_room(room_code) as room:
+        if not room:
+            return None, 'Room not found'
+
+        if room.host_player_id != player_id:
+            return None, 'Only the host can reset the game'
+
+        # Clear all player character selections
+        for pid in room.player_ids:
+            players[pid].character_role = None
+        _selection(room).clear()
+
+        # Reset room status to character selection
+        room.status = 'character_selection'
+        reveals_by_room.pop(room_code, None)
+        _bump_version(room)
+
+        return room, None
+
+
+def kick_player(room_code, host_player_id, player_id_to_kick):
+    """Kick a player from the room (host only)."""
+    with _locked_room(room_code) as room:
+        if not room:
+            return None, 'Room not found'
+
+        if room.host_player_id != host_player_id:
+            return None, 'Only the host can kick players'
+
+        if player_id_to_kick == host_player_id:
+            return None, 'Cannot kick yourself'
+
+        if player_id_to_kick not in room.player_ids:
+            return None, 'Player not in this room'
+
+        # Remove player from room
+        _selection(room).remove(players[player_id_to_kick].character_role)
+        room.player_ids.remove(player_id_to_kick)
+
+        # Remove player data
+        _forget_player(room_code, player_id_to_kick)
+        reveals_by_room.pop(room_code, None)
+        _bump_version(room)
+
+        return room, None
+
+
+def leave_room(room_code, player_id):
+    """Player leaves the room. Reassigns host if needed."""
+    with _locked_room(room_code) as room:
+        if not room:
+            return None, 'Room not found'
+
+        if player_id not in room.player_ids:
+            return None, 'Player not in this room'
+
+        # Remove player from room
+        _selection(room).remove(players[player_id].character_role)
+        room.player_ids.remove(player_id)
+
+        # Remove player data
+        _forget_player(room_code, player_id)
+        reveals_by_room.pop(room_code, None)
+
+        # If host left, assign new host to first remaining player
+        if room.host_player_id == player_id and room.player_ids:
+            new_host_id = room.player_ids[0]
+            room.host_player_id = new_host_id
+            players[new_host_id].is_host = True
+
+        _bump_version(room)
+        return room, None
+
+
+def back_to_lobby(room_code, player_id):
+    """Go back to lobby/waiting stage (host only)."""
+    with _locked_room(room_code) as room:
+        if not room:
+            return None, 'Room not found'
+
+        if room.host_player_id != player_id:
+            return None, 'Only the host can change room status'
+
+        # Clear all player character selections
+        for pid in room.player_ids:
+            if pid in players:
+                players[pid].character_role = None
+        _selection(room).clear()
+
+        # Reset room status to waiting
+        room.status = 'waiting'
+        reveals_by_room.pop(room_code, None)
+        _bump_version(room)
+
+        return room, None
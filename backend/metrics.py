@@ -0,0 +1,171 @@
+"""
+Request metrics in Prometheus text format.
+
+Recording a request touches only the calling thread's own accumulator, so
+the hot path takes no lock. A scrape merges every thread's accumulator into
+one view. Threads come and go with connections, so a dead thread's counts
+are folded into a shared total and its accumulator dropped, which keeps the
+registry bounded by the number of live threads.
+"""
+import bisect
+import threading
+import weakref
+
+# Upper bounds of the latency histogram buckets, in seconds. Long-poll and
+# event-stream requests land in the top buckets by design.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Registering this many accumulators triggers a sweep of dead threads even if
+# nothing scrapes.
+_SWEEP_EVERY = 64
+
+
+class _Accumulator:
+    """One thread's counters: (method, route) -> [bucket counts..., sum] and status counts."""
+
+    __slots__ = ('latencies', 'statuses')
+
+    def __init__(self):
+        self.latencies = {}
+        self.statuses = {}
+
+
+_local = threading.local()
+_registry = []  # (weakref to thread, accumulator)
+_registry_lock = threading.Lock()
+_registered_since_sweep = 0
+_retired = _Accumulator()
+
+
+def _merge_into(target, source):
+    for key, values in list(source.latencies.items()):
+        totals = target.latencies.get(key)
+        if totals is None:
+            target.latencies[key] = list(values)
+        else:
+            for i, value in enumerate(values):
+                totals[i] += value
+    for key, count in list(source.statuses.items()):
+        target.statuses[key] = target.statuses.get(key, 0) + count
+
+
+def _sweep_dead_threads():
+    """Fold accumulators of finished threads into _retired. Caller holds _registry_lock."""
+    global _registered_since_sweep
+    alive = []
+    for thread_ref, accumulator in _registry:
+        thread = thread_ref()
+        if thread is not None and thread.is_alive():
+            alive.append((thread_ref, accumulator))
+        else:
+            _merge_into(_retired, accumulator)
+    _registry[:] = alive
+    _registered_since_sweep = 0
+
+
+def _accumulator():
+    accumulator = getattr(_local, 'accumulator', None)
+    if accumulator is None:
+        global _registered_since_sweep
+        accumulator = _local.accumulator = _Accumulator()
+        with _registry_lock:
+            _registry.append((weakref.ref(threading.current_thread()), accumulator))
+            _registered_since_sweep += 1
+            if _registered_since_sweep >= _SWEEP_EVERY:
+                _sweep_dead_threads()
+    return accumulator
+
+
+def record(method, route, status, seconds):
+    """Count one finished request."""
+    accumulator = _accumulator()
+    key = (method, route)
+    values = accumulator.latencies.get(key)
+    if values is None:
+        values = accumulator.latencies[key] = [0] * (len(LATENCY_BUCKETS) + 2)
+    values[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+    values[-1] += seconds
+    key = (method, route, status)
+    accumulator.statuses[key] = accumulator.statuses.get(key, 0) + 1
+
+
+def snapshot():
+    """Merged counters from every thread, live and finished."""
+    merged = _Accumulator()
+    with _registry_lock:
+        _sweep_dead_threads()
+        _merge_into(merged, _retired)
+        for _, accumulator in _registry:
+            _merge_into(merged, accumulator)
+    return merged
+
+
+def reset():
+    """Forget every recorded request. Used by benchmarks."""
+    with _registry_lock:
+        for _, accumulator in _registry:
+            accumulator.latencies.clear()
+            accumulator.statuses.clear()
+        _retired.latencies.clear()
+        _retired.statuses.clear()
+
+
+def _labels(**labels):
+    return ','.join(f'{name}="{value}"' for name, value in labels.items())
+
+
+def render(room_stats):
+    """The Prometheus exposition text for every request metric plus `room_stats` gauges."""
+    merged = snapshot()
+    lines = [
+        '# HELP avalon_requests_total Requests handled, by route and status code.',
+        '# TYPE avalon_requests_total counter'
+    ]
+    for (method, route, status), count in sorted(merged.statuses.items()):
+        lines.append(f'avalon_requests_total{{{_labels(method=method, route=route, status=status)}}} {count}')
+
+    lines += [
+        '# HELP avalon_request_errors_total Requests answered with a 4xx or 5xx status.',
+        '# TYPE avalon_request_errors_total counter'
+    ]
+    for (method, route, status), count in sorted(merged.statuses.items()):
+        if status >= 400:
+            lines.append(
+                f'avalon_request_errors_total{{{_labels(method=method, route=route, status=status)}}} {count}'
+            )
+
+    lines += [
+        '# HELP avalon_request_duration_seconds Time to produce a response, by route.',
+        '# TYPE avalon_request_duration_seconds histogram'
+    ]
+    for (method, route), values in sorted(merged.latencies.items()):
+        labels = _labels(method=method, route=route)
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, values):
+            cumulative += count
+            lines.append(f'avalon_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        cumulative += values[len(LATENCY_BUCKETS)]
+        lines.append(f'avalon_request_duration_seconds_bucket{{{labels},le="+Inf"}} {cumulative}')
+        lines.append(f'avalon_request_duration_seconds_sum{{{labels}}} {values[-1]}')
+        lines.append(f'avalon_request_duration_seconds_count{{{labels}}} {cumulative}')
+
+    lines += [
+        '# HELP avalon_rooms Live rooms by status.',
+        '# TYPE avalon_rooms gauge'
+    ]
+    for status, count in sorted(room_stats['rooms_by_status'].items()):
+        lines.append(f'avalon_rooms{{{_labels(status=status)}}} {count}')
+
+    lines += [
+        '# HELP avalon_rooms_by_player_count Live rooms by number of players inside.',
+        '# TYPE avalon_rooms_by_player_count gauge'
+    ]
+    for player_count, count in sorted(room_stats['rooms_by_player_count'].items()):
+        lines.append(f'avalon_rooms_by_player_count{{{_labels(players=player_count)}}} {count}')
+
+    lines += [
+        '# HELP avalon_players Live players across all rooms.',
+        '# TYPE avalon_players gauge',
+        f'avalon_players {room_stats["players"]}'
+    ]
+    return '\n'.join(lines) + '\n'
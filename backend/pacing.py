@@ -0,0 +1,115 @@
+"""
+How often clients should poll, decided by the server.
+
+Every polled response (room, session, reveal) carries `next_poll_ms`, and
+the same value in an X-Next-Poll-Ms header so bodiless 304s carry it too.
+The hint starts from a per-status interval, so selection stays snappy while
+a started game, whose reveals never change, is polled rarely. It then backs
+off while the room sits unchanged and stretches further as the server gets
+busy.
+
+Load is the larger of in-flight requests against OVERLOAD_IN_FLIGHT and
+event loop lag against OVERLOAD_LOOP_LAG_SECONDS. Below half of either the
+hints are the plain per-status ones, so pacing costs nothing when idle. At
+SHED_LOAD, polls are answered with 503 and Retry-After before any storage
+work is done; mutations are never shed.
+
+A room's quiet time is measured from when this process first served its
+current version. That works the same on every backend, including SQLite
+rooms changed by other worker processes. Those times are kept for the
+MAX_TRACKED_ROOMS most recently polled rooms, since a room's removal is only
+seen by the process that removed it.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+
+# Poll interval right after a change, and the most it backs off to while quiet.
+POLL_MS = {'waiting': 2000, 'character_selection': 1000, 'started': 10000}
+MAX_POLL_MS = {'waiting': 5000, 'character_selection': 3000, 'started': 30000}
+
+# A quiet room's interval doubles every this many seconds, up to MAX_POLL_MS.
+BACKOFF_DOUBLING_SECONDS = 30
+
+# Load 1.0 is this many requests in flight, or this much event loop lag.
+OVERLOAD_IN_FLIGHT = 64
+OVERLOAD_LOOP_LAG_SECONDS = 0.25
+
+# Hints start stretching above this load, and polls are shed at SHED_LOAD.
+STRETCH_LOAD = 0.5
+SHED_LOAD = 1.0
+
+# Longest hint ever given, however loaded the server is.
+CEILING_MS = 60000
+
+# Rooms whose quiet time is tracked; the least recently polled are dropped first.
+MAX_TRACKED_ROOMS = 100_000
+
+_seen = OrderedDict()  # room_code -> (room_id, version, monotonic time it was first served)
+_seen_lock = threading.Lock()
+_in_flight = 0
+_in_flight_lock = threading.Lock()
+_loop_lag = 0.0
+
+
+def request_started():
+    global _in_flight
+    with _in_flight_lock:
+        _in_flight += 1
+
+
+def request_finished():
+    global _in_flight
+    with _in_flight_lock:
+        _in_flight -= 1
+
+
+def report_loop_lag(seconds):
+    """Latest measured event loop lag, from the ASGI server."""
+    global _loop_lag
+    _loop_lag = seconds
+
+
+def current_load():
+    """0 when idle, 1.0 at overload."""
+    return max(_in_flight / OVERLOAD_IN_FLIGHT, _loop_lag / OVERLOAD_LOOP_LAG_SECONDS)
+
+
+def forget_room(room_code):
+    with _seen_lock:
+        _seen.pop(room_code, None)
+
+
+def next_poll_ms(room):
+    """Milliseconds a client should wait before polling `room` again."""
+    now = time.monotonic()
+    with _seen_lock:
+        seen = _seen.get(room.room_code)
+        if seen and seen[0] == room.id and seen[1] == room.version:
+            quiet = now - seen[2]
+        else:
+            _seen[room.room_code] = (room.id, room.version, now)
+            quiet = 0
+        _seen.move_to_end(room.room_code)
+        if len(_seen) > MAX_TRACKED_ROOMS:
+            _seen.popitem(last=False)
+
+    interval = min(POLL_MS[room.status] * 2 ** (quiet / BACKOFF_DOUBLING_SECONDS), MAX_POLL_MS[room.status])
+    load = current_load()
+    if load > STRETCH_LOAD:
+        interval *= load / STRETCH_LOAD
+    return int(min(interval, CEILING_MS))
+
+
+def shed_poll_ms():
+    """How long a shed poll should wait, or None if the server isn't overloaded."""
+    load = current_load()
+    if load < SHED_LOAD:
+        return None
+    return int(min(max(POLL_MS.values()) * load, CEILING_MS))
+
+
+def retry_after(poll_ms):
+    """Retry-After header value (whole seconds) for a hint."""
+    return str(math.ceil(poll_ms / 1000))
@@ -0,0 +1,73 @@
+"""
+Record types for rooms and players.
+
+Storage keeps these instead of dicts: slotted classes carry no per-instance
+__dict__ or repeated key strings, timestamps are integer epoch seconds, and
+role and status strings are interned so every record shares one copy.
+to_dict() builds the JSON shape the frontend expects and is only called at
+the API boundary.
+"""
+import sys
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+
+
+def intern_role(role):
+    """Share one string object per role name across all players."""
+    return None if role is None else sys.intern(role)
+
+
+def isoformat(timestamp):
+    """Render an epoch timestamp the way the API always has: naive UTC ISO-8601."""
+    return datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None).isoformat()
+
+
+@dataclass(slots=True, eq=False)
+class Player:
+    id: int
+    room_id: int
+    player_name: str
+    character_role: str = None
+    is_host: bool = False
+    joined_at: int = 0
+    last_active_at: int = 0
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'room_id': self.room_id,
+            'player_name': self.player_name,
+            'character_role': self.character_role,
+            'is_host': self.is_host,
+            'joined_at': isoformat(self.joined_at)
+        }
+
+
+@dataclass(slots=True, eq=False)
+class Room:
+    id: int
+    room_code: str
+    host_player_id: int
+    status: str = 'waiting'
+    optional_characters: tuple = ()
+    created_at: int = 0
+    player_ids: list = field(default_factory=list)
+    version: int = 1
+    last_active_at: int = 0
+
+    @property
+    def player_count(self):
+        return len(self.player_ids)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'room_code': self.room_code,
+            'host_player_id': self.host_player_id,
+            'status': self.status,
+            'player_count': len(self.player_ids),
+            'optional_characters': list(self.optional_characters),
+            'created_at': isoformat(self.created_at),
+            'player_ids': list(self.player_ids),
+            'version': self.version
+        }
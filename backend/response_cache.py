@@ -0,0 +1,89 @@
+"""
+Encoded room JSON, shared by every response that returns a room.
+
+A room's API dict is encoded once per version and the bytes are reused by
+every route and event stream that returns it until the room changes, so N
+pollers of an unchanged room cost one serialization. Entries are keyed by
+room id and version. A change or removal drops the room's entry, and a read
+that finds an entry for another version replaces it, which also covers
+changes made by other processes.
+
+Uses orjson when it is installed (it is not in requirements.txt), and the
+standard library otherwise. Both produce compact JSON with sorted keys,
+like Flask's jsonify, so cached and freshly encoded responses match.
+"""
+import json
+import threading
+
+import storage
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson:
+    ENCODER = 'orjson'
+
+    def dumps(data):
+        return orjson.dumps(data, option=orjson.OPT_SORT_KEYS)
+else:
+    ENCODER = 'json'
+    _encoder = json.JSONEncoder(separators=(',', ':'), sort_keys=True)
+
+    def dumps(data):
+        return _encoder.encode(data).encode()
+
+_rooms = {}  # room_code -> (room_id, version, encoded room dict with players)
+
+# Misses fill under a lock striped by room code, so pollers of one room wait
+# for a single encode while unrelated rooms never contend
+_LOCK_STRIPES = 64
+_locks = [threading.Lock() for _ in range(_LOCK_STRIPES)]
+
+
+def evict(room_code):
+    _rooms.pop(room_code, None)
+
+
+storage.add_room_changed_listener(evict)
+storage.add_room_removed_listener(evict)
+
+
+def room_json(room_code, room=None):
+    """
+    (room_id, version, bytes) for the room with its players, encoded once per
+    version. `room` is the record the caller already read, if any. Returns
+    None if the room no longer exists.
+    """
+    room = room or storage.get_room(room_code)
+    if not room:
+        return None
+    cached = _rooms.get(room_code)
+    if cached and cached[0] == room.id and cached[1] == room.version:
+        return cached
+
+    with _locks[hash(room_code) % _LOCK_STRIPES]:
+        cached = _rooms.get(room_code)
+        if cached and cached[0] == room.id and cached[1] == room.version:
+            return cached
+
+        room_data = storage.get_room_with_players(room_code)
+        if not room_data:
+            return None
+        # The room may have moved on since `room` was read; key by what was encoded
+        cached = (room_data['id'], room_data['version'], dumps(room_data))
+        if storage.get_room(room_code):
+            _rooms[room_code] = cached
+        return cached
+
+
+def encode_object(members):
+    """
+    Bytes of a JSON object from {key: value}, where a value may be bytes that
+    are already encoded. Keys are sorted to match dumps().
+    """
+    return b'{' + b','.join(
+        dumps(key) + b':' + (value if isinstance(value, bytes) else dumps(value))
+        for key, value in sorted(members.items())
+    ) + b'}'
@@ -0,0 +1,93 @@
+"""
+Room code allocation.
+
+Codes are drawn from an incremental Fisher-Yates shuffle of the whole code
+space: the unissued codes sit at the front of an array, and each allocation
+swaps a uniformly random one to the end of that region. Allocation and
+release are O(1) no matter how full the space is, and the next code can't
+be guessed from earlier ones.
+
+A released code waits out a cooldown before going back into the pool, so a
+player holding a stale code can't land in somebody else's new room.
+
+With `stride` and `offset` the allocator only draws codes congruent to
+`offset` modulo `stride`, which lets each shard own its own slice of the
+code space (see sharding.py).
+"""
+import random
+import threading
+import time
+from array import array
+from collections import deque
+
+ROOM_CODE_DIGITS = 6
+ROOM_CODE_COOLDOWN_SECONDS = 15 * 60
+
+# Quarantined codes moved back into the pool per allocate/release call. Each
+# release adds one code, so any value above one keeps the quarantine drained
+# while bounding the work done by a single call.
+_PROMOTIONS_PER_CALL = 2
+
+
+class RoomCodeAllocator:
+    """Hands out unique, unpredictable fixed-width numeric room codes."""
+
+    def __init__(self, digits=ROOM_CODE_DIGITS, cooldown_seconds=ROOM_CODE_COOLDOWN_SECONDS,
+                 clock=time.monotonic, rng=None, in_use=(), stride=1, offset=0):
+        """`in_use` lists codes that are already taken, e.g. by rooms restored from disk."""
+        self.digits = digits
+        self.cooldown_seconds = cooldown_seconds
+        self._clock = clock
+        self._rng = rng or random.SystemRandom()
+        self._codes = array('i', range(offset, 10 ** digits, stride))
+        self._available = len(self._codes)  # codes[:_available] are free
+        self._quarantine = deque()  # (released_at, code), oldest first
+        self._lock = threading.Lock()
+
+        # Every code starts at the index (code - offset) // stride; track only
+        # the ones swapped elsewhere so taking k codes costs O(k)
+        moved = {}  # code -> index
+        for code in in_use:
+            code = int(code)
+            index = moved.pop(code, (code - offset) // stride)
+            last = self._available - 1
+            other = self._codes[last]
+            self._codes[index] = other
+            self._codes[last] = code
+            if other != code:
+                moved[other] = index
+            self._available = last
+
+    def __len__(self):
+        """Number of codes that can be allocated right now."""
+        return self._available
+
+    def _promote_cooled_down(self):
+        now = self._clock()
+        for _ in range(_PROMOTIONS_PER_CALL):
+            if not self._quarantine or now - self._quarantine[0][0] < self.cooldown_seconds:
+                return
+            _, code = self._quarantine.popleft()
+            self._codes[self._available] = code
+            self._available += 1
+
+    def allocate(self):
+        """Return an unused code. Raises RuntimeError if every code is taken."""
+        with self._lock:
+            self._promote_cooled_down()
+            if not self._available:
+                raise RuntimeError('No room codes available')
+
+            last = self._available - 1
+            index = self._rng.randrange(self._available)
+            code = self._codes[index]
+            self._codes[index] = self._codes[last]
+            self._codes[last] = code
+            self._available = last
+            return str(code).zfill(self.digits)
+
+    def release(self, code):
+        """Return a code to the pool once its cooldown has passed."""
+        with self._lock:
+            self._quarantine.append((self._clock(), int(code)))
+            self._promote_cooled_down()
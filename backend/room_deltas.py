@@ -0,0 +1,82 @@
+"""
+Room change logs for delta responses.
+
+After every version bump a backend reduces the room to a shape: status,
+host, optional characters and each player's id and role, in seat order.
+Diffing that against the previous shape yields the patch operations that
+turn one version into the next:
+
+    {'op': 'player_joined', 'player': {...full player...}}
+    {'op': 'player_left', 'player_id': 7}
+    {'op': 'role_set', 'player_id': 7, 'character_role': 'Merlin'}
+    {'op': 'role_cleared', 'player_id': 7}
+    {'op': 'status_changed', 'status': 'started'}
+    {'op': 'host_changed', 'host_player_id': 8}
+    {'op': 'optional_characters_changed', 'optional_characters': [...]}
+
+Applied in order to the room a client holds, they give the room at the new
+version. Joins append to the end of the player list. On host_changed every
+player's is_host becomes whether their id equals the new host_player_id.
+player_count and player_ids follow from the player list.
+"""
+
+# Versions of history kept per room. A client further behind than this gets a
+# full snapshot instead.
+CHANGE_LOG_LENGTH = 16
+
+
+def room_shape(status, host_player_id, optional_characters, player_roles):
+    """The diffable state of a room; `player_roles` is [(player_id, role), ...] in seat order."""
+    return [status, host_player_id, list(optional_characters), [list(pair) for pair in player_roles]]
+
+
+def diff_shapes(old, new, player_dict):
+    """
+    Patch operations turning shape `old` into shape `new`.
+
+    `player_dict(player_id)` returns the full API dict of a player who joined.
+    """
+    ops = []
+    old_status, old_host, old_optional, old_players = old
+    new_status, new_host, new_optional, new_players = new
+
+    old_roles = dict(old_players)
+    new_ids = {player_id for player_id, _ in new_players}
+    for player_id, _ in old_players:
+        if player_id not in new_ids:
+            ops.append({'op': 'player_left', 'player_id': player_id})
+
+    for player_id, role in new_players:
+        if player_id not in old_roles:
+            ops.append({'op': 'player_joined', 'player': player_dict(player_id)})
+        elif role != old_roles[player_id]:
+            if role is None:
+                ops.append({'op': 'role_cleared', 'player_id': player_id})
+            else:
+                ops.append({'op': 'role_set', 'player_id': player_id, 'character_role': role})
+
+    if new_host != old_host:
+        ops.append({'op': 'host_changed', 'host_player_id': new_host})
+    if new_status != old_status:
+        ops.append({'op': 'status_changed', 'status': new_status})
+    if new_optional != old_optional:
+        ops.append({'op': 'optional_characters_changed', 'optional_characters': new_optional})
+    return ops
+
+
+def collect_changes(log, since, version):
+    """
+    The delta from `since` to `version` out of `log`, a sequence of (version, ops) oldest first.
+
+    Returns None if the log no longer reaches back to `since`, or an entry on
+    the way has no ops recorded.
+    """
+    if not log or log[0][0] > since + 1:
+        return None
+    changes = []
+    for logged_version, ops in log:
+        if logged_version > since:
+            if ops is None:
+                return None
+            changes.extend(ops)
+    return {'since': since, 'version': version, 'changes': changes}
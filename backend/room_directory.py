@@ -0,0 +1,110 @@
+"""
+Public room directory: rooms partitioned by status, for the lobby browser.
+
+Each status has its own partition listing rooms in the order they entered
+that status, with a sequence number per entry. Entering or leaving a
+partition is O(1): entries are appended to the end of the partition, and
+removal leaves a tombstone that is compacted away once tombstones outnumber
+live entries. A page starts with a binary search for the cursor (the last
+sequence number the client saw) and reads forward, so listing costs the
+same however many rooms exist in total.
+
+Cursors stay valid while rooms change. A room keeps its place for as long
+as it stays in a status, so paging never repeats or skips a room that
+stayed put. A room that leaves a status and comes back is listed again at
+the end.
+"""
+import threading
+from bisect import bisect_right
+
+# Rooms per page by default, and at most
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Most rooms a page looks at, so a selective filter can't make listing slow
+SCAN_LIMIT = 1000
+
+# Tombstones a partition tolerates before compacting, however small it is
+_MIN_COMPACT = 64
+
+
+class _Partition:
+    __slots__ = ('seqs', 'live', 'next_seq')
+
+    def __init__(self):
+        self.seqs = []  # sequence numbers in order, including removed ones
+        self.live = {}  # seq -> room_code, only for rooms still here
+        self.next_seq = 1
+
+    def append(self, room_code):
+        seq = self.next_seq
+        self.next_seq += 1
+        self.seqs.append(seq)
+        self.live[seq] = room_code
+        return seq
+
+    def discard(self, seq):
+        del self.live[seq]
+        dead = len(self.seqs) - len(self.live)
+        if dead > _MIN_COMPACT and dead > len(self.live):
+            # live is in insertion order, which is seq order
+            self.seqs = list(self.live)
+
+
+class RoomDirectory:
+    """Room codes by status, each status in the order rooms entered it."""
+
+    def __init__(self):
+        self._partitions = {}  # status -> _Partition
+        self._entries = {}  # room_code -> (status, seq)
+        self._lock = threading.Lock()
+
+    def place(self, room_code, status):
+        """List the room under `status`, moving it from its previous one."""
+        with self._lock:
+            entry = self._entries.get(room_code)
+            if entry:
+                if entry[0] == status:
+                    return
+                self._partitions[entry[0]].discard(entry[1])
+            partition = self._partitions.get(status)
+            if partition is None:
+                partition = self._partitions[status] = _Partition()
+            self._entries[room_code] = (status, partition.append(room_code))
+
+    def remove(self, room_code):
+        with self._lock:
+            entry = self._entries.pop(room_code, None)
+            if entry:
+                self._partitions[entry[0]].discard(entry[1])
+
+    def clear(self):
+        with self._lock:
+            self._partitions.clear()
+            self._entries.clear()
+
+    def page(self, status, after=0, limit=PAGE_SIZE, accept=None, max_scan=SCAN_LIMIT):
+        """
+        Up to `limit` room codes listed under `status` after cursor `after`,
+        skipping any that `accept(room_code)` rejects.
+
+        Looks at no more than `max_scan` rooms, so a selective filter can
+        return a short page. Returns (room codes, next cursor or None when
+        the partition has nothing further).
+        """
+        with self._lock:
+            partition = self._partitions.get(status)
+            if partition is None:
+                return [], None
+            seqs, live = partition.seqs, partition.live
+            index = bisect_right(seqs, after)
+            end = min(len(seqs), index + max_scan)
+            codes = []
+            while index < end and len(codes) < limit:
+                room_code = live.get(seqs[index])
+                if room_code is not None and (accept is None or accept(room_code)):
+                    codes.append(room_code)
+                index += 1
+            if index == len(seqs):
+                return codes, None
+            return codes, seqs[index - 1]
@@ -0,0 +1,479 @@
+"""
+Routing front for a sharded deployment: N in-memory worker processes, each
+owning the rooms whose codes fall in its shard (see sharding.py).
+
+    python router.py --shards 4 --port 5000
+
+starts four workers on ports 5101-5104 with AVALON_SHARD=0/4 ... 3/4 and
+proxies port 5000 to them. Workers run the ASGI app under uvicorn when it is
+installed and the threaded Flask server otherwise. With AVALON_STORAGE set
+to memory:///path each worker journals to its own path/shard-<index>.
+
+The router is a small asyncio HTTP/1.1 reverse proxy. It picks a shard from
+the request line, plus the Idempotency-Key header of room creates:
+
+- /api/rooms/<code>/...   the shard owning the code
+- /api/players/<id>/...   the shard owning the player id
+- POST /api/rooms         the next shard in turn, which spreads new rooms;
+                          with an Idempotency-Key, the shard the key hashes
+                          to, so a retry replays on the shard that ran it
+- /api/health and /api/metrics are asked of every shard and merged; metric
+  samples gain a shard label
+- GET /api/rooms (the room directory) is asked of every shard for its share
+  of the page; the cursor handed out holds each shard's own cursor
+
+Responses are relayed byte for byte as they arrive, so long polls and event
+streams pass straight through. Connections to workers are kept alive and
+reused. Request bodies must carry a Content-Length, which every API client
+sends. The router holds no room state, so several can run side by side in
+front of the same workers if one process can't keep up.
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import signal
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from urllib.parse import parse_qsl, urlencode
+
+from room_directory import MAX_PAGE_SIZE, PAGE_SIZE
+from sharding import SHARD_ENV, shard_for_key, shard_for_player_id, shard_for_room_code
+
+_ROOM_PATH = re.compile(r'^/api/rooms/([^/]+)')
+_PLAYER_PATH = re.compile(r'^/api/players/(\d+)(?:/|$)')
+_SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})?( .*)$')
+
+# Idle connections kept open to each worker.
+MAX_IDLE_UPSTREAM = 64
+
+# Largest request head (request line plus headers) accepted from a client.
+MAX_HEAD_BYTES = 64 * 1024
+
+
+class BadRequest(Exception):
+    pass
+
+
+def _parse_head(head):
+    """(request or status line, [(name, value)]) from a raw head ending in a blank line."""
+    lines = head.decode('latin-1').split('\r\n')
+    headers = []
+    for line in lines[1:]:
+        if line:
+            name, sep, value = line.partition(':')
+            if not sep:
+                raise BadRequest(f'Malformed header: {line!r}')
+            headers.append((name.strip(), value.strip()))
+    return lines[0], headers
+
+
+def _header(headers, name, default=None):
+    name = name.lower()
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return default
+
+
+def _response(status, reason, body, content_type='application/json', close=False):
+    return (f'HTTP/1.1 {status} {reason}\r\n'
+            f'Content-Type: {content_type}\r\n'
+            f'Content-Length: {len(body)}\r\n'
+            'Access-Control-Allow-Origin: *\r\n'
+            f'Connection: {"close" if close else "keep-alive"}\r\n\r\n').encode('latin-1') + body
+
+
+class Router:
+    """Proxies API requests to the worker owning each room."""
+
+    def __init__(self, upstreams):
+        """`upstreams[i]` is the (host, port) of the worker serving shard i."""
+        self.upstreams = upstreams
+        self.idle = [[] for _ in upstreams]  # shard -> idle (reader, writer) pairs
+        self.next_shard = 0
+
+    def shard_for(self, method, path, idempotency_key=None):
+        """Shard a request goes to, or None if every shard has to answer it."""
+        count = len(self.upstreams)
+        match = _PLAYER_PATH.match(path)
+        if match:
+            return shard_for_player_id(match.group(1), count)
+        match = _ROOM_PATH.match(path)
+        if match:
+            shard = shard_for_room_code(match.group(1), count)
+            return 0 if shard is None else shard
+        if path in ('/api/health', '/api/metrics') or (method == 'GET' and path == '/api/rooms'):
+            return None
+        if method == 'POST' and path == '/api/rooms':
+            if idempotency_key:
+                return shard_for_key(idempotency_key, count)
+            shard = self.next_shard
+            self.next_shard = (shard + 1) % count
+            return shard
+        return 0
+
+    # Client side
+
+    async def handle_client(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+                except asyncio.LimitOverrunError:
+                    writer.write(_response(431, 'Request Header Fields Too Large', b'', close=True))
+                    return
+                try:
+                    keep_alive = await self.handle_request(head, reader, writer)
+                except BadRequest as e:
+                    body = json.dumps({'error': str(e)}).encode()
+                    writer.write(_response(400, 'Bad Request', body, close=True))
+                    return
+                if not keep_alive:
+                    return
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def handle_request(self, head, reader, writer):
+        """Serve one request. Returns whether the client connection can be reused."""
+        request_line, headers = _parse_head(head)
+        try:
+            method, target, version = request_line.split(' ')
+        except ValueError:
+            raise BadRequest(f'Malformed request line: {request_line!r}')
+        if _header(headers, 'Transfer-Encoding'):
+            raise BadRequest('Chunked request bodies are not supported')
+        try:
+            body = await reader.readexactly(int(_header(headers, 'Content-Length', 0)))
+        except ValueError:
+            raise BadRequest('Invalid Content-Length')
+        connection = _header(headers, 'Connection', '').lower()
+        keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+
+        path = target.partition('?')[0]
+        shard = self.shard_for(method, path, _header(headers, 'Idempotency-Key'))
+        if shard is None:
+            writer.write(await self.fan_out(target, keep_alive))
+            await writer.drain()
+            return keep_alive
+
+        # Workers always see keep-alive, whatever the client asked for
+        upstream_head = [f'{method} {target} HTTP/1.1']
+        upstream_head += [f'{name}: {value}' for name, value in headers
+                          if name.lower() not in ('connection', 'keep-alive')]
+        request = ('\r\n'.join(upstream_head) + '\r\n\r\n').encode('latin-1') + body
+        try:
+            upstream = await self._exchange(shard, request)
+        except (OSError, asyncio.IncompleteReadError):
+            writer.write(_response(502, 'Bad Gateway', b'{"error": "Shard unavailable"}', close=True))
+            return False
+        return await self.relay(shard, upstream, method, writer) and keep_alive
+
+    # Worker side
+
+    async def _connect(self, shard):
+        """An idle connection to `shard` if there is one, else a new one. Returns (reader, writer, reused)."""
+        idle = self.idle[shard]
+        while idle:
+            reader, writer = idle.pop()
+            if not reader.at_eof():
+                return reader, writer, True
+            writer.close()
+        reader, writer = await asyncio.open_connection(*self.upstreams[shard], limit=MAX_HEAD_BYTES)
+        return reader, writer, False
+
+    def _release(self, shard, reader, writer):
+        if len(self.idle[shard]) < MAX_IDLE_UPSTREAM:
+            self.idle[shard].append((reader, writer))
+        else:
+            writer.close()
+
+    async def _exchange(self, shard, request):
+        """Send `request`; returns (reader, writer, response head) once the head arrives."""
+        while True:
+            reader, writer, reused = await self._connect(shard)
+            try:
+                writer.write(request)
+                head = await reader.readuntil(b'\r\n\r\n')
+                return reader, writer, head
+            except (ConnectionError, asyncio.IncompleteReadError):
+                writer.close()
+                # The worker closed a connection we had kept idle; nothing was processed
+                if not reused:
+                    raise
+
+    async def relay(self, shard, upstream, method, client):
+        """
+        Pass a worker's response on to `client` as it arrives. Returns whether
+        both connections are still usable afterwards.
+        """
+        reader, writer, head = upstream
+        status_line, headers = _parse_head(head)
+        status = int(status_line.split(' ')[1])
+        client.write(head)
+        reusable = _header(headers, 'Connection', '').lower() != 'close'
+        try:
+            if method == 'HEAD' or status in (204, 304) or 100 <= status < 200:
+                pass
+            elif _header(headers, 'Transfer-Encoding', '').lower() == 'chunked':
+                await self._relay_chunked(reader, client)
+            elif _header(headers, 'Content-Length') is not None:
+                remaining = int(_header(headers, 'Content-Length'))
+                while remaining:
+                    data = await reader.read(min(remaining, 65536))
+                    if not data:
+                        raise asyncio.IncompleteReadError(b'', remaining)
+                    client.write(data)
+                    remaining -= len(data)
+                    await client.drain()
+            else:
+                # Delimited by the worker closing the connection
+                reusable = False
+                while data := await reader.read(65536):
+                    client.write(data)
+                    await client.drain()
+            await client.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            # Either side went away mid-response; neither connection can be reused
+            writer.close()
+            return False
+        except BaseException:
+            writer.close()
+            raise
+        if reusable:
+            self._release(shard, reader, writer)
+        else:
+            writer.close()
+        return reusable
+
+    async def _relay_chunked(self, reader, client):
+        while True:
+            size_line = await reader.readuntil(b'\r\n')
+            client.write(size_line)
+            size = int(size_line.split(b';')[0], 16)
+            if size == 0:
+                # Trailers, if any, then the blank line
+                while (line := await reader.readuntil(b'\r\n')) != b'\r\n':
+                    client.write(line)
+                client.write(line)
+                return
+            client.write(await reader.readexactly(size + 2))
+            await client.drain()
+
+    # Requests every shard answers
+
+    async def _get(self, shard, target):
+        """(status, body) of GET `target` on `shard`."""
+        request = f'GET {target} HTTP/1.1\r\nHost: shard-{shard}\r\n\r\n'.encode('latin-1')
+        reader, writer, head = await self._exchange(shard, request)
+        status_line, headers = _parse_head(head)
+        try:
+            body = await reader.readexactly(int(_header(headers, 'Content-Length', 0)))
+        except BaseException:
+            writer.close()
+            raise
+        self._release(shard, reader, writer)
+        return int(status_line.split(' ')[1]), body
+
+    async def fan_out(self, target, keep_alive):
+        path = target.partition('?')[0]
+        if path == '/api/rooms':
+            return await self.list_rooms(target, keep_alive)
+        try:
+            responses = await asyncio.gather(*(self._get(shard, path) for shard in range(len(self.upstreams))))
+        except (OSError, asyncio.IncompleteReadError):
+            return _response(502, 'Bad Gateway', b'{"error": "Shard unavailable"}', close=True)
+        bodies = [body for _, body in responses]
+        if path == '/api/health':
+            body = json.dumps(merge_health([json.loads(body) for body in bodies])).encode()
+            return _response(200, 'OK', body, close=not keep_alive)
+        body = merge_metrics([body.decode() for body in bodies]).encode()
+        return _response(200, 'OK', body, 'text/plain; version=0.0.4; charset=utf-8', close=not keep_alive)
+
+    async def list_rooms(self, target, keep_alive):
+        """
+        A room directory page made of every shard's next rooms. Each shard
+        is asked for an even share of the page, and the cursor returned
+        joins the shards' cursors, with '-' for a shard that has no more.
+        """
+        count = len(self.upstreams)
+        params = dict(parse_qsl(target.partition('?')[2]))
+        try:
+            cursors = split_directory_cursor(params.pop('cursor', ''), count)
+            limit = min(max(int(params.get('limit', PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+        except ValueError:
+            return _response(400, 'Bad Request', b'{"error": "Invalid cursor or limit"}', close=not keep_alive)
+        params['limit'] = -(-limit // count)
+
+        shards = [shard for shard in range(count) if cursors[shard] is not None]
+        try:
+            responses = await asyncio.gather(*(
+                self._get(shard, '/api/rooms?' + urlencode({**params, 'cursor': cursors[shard]}))
+                for shard in shards
+            ))
+        except (OSError, asyncio.IncompleteReadError):
+            return _response(502, 'Bad Gateway', b'{"error": "Shard unavailable"}', close=True)
+        for status, body in responses:
+            if status != 200:
+                return _response(status, 'Bad Request' if status == 400 else 'Error', body, close=not keep_alive)
+
+        pages = [json.loads(body) for _, body in responses]
+        for shard, page in zip(shards, pages):
+            cursors[shard] = page['next_cursor']
+        body = json.dumps({
+            'rooms': [room for page in pages for room in page['rooms']],
+            'next_cursor': join_directory_cursor(cursors)
+        }).encode()
+        return _response(200, 'OK', body, close=not keep_alive)
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle_client, host, port, limit=MAX_HEAD_BYTES)
+        async with server:
+            await server.serve_forever()
+
+
+def split_directory_cursor(cursor, count):
+    """Per-shard directory cursors from a router cursor; None for exhausted shards."""
+    if not cursor:
+        return [0] * count
+    parts = cursor.split('.')
+    if len(parts) != count:
+        raise ValueError(f'Invalid cursor: {cursor}')
+    return [None if part == '-' else int(part) for part in parts]
+
+
+def join_directory_cursor(cursors):
+    """Router cursor from per-shard ones, or None once every shard is exhausted."""
+    if all(cursor is None for cursor in cursors):
+        return None
+    return '.'.join('-' if cursor is None else str(cursor) for cursor in cursors)
+
+
+def merge_health(reports):
+    """One /api/health response from every shard's."""
+    evicted = defaultdict(int)
+    for report in reports:
+        for reason, count in report['expiry']['evicted'].items():
+            evicted[reason] += count
+    return {
+        'status': 'healthy' if all(r['status'] == 'healthy' for r in reports) else 'degraded',
+        'rooms': sum(r['rooms'] for r in reports),
+        'expiry': {
+            'evicted': dict(evicted),
+            'scheduled': sum(r['expiry']['scheduled'] for r in reports)
+        },
+        'shards': len(reports)
+    }
+
+
+def merge_metrics(expositions):
+    """
+    One Prometheus exposition from every shard's, with a shard label on each
+    sample. Samples stay grouped under their family's HELP and TYPE lines.
+    """
+    families = {}  # family name -> [comment lines, sample lines]
+    for shard, text in enumerate(expositions):
+        family = None
+        for line in text.splitlines():
+            if line.startswith('# '):
+                parts = line.split(' ', 3)
+                family = parts[2]
+                comments = families.setdefault(family, [[], []])[0]
+                if line not in comments:
+                    comments.append(line)
+                continue
+            match = _SAMPLE.match(line)
+            if not match:
+                continue
+            name, labels, value = match.groups()
+            labels = f'shard="{shard}",{labels}' if labels else f'shard="{shard}"'
+            families.setdefault(family or name, [[], []])[1].append(f'{name}{{{labels}}}{value}')
+
+    lines = []
+    for comments, samples in families.values():
+        lines += comments + samples
+    return '\n'.join(lines) + '\n'
+
+
+# Launcher
+
+def _worker_command(port):
+    try:
+        import uvicorn  # noqa: F401
+    except ImportError:
+        return [sys.executable, '-c',
+                f'from app import create_app; create_app().run(port={port}, threaded=True)']
+    return [sys.executable, '-m', 'uvicorn', '--factory', 'asgi:create_asgi_app',
+            '--port', str(port), '--log-level', 'warning']
+
+
+def start_workers(shards, base_port):
+    """Start one worker per shard on base_port + 1 ... Returns (processes, upstreams)."""
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    storage_url = os.environ.get('AVALON_STORAGE', 'memory')
+    if not storage_url.startswith('memory'):
+        raise SystemExit(f'Sharding needs the memory backend, not {storage_url}')
+    processes, upstreams = [], []
+    for index in range(shards):
+        env = dict(os.environ)
+        env[SHARD_ENV] = f'{index}/{shards}'
+        if storage_url.startswith('memory:///'):
+            env['AVALON_STORAGE'] = storage_url.rstrip('/') + f'/shard-{index}'
+        port = base_port + 1 + index
+        processes.append(subprocess.Popen(_worker_command(port), cwd=backend_dir, env=env))
+        upstreams.append(('127.0.0.1', port))
+    return processes, upstreams
+
+
+async def wait_until_listening(upstreams, timeout=30):
+    deadline = time.monotonic() + timeout
+    for host, port in upstreams:
+        while True:
+            try:
+                _, writer = await asyncio.open_connection(host, port)
+                writer.close()
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f'Worker on port {port} did not start')
+                await asyncio.sleep(0.1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run sharded workers behind a routing front')
+    parser.add_argument('--shards', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--worker-base-port', type=int, default=5100,
+                        help='worker i listens on this port + 1 + i')
+    args = parser.parse_args()
+
+    # Stop the workers on SIGTERM as well as Ctrl-C
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    processes, upstreams = start_workers(args.shards, args.worker_base_port)
+    router = Router(upstreams)
+
+    async def run():
+        await wait_until_listening(upstreams)
+        await router.serve(args.host, args.port)
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+
+if __name__ == '__main__':
+    main()
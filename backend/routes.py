@@ -1,9 +1,171 @@
-from flask import Blueprint, request, jsonify
+import math
+import time
+
+from flask import Blueprint, Response, g, request, jsonify
+import idempotency
+import metrics
+import pacing
+import response_cache
 import storage
-from game_logic import get_character_reveals, validate_character_selection, get_available_characters
+from game_logic import get_available_characters, is_optional_role
+from room_directory import MAX_PAGE_SIZE, PAGE_SIZE
 
 api = Blueprint('api', __name__)
 
+# Upper bound on how long a long-poll request may hold its worker thread.
+MAX_WAIT_SECONDS = 30
+
+# Idle event streams get a comment line this often so proxies keep them open.
+HEARTBEAT_SECONDS = 15
+
+# Statuses the room directory can be listed by
+DIRECTORY_STATUSES = ('waiting', 'character_selection', 'started')
+
+storage.add_room_removed_listener(pacing.forget_room)
+
+# Endpoints that clients poll, which are shed with 503 when overloaded
+_POLL_ENDPOINTS = {'api.get_room', 'api.get_player_session', 'api.get_player_reveal'}
+
+# Endpoints that hold a connection open while idle, so don't count as load
+_IDLE_ENDPOINTS = {'api.wait_for_room', 'api.room_events'}
+
+# Mutating endpoints whose responses are replayed for a repeated Idempotency-Key
+_IDEMPOTENT_ENDPOINTS = {
+    'api.create_room', 'api.join_room', 'api.configure_room', 'api.select_character', 'api.start_game',
+    'api.deal_game', 'api.reset_game', 'api.back_to_lobby', 'api.kick_player', 'api.leave_room'
+}
+
+# Response headers kept with a stored response
+_REPLAYED_HEADERS = ('Content-Type', 'ETag')
+
+
+@api.before_request
+def _start_timer():
+    g.request_started = time.perf_counter()
+
+
+@api.before_request
+def _shed_load():
+    # The ASGI server counts the requests it bridges from arrival, queueing included
+    g.counted = request.endpoint not in _IDLE_ENDPOINTS and not request.environ.get('avalon.counted')
+    if g.counted:
+        pacing.request_started()
+
+    if request.endpoint in _POLL_ENDPOINTS:
+        poll_ms = pacing.shed_poll_ms()
+        if poll_ms:
+            response = jsonify({'error': 'Server busy', 'next_poll_ms': poll_ms})
+            response.status_code = 503
+            response.headers['Retry-After'] = pacing.retry_after(poll_ms)
+            return _with_poll_hint(response, poll_ms)
+
+
+@api.before_request
+def _replay_idempotent():
+    key = request.headers.get(idempotency.HEADER)
+    if not key or request.endpoint not in _IDEMPOTENT_ENDPOINTS:
+        return None
+    if len(key) > idempotency.MAX_KEY_LENGTH:
+        return jsonify({'error': f'Idempotency-Key must be at most {idempotency.MAX_KEY_LENGTH} characters'}), 400
+
+    fingerprint = idempotency.fingerprint(request.method, request.path, request.get_data())
+    stored, error = idempotency.results.claim(key, fingerprint)
+    if error:
+        status_code = 409 if 'in progress' in error else 422
+        response = jsonify({'error': error})
+        response.status_code = status_code
+        if status_code == 409:
+            response.headers['Retry-After'] = '1'
+        return response
+    if stored:
+        status, headers, body = stored
+        response = Response(body, status, headers)
+        response.headers['Idempotent-Replayed'] = 'true'
+        return response
+    g.idempotency_key = key
+
+
+@api.teardown_request
+def _finish_request(exc):
+    if g.get('counted'):
+        pacing.request_finished()
+    # The request failed before a response could be stored
+    if g.get('idempotency_key'):
+        idempotency.results.release(g.idempotency_key)
+
+
+@api.after_request
+def _record_request(response):
+    # Streaming responses are timed until their headers are ready
+    metrics.record(request.method, request.url_rule.rule, response.status_code,
+                   time.perf_counter() - g.request_started)
+    return response
+
+
+@api.after_request
+def _store_idempotent(response):
+    key = g.pop('idempotency_key', None)
+    if key:
+        # 5xx may be transient, so a retry should really run again
+        if response.status_code < 500:
+            headers = [(name, response.headers[name]) for name in _REPLAYED_HEADERS if name in response.headers]
+            idempotency.results.store(key, response.status_code, headers, response.get_data())
+        else:
+            idempotency.results.release(key)
+    return response
+
+
+def _room_etag(room):
+    """ETag for any representation of a room; changes whenever the room does."""
+    return f"{room.id}-{room.version}"
+
+
+def _room_event(room_code):
+    """
+    Return (version, data) for the room's current state as an SSE data line.
+
+    The room is encoded once per version no matter how many streams are
+    subscribed (see response_cache). Returns None if the room no longer exists.
+    """
+    cached = response_cache.room_json(room_code)
+    if not cached:
+        return None
+    return cached[1], b'data: {"room":' + cached[2] + b'}\n\n'
+
+
+def _room_response(room_code, status=200, room=None, etag=False, **members):
+    """
+    JSON response holding the room with its players plus `members`, using the
+    room's cached encoding. `room` is the record the caller already read, if
+    any. With `etag`, tags the response with the version actually sent.
+    """
+    cached = response_cache.room_json(room_code, room)
+    members['room'] = cached[2] if cached else None
+    response = Response(response_cache.encode_object(members), status, mimetype='application/json')
+    if etag and cached:
+        response.set_etag(f'{cached[0]}-{cached[1]}')
+    return response
+
+
+def _optional_characters_error(optional_characters):
+    """Why a request's optional_characters can't be stored, or None."""
+    if not isinstance(optional_characters, list) or not all(isinstance(c, str) for c in optional_characters):
+        return 'optional_characters must be a list of character names'
+    return None
+
+
+def _with_poll_hint(response, poll_ms):
+    """Repeat a response's poll hint in a header, which bodiless 304s keep."""
+    response.headers['X-Next-Poll-Ms'] = str(poll_ms)
+    return response
+
+
+def _not_modified(etag):
+    """Bodiless 304 for a client that already has the current room state."""
+    response = Response(status=304)
+    response.set_etag(etag)
+    return response
+
 
 @api.route('/rooms', methods=['POST'])
 def create_room():
@@ -16,12 +178,31 @@ def create_room():
             return jsonify({'error': 'Player name is required'}), 400
 
         room, player = storage.create_room(player_name)
-        room_data = storage.get_room_with_players(room['room_code'])
+        return _room_response(room.room_code, 201, player=player.to_dict())
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-        return jsonify({
-            'room': room_data,
-            'player': player
-        }), 201
+
+@api.route('/rooms', methods=['GET'])
+def list_rooms():
+    """Page through the public room directory for one status."""
+    try:
+        status = request.args.get('status', 'waiting')
+        if status not in DIRECTORY_STATUSES:
+            return jsonify({'error': f"status must be one of {', '.join(DIRECTORY_STATUSES)}"}), 400
+
+        try:
+            min_players = int(request.args.get('min_players', 1))
+            cursor = int(request.args.get('cursor', 0))
+            limit = int(request.args.get('limit', PAGE_SIZE))
+        except ValueError:
+            return jsonify({'error': 'min_players, cursor and limit must be integers'}), 400
+        if cursor < 0:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        limit = min(max(limit, 1), MAX_PAGE_SIZE)
+
+        return jsonify(storage.list_rooms(status, min_players, cursor, limit)), 200
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -43,12 +224,7 @@ def join_room(room_code):
             status_code = 404 if error == 'Room not found' else 400
             return jsonify({'error': error}), status_code
 
-        room_data = storage.get_room_with_players(room_code)
-
-        return jsonify({
-            'room': room_data,
-            'player': player
-        }), 200
+        return _room_response(room_code, player=player.to_dict())
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -58,16 +234,112 @@ def join_room(room_code):
 def get_room(room_code):
     """Get room details."""
     try:
-        room_data = storage.get_room_with_players(room_code)
-        if not room_data:
+        room = storage.get_room(room_code)
+        if not room:
             return jsonify({'error': 'Room not found'}), 404
 
-        return jsonify({'room': room_data}), 200
+        player_id = request.args.get('player_id', type=int)
+        if player_id:
+            storage.touch_player(player_id)
+
+        poll_ms = pacing.next_poll_ms(room)
+        etag = _room_etag(room)
+        if etag in request.if_none_match:
+            return _with_poll_hint(_not_modified(etag), poll_ms)
+
+        # With ?since=<version>, send only the patch ops after that version
+        # when the room's change log still covers them (see room_deltas)
+        since = request.args.get('since', type=int)
+        if since is not None:
+            if since >= room.version:
+                return _with_poll_hint(_not_modified(etag), poll_ms)
+            delta = storage.get_room_changes(room_code, since)
+            if delta:
+                response = jsonify({'delta': delta, 'next_poll_ms': poll_ms})
+                response.set_etag(f"{room.id}-{delta['version']}")
+                return _with_poll_hint(response, poll_ms), 200
+
+        response = _room_response(room_code, room=room, etag=True, next_poll_ms=poll_ms)
+        return _with_poll_hint(response, poll_ms)
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+@api.route('/rooms/<room_code>/wait', methods=['GET'])
+def wait_for_room(room_code):
+    """Long-poll: return the room once its version passes `since`, or 304 on timeout."""
+    try:
+        since = request.args.get('since', type=int)
+        timeout = request.args.get('timeout', 25, type=float)
+        # NaN passes through min/max and would make the wait never time out
+        if not math.isfinite(timeout):
+            return jsonify({'error': 'timeout must be a finite number'}), 400
+        timeout = min(max(timeout, 0), MAX_WAIT_SECONDS)
+
+        if since is None:
+            room = storage.get_room(room_code)
+        else:
+            room = storage.wait_for_change(room_code, since, timeout)
+        if not room:
+            return jsonify({'error': 'Room not found'}), 404
+
+        etag = _room_etag(room)
+        if since is not None and room.version <= since:
+            return _not_modified(etag)
+
+        return _room_response(room_code, room=room, etag=True)
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@api.route('/rooms/<room_code>/events', methods=['GET'])
+def room_events(room_code):
+    """
+    Server-Sent Events stream of room state.
+
+    Sends a `snapshot` event on connect and a `change` event carrying the full
+    room whenever it changes. Event ids are room versions, so a reconnecting
+    client's Last-Event-ID skips the snapshot if it is already up to date.
+    """
+    if not storage.get_room(room_code):
+        return jsonify({'error': 'Room not found'}), 404
+
+    try:
+        last_event_id = int(request.headers.get('Last-Event-ID', ''))
+    except ValueError:
+        last_event_id = None
+
+    def stream():
+        version = last_event_id
+        event_name = b'snapshot' if version is None else b'change'
+        while True:
+            if version is None:
+                room = storage.get_room(room_code)
+            else:
+                room = storage.wait_for_change(room_code, version, HEARTBEAT_SECONDS)
+            if not room:
+                yield b'event: gone\ndata: {}\n\n'
+                return
+            if version is not None and room.version <= version:
+                yield b': heartbeat\n\n'
+                continue
+
+            event = _room_event(room_code)
+            if not event:
+                continue
+            version, data = event
+            yield b'id: %d\nevent: %s\n' % (version, event_name)
+            yield data
+            event_name = b'change'
+
+    return Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
 @api.route('/rooms/<room_code>/configure', methods=['POST'])
 def configure_room(room_code):
     """Configure optional characters for the room (host only)."""
@@ -75,6 +347,9 @@ def configure_room(room_code):
         data = request.json
         player_id = data.get('player_id')
         optional_characters = data.get('optional_characters', [])
+        error = _optional_characters_error(optional_characters)
+        if error:
+            return jsonify({'error': error}), 400
 
         room, error = storage.configure_room(room_code, player_id, optional_characters)
 
@@ -82,8 +357,7 @@ def configure_room(room_code):
             status_code = 404 if error == 'Room not found' else 403 if 'host' in error else 400
             return jsonify({'error': error}), status_code
 
-        room_data = storage.get_room_with_players(room_code)
-        return jsonify({'room': room_data}), 200
+        return _room_response(room_code)
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -97,19 +371,25 @@ def get_available_characters_endpoint(room_code):
         if not room:
             return jsonify({'error': 'Room not found'}), 404
 
-        if room['status'] == 'waiting':
+        if room.status == 'waiting':
             return jsonify({'error': 'Host must configure optional characters first'}), 400
 
-        available = get_available_characters(room['player_count'], room['optional_characters'] or [])
+        etag = _room_etag(room)
+        if etag in request.if_none_match:
+            return _not_modified(etag)
 
-        # Get already selected characters
-        players_in_room = storage.get_players_in_room(room_code)
-        selected_characters = [p['character_role'] for p in players_in_room if p['character_role']]
+        available = get_available_characters(room.player_count, room.optional_characters)
+        selection = storage.get_selection(room_code)
+        if not selection:
+            return jsonify({'error': 'Room not found'}), 404
 
-        return jsonify({
+        response = jsonify({
             'available_characters': available,
-            'selected_characters': selected_characters
-        }), 200
+            'selected_characters': selection['selected_characters'],
+            'remaining_slots': selection['remaining_slots']
+        })
+        response.set_etag(etag)
+        return response, 200
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -129,13 +409,14 @@ def select_character(player_id):
         player = storage.get_player(player_id)
         if not player:
             return jsonify({'error': 'Player not found'}), 404
+        storage.touch_player(player_id)
 
         room = storage.get_room_by_player_id(player_id)
         if not room:
             return jsonify({'error': 'Room not found'}), 404
 
         # Validate character is available
-        available = get_available_characters(room['player_count'], room['optional_characters'] or [])
+        available = get_available_characters(room.player_count, room.optional_characters)
         all_available = available['good'] + available['evil']
         if character not in all_available:
             return jsonify({'error': 'Character not available for this game'}), 400
@@ -145,7 +426,50 @@ def select_character(player_id):
         if error:
             return jsonify({'error': error}), 400
 
-        return jsonify({'player': player}), 200
+        return jsonify({'player': player.to_dict()}), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@api.route('/players/<int:player_id>/session', methods=['GET'])
+def get_player_session(player_id):
+    """
+    Everything a player's client polls for, from one consistent read of the room:
+    the room, the character pool and selections, the player's own state and,
+    once the game has started, their reveal.
+    """
+    try:
+        room = storage.get_room_by_player_id(player_id)
+        if not room:
+            return jsonify({'error': 'Player not found'}), 404
+        storage.touch_player(player_id)
+
+        poll_ms = pacing.next_poll_ms(room)
+        etag = _room_etag(room)
+        if etag in request.if_none_match:
+            return _with_poll_hint(_not_modified(etag), poll_ms)
+
+        session, error = storage.get_session(player_id)
+        if error:
+            return jsonify({'error': error}), 404
+
+        room_data = session['room']
+        available = None
+        if room_data['status'] != 'waiting':
+            available = get_available_characters(room_data['player_count'], room_data['optional_characters'])
+
+        response = jsonify({
+            'room': room_data,
+            'player': session['player'],
+            'available_characters': available,
+            'selected_characters': session['selected_characters'],
+            'remaining_slots': session['remaining_slots'],
+            'reveals': session['reveals'],
+            'next_poll_ms': poll_ms
+        })
+        response.set_etag(f"{room_data['id']}-{room_data['version']}")
+        return _with_poll_hint(response, poll_ms), 200
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -158,27 +482,41 @@ def start_game(room_code):
         data = request.json
         player_id = data.get('player_id')
 
-        # Validate character selection before starting
-        room = storage.get_room(room_code)
-        if not room:
-            return jsonify({'error': 'Room not found'}), 404
+        # Storage validates the character selection under the room lock
+        room, error = storage.start_game(room_code, player_id)
 
-        players_in_room = storage.get_players_in_room(room_code)
-        players_data = [{'character_role': p['character_role'], 'player_name': p['player_name']}
-                        for p in players_in_room]
+        if error:
+            status_code = 404 if error == 'Room not found' else 403 if 'host' in error else 400
+            return jsonify({'error': error}), status_code
 
-        is_valid, error = validate_character_selection(players_data, room['optional_characters'] or [])
-        if not is_valid:
-            return jsonify({'error': error}), 400
+        return _room_response(room_code)
 
-        room, error = storage.start_game(room_code, player_id)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@api.route('/rooms/<room_code>/deal', methods=['POST'])
+def deal_game(room_code):
+    """Deal every player a random role and start the game (host only)."""
+    try:
+        data = request.json
+        player_id = data.get('player_id')
+        optional_characters = data.get('optional_characters')
+        if optional_characters is not None:
+            error = _optional_characters_error(optional_characters)
+            unknown = not error and [c for c in optional_characters if not is_optional_role(c)]
+            if unknown:
+                error = f"Not optional characters: {', '.join(unknown)}"
+            if error:
+                return jsonify({'error': error}), 400
+
+        room, error = storage.deal_game(room_code, player_id, optional_characters)
 
         if error:
             status_code = 404 if error == 'Room not found' else 403 if 'host' in error else 400
             return jsonify({'error': error}), status_code
 
-        room_data = storage.get_room_with_players(room_code)
-        return jsonify({'room': room_data}), 200
+        return _room_response(room_code)
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -188,29 +526,20 @@ def start_game(room_code):
 def get_player_reveal(player_id):
     """Get character reveal information for a player."""
     try:
-        player = storage.get_player(player_id)
-        if not player:
-            return jsonify({'error': 'Player not found'}), 404
+        storage.touch_player(player_id)
+
+        # Reveals are computed once when the game starts
+        reveals, error = storage.get_reveal(player_id)
+
+        if error:
+            status_code = 404 if 'not found' in error else 400
+            return jsonify({'error': error}), status_code
 
         room = storage.get_room_by_player_id(player_id)
         if not room:
             return jsonify({'error': 'Room not found'}), 404
-
-        if room['status'] != 'started':
-            return jsonify({'error': 'Game has not started yet'}), 400
-
-        if not player['character_role']:
-            return jsonify({'error': 'Player has not selected a character'}), 400
-
-        # Get all players in the room
-        players_in_room = storage.get_players_in_room(room['room_code'])
-        all_players = [{'player_name': p['player_name'], 'character_role': p['character_role']}
-                       for p in players_in_room]
-
-        # Get reveal information
-        reveals = get_character_reveals(player['character_role'], all_players)
-
-        return jsonify({'reveals': reveals}), 200
+        poll_ms = pacing.next_poll_ms(room)
+        return _with_poll_hint(jsonify({'reveals': reveals, 'next_poll_ms': poll_ms}), poll_ms), 200
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -229,8 +558,7 @@ def reset_game(room_code):
             status_code = 404 if error == 'Room not found' else 403
             return jsonify({'error': error}), status_code
 
-        room_data = storage.get_room_with_players(room_code)
-        return jsonify({'room': room_data}), 200
+        return _room_response(room_code)
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -249,8 +577,7 @@ def back_to_lobby(room_code):
             status_code = 404 if error == 'Room not found' else 403
             return jsonify({'error': error}), status_code
 
-        room_data = storage.get_room_with_players(room_code)
-        return jsonify({'room': room_data}), 200
+        return _room_response(room_code)
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -273,8 +600,7 @@ def kick_player(room_code):
             status_code = 404 if error == 'Room not found' else 403 if 'host' in error else 400
             return jsonify({'error': error}), status_code
 
-        room_data = storage.get_room_with_players(room_code)
-        return jsonify({'room': room_data}), 200
+        return _room_response(room_code)
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -305,4 +631,15 @@ def leave_room(room_code):
 @api.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint."""
-    return jsonify({'status': 'healthy'}), 200
+    return jsonify({
+        'status': 'healthy',
+        'rooms': storage.count_rooms(),
+        'expiry': storage.get_expiry_stats()
+    }), 200
+
+
+@api.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus scrape endpoint."""
+    return Response(metrics.render(storage.get_room_stats()),
+                    mimetype='text/plain; version=0.0.4; charset=utf-8')
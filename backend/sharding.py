@@ -0,0 +1,47 @@
+"""
+Partitioning rooms across worker processes.
+
+With N shards, shard i owns every room whose code is congruent to i modulo
+N, and every player and room id congruent to i modulo N. Each shard is an
+ordinary single-process in-memory server that only ever allocates codes and
+ids from its own residue class. A request can therefore be routed from its
+URL alone, with no lookup and no state shared between processes:
+
+    /api/rooms/<code>/...      -> shard_for_room_code(code)
+    /api/players/<id>/...      -> shard_for_player_id(id)
+    POST /api/rooms            -> any shard; the new room lives there
+                                  (retries with an Idempotency-Key go to
+                                  shard_for_key(key) so they replay)
+
+router.py implements this routing in front of N workers. Any proxy that can
+compute these two modulos can do the same.
+
+A worker learns its place from AVALON_SHARD=<index>/<count>, e.g. 2/4.
+"""
+import zlib
+
+SHARD_ENV = 'AVALON_SHARD'
+
+
+def parse_shard(value):
+    """(index, count) from an AVALON_SHARD value like '2/4'. Raises ValueError if malformed."""
+    index, _, count = value.partition('/')
+    index, count = int(index), int(count)
+    if not 0 <= index < count:
+        raise ValueError(f'Invalid shard: {value}')
+    return index, count
+
+
+def shard_for_room_code(room_code, shard_count):
+    """Shard owning `room_code`, or None if it is not a room code at all."""
+    return int(room_code) % shard_count if room_code.isdigit() else None
+
+
+def shard_for_player_id(player_id, shard_count):
+    """Shard owning the player (and the room they are in)."""
+    return int(player_id) % shard_count
+
+
+def shard_for_key(key, shard_count):
+    """Shard for a request identified only by an opaque key, the same in every process."""
+    return zlib.crc32(key.encode('utf-8', 'surrogateescape')) % shard_count
@@ -0,0 +1,212 @@
+"""
+Monte Carlo simulation of role setups, for balance questions such as how
+often Percival sees exactly one candidate, or how many Evil players Merlin
+sees, for each player count and set of enabled optional characters.
+
+Games are NumPy arrays of role codes (indexes into game_logic.ROLES), one
+row per game and one column per seat. Each game deals the same roles the
+deal endpoint does, role_setup() for the enabled optional characters, in a
+random seat order; with mix_optional, each game instead deals a uniformly
+chosen subset of them that fits. A batch's reveals are a boolean (games, seats, seats) matrix:
+[g, i, j] is whether seat i is shown seat j. It is built with one lookup
+into a (roles, roles) table compiled from the same RoleRule data game_logic
+uses, so millions of games take about a second.
+
+NumPy is an optional dependency (it is not in requirements.txt); nothing
+else in the backend imports this module.
+
+Usage:
+    python simulation.py --optional Percival,Morgana --games 1000000
+    python simulation.py --players 7 --optional Percival,Mordred,Oberon,Morgana --check 2000
+    python simulation.py --players 5 --optional Percival,Morgana,Mordred --mix-optional
+"""
+import argparse
+import itertools
+import sys
+import time
+
+from game_logic import PLAYER_CONFIGURATIONS, ROLES, get_character_reveals, role_setup
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Games per batch; bounds the reveal matrix to a few MB at 10 players
+BATCH_GAMES = 65_536
+
+_ROLE_CODE = {role.name: code for code, role in enumerate(ROLES)}
+
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeError('simulation needs NumPy: pip install numpy')
+
+
+def _sees_table():
+    """[a, b] is whether a player holding role a is shown players holding role b."""
+    table = np.zeros((len(ROLES), len(ROLES)), dtype=bool)
+    for code, role in enumerate(ROLES):
+        table[code, [_ROLE_CODE[seen] for seen in role.sees]] = True
+    return table
+
+
+def role_setups(player_count, optional_characters, mix_optional=False):
+    """
+    Role codes of every setup a game can deal, one row each.
+
+    That is the single role_setup() the deal endpoint uses, or with
+    `mix_optional` one for each subset of the enabled optional characters
+    that fits the seats. Raises ValueError if the enabled characters can't
+    be dealt at this player count.
+    """
+    _require_numpy()
+    if not mix_optional:
+        roles, error = role_setup(player_count, optional_characters)
+        if error:
+            raise ValueError(error)
+        return np.array([[_ROLE_CODE[name] for name in roles]], dtype=np.int8)
+
+    enabled = [role.name for role in ROLES if role.optional and role.name in optional_characters]
+    setups = []
+    for size in range(len(enabled) + 1):
+        for subset in itertools.combinations(enabled, size):
+            roles, error = role_setup(player_count, subset)
+            if not error:
+                setups.append([_ROLE_CODE[name] for name in roles])
+    return np.array(setups, dtype=np.int8)
+
+
+def deal(setups, picks, rng):
+    """(games, seats) role codes: setups[picks[g]] for game g, in a random seat order."""
+    return rng.permuted(setups[picks], axis=1)
+
+
+def reveal_matrix(deals, sees=None):
+    """(games, seats, seats) bools: [g, i, j] is whether seat i is shown seat j."""
+    sees = _sees_table() if sees is None else sees
+    # One flat lookup; (role a, role b) pairs fit in int8 as a * len(ROLES) + b
+    pairs = deals[:, :, None] * np.int8(len(ROLES)) + deals[:, None, :]
+    return sees.ravel()[pairs]
+
+
+def check_parity(deals, reveals, samples, rng):
+    """
+    Compare sampled games against game_logic.get_character_reveals, seat by
+    seat. Returns the number of seats whose revealed players or allegiance
+    differ.
+    """
+    mismatches = 0
+    for game in rng.choice(len(deals), size=min(samples, len(deals)), replace=False):
+        names = [f'seat-{seat}' for seat in range(deals.shape[1])]
+        all_players = [{'player_name': name, 'character_role': ROLES[code].name}
+                       for name, code in zip(names, deals[game])]
+        for seat, code in enumerate(deals[game]):
+            reveal = get_character_reveals(ROLES[code].name, all_players)
+            expected = [names[j] for j in np.flatnonzero(reveals[game, seat])]
+            if reveal['revealed_players'] != expected or reveal['your_allegiance'] != ROLES[code].team:
+                mismatches += 1
+    return mismatches
+
+
+def simulate(player_count, optional_characters, games, seed=None, check=0, mix_optional=False):
+    """
+    Deal `games` games and summarise what each role sees. See role_setups()
+    for `mix_optional`.
+
+    Returns:
+        Dict with 'games', 'seconds', 'mismatches' (seats that disagreed
+        with get_character_reveals across `check` sampled games per batch),
+        and 'roles': {role name: {'in_play': share of games dealing it,
+        'mean_seen': players shown to a holder on average, 'seen': [share
+        of holders shown 0, 1, 2, ... players]}} for every role dealt.
+    """
+    _require_numpy()
+    rng = np.random.default_rng(seed)
+    setups = role_setups(player_count, optional_characters, mix_optional)
+    sees = _sees_table()
+    # [s, r] is whether setup s deals role r
+    dealt = (setups[:, :, None] == np.arange(len(ROLES))).any(axis=1)
+    picked = np.zeros(len(setups), dtype=np.int64)
+    seen = np.zeros((len(ROLES), player_count + 1), dtype=np.int64)
+    mismatches = 0
+
+    started = time.perf_counter()
+    for first in range(0, games, BATCH_GAMES):
+        picks = rng.integers(len(setups), size=min(BATCH_GAMES, games - first))
+        deals = deal(setups, picks, rng)
+        reveals = reveal_matrix(deals, sees)
+        if check:
+            mismatches += check_parity(deals, reveals, check, rng)
+
+        # Seen counts, binned by (role, count) in one pass
+        counts = reveals.view(np.uint8).sum(axis=2, dtype=np.uint8)
+        seen += np.bincount((deals.astype(np.int64) * (player_count + 1) + counts).ravel(),
+                            minlength=seen.size).reshape(seen.shape)
+        picked += np.bincount(picks, minlength=len(setups))
+    seconds = time.perf_counter() - started
+    in_play = picked @ dealt
+
+    roles = {}
+    for code, role in enumerate(ROLES):
+        holders = seen[code].sum()
+        if holders:
+            roles[role.name] = {
+                'in_play': in_play[code] / games,
+                'mean_seen': float(seen[code] @ np.arange(player_count + 1)) / holders,
+                'seen': (seen[code] / holders).tolist(),
+            }
+    return {'games': games, 'seconds': seconds, 'mismatches': mismatches, 'roles': roles}
+
+
+def _player_counts(value):
+    low, _, high = value.partition('-')
+    return list(range(int(low), int(high or low) + 1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Monte Carlo statistics on what each role sees')
+    parser.add_argument('--players', type=_player_counts, default=sorted(PLAYER_CONFIGURATIONS),
+                        help='player count or range, e.g. 7 or 5-10 (default: all)')
+    parser.add_argument('--optional', default='',
+                        help='comma-separated optional characters enabled, e.g. Percival,Morgana')
+    parser.add_argument('--games', type=int, default=1_000_000, help='games per player count')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--check', type=int, default=0, metavar='N',
+                        help='compare N sampled games per batch against get_character_reveals')
+    parser.add_argument('--mix-optional', action='store_true',
+                        help='deal a random fitting subset of the optional characters each game '
+                             'instead of all of them')
+    args = parser.parse_args()
+
+    if np is None:
+        sys.exit('simulation needs NumPy: pip install numpy')
+    optional = [name.strip() for name in args.optional.split(',') if name.strip()]
+    unknown = [name for name in optional if name not in _ROLE_CODE or not ROLES[_ROLE_CODE[name]].optional]
+    if unknown:
+        sys.exit(f"Not optional characters: {', '.join(unknown)}")
+
+    failed = False
+    for player_count in args.players:
+        if player_count not in PLAYER_CONFIGURATIONS:
+            sys.exit(f'Invalid player count: {player_count}. Must be between 5 and 10.')
+        try:
+            result = simulate(player_count, optional, args.games, args.seed, args.check,
+                              args.mix_optional)
+        except ValueError as e:
+            sys.exit(f'{player_count} players: {e}')
+        rate = result['games'] / result['seconds'] / 1e6
+        print(f"{player_count} players, optional: {', '.join(optional) or 'none'} "
+              f"({result['games']:,} games, {rate:.1f}M games/s)")
+        print(f"  {'role':<18} {'in play':>8} {'mean seen':>10}  sees k players")
+        for name, stats in result['roles'].items():
+            shares = '  '.join(f'{k}:{share:6.1%}' for k, share in enumerate(stats['seen']) if share)
+            print(f"  {name:<18} {stats['in_play']:>8.1%} {stats['mean_seen']:>10.2f}  {shares}")
+        if args.check:
+            print(f"  parity: {result['mismatches']} mismatched seats")
+            failed = failed or bool(result['mismatches'])
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
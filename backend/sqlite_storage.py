@@ -0,0 +1,880 @@
+"""
+SQLite storage backend for rooms and players.
+
+The database runs in WAL mode so any number of worker processes can share
+it: readers never block, and every mutation runs in its own
+BEGIN IMMEDIATE transaction, which keeps room-level operations atomic across
+processes. Functions mirror memory_storage exactly, returning Room and
+Player records built from the rows.
+"""
+import json
+import random
+import sqlite3
+import string
+import threading
+import time
+from contextlib import contextmanager
+
+from expiry import REAP_INTERVAL_SECONDS, ROOM_TTL_SECONDS
+from game_logic import (SelectionTally, deal_characters, get_character_reveals, get_room_reveals, is_unique_role,
+                        validate_character_selection)
+from records import Player, Room, intern_role, isoformat
+from room_deltas import CHANGE_LOG_LENGTH, collect_changes, diff_shapes, room_shape
+from room_directory import PAGE_SIZE, SCAN_LIMIT
+
+# Other processes can't notify us, so long-poll waiters re-read the version this often.
+WAIT_POLL_SECONDS = 0.25
+
+# Read-only requests refresh a player's activity at most this often, so
+# polling doesn't turn every read into a write transaction.
+TOUCH_INTERVAL_SECONDS = 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rooms (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    room_code TEXT NOT NULL UNIQUE,
+    host_player_id INTEGER,
+    status TEXT NOT NULL,
+    optional_characters TEXT NOT NULL,
+    created_at INTEGER NOT NULL,
+    version INTEGER NOT NULL,
+    last_active_at INTEGER NOT NULL,
+    expires_at INTEGER NOT NULL,
+    -- Room directory position: the status it is listed under, and its place
+    -- in that status, numbered in the order rooms entered it
+    listed_status TEXT NOT NULL,
+    listed_seq INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS rooms_expires_at ON rooms (expires_at);
+CREATE INDEX IF NOT EXISTS rooms_directory ON rooms (listed_status, listed_seq);
+
+CREATE TABLE IF NOT EXISTS players (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    room_id INTEGER NOT NULL REFERENCES rooms (id) ON DELETE CASCADE,
+    player_name TEXT NOT NULL,
+    character_role TEXT,
+    is_host INTEGER NOT NULL,
+    joined_at INTEGER NOT NULL,
+    last_active_at INTEGER NOT NULL,
+    reveal TEXT,
+    UNIQUE (room_id, player_name)
+);
+
+CREATE TABLE IF NOT EXISTS room_changes (
+    room_id INTEGER NOT NULL REFERENCES rooms (id) ON DELETE CASCADE,
+    version INTEGER NOT NULL,
+    ops TEXT,
+    shape TEXT NOT NULL,
+    PRIMARY KEY (room_id, version)
+);
+
+CREATE TABLE IF NOT EXISTS evictions (
+    reason TEXT PRIMARY KEY,
+    count INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS directory_seqs (
+    status TEXT PRIMARY KEY,
+    next_seq INTEGER NOT NULL
+);
+"""
+
+_path = None
+_local = threading.local()
+_reaper_thread = None
+
+# Called with the room code whenever this process deletes a room.
+room_removed_listeners = []
+
+# Called with the room code after this process commits a change to a room.
+room_changed_listeners = []
+
+
+def connect(path):
+    """Use the database at `path`, creating the schema if needed."""
+    global _path
+    _path = path
+    _local.__dict__.clear()
+    conn = _connection()
+    conn.execute('PRAGMA journal_mode=WAL')
+    _add_directory_columns(conn)
+    conn.executescript(SCHEMA)
+
+
+def _add_directory_columns(conn):
+    """
+    Give a database from before the room directory its listed_status and
+    listed_seq columns. Rooms are listed under their current status in the
+    order they were created.
+    """
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        columns = {row['name'] for row in conn.execute('PRAGMA table_info(rooms)')}
+        if columns and 'listed_status' not in columns:
+            conn.execute("ALTER TABLE rooms ADD COLUMN listed_status TEXT NOT NULL DEFAULT ''")
+            conn.execute('ALTER TABLE rooms ADD COLUMN listed_seq INTEGER NOT NULL DEFAULT 0')
+            conn.execute('UPDATE rooms SET listed_status = status, listed_seq = id')
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+    conn.execute('COMMIT')
+
+
+def _connection():
+    """This thread's connection. sqlite3 connections must not be shared across threads."""
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = sqlite3.connect(_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA foreign_keys=ON')
+        _local.conn = conn
+    return conn
+
+
+@contextmanager
+def _transaction():
+    """Run the block as one write transaction, taking the write lock up front."""
+    conn = _connection()
+    conn.execute('BEGIN IMMEDIATE')
+    _local.changed_rooms = []
+    try:
+        yield conn
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+    else:
+        conn.execute('COMMIT')
+        for room_code in _local.changed_rooms:
+            for listener in room_changed_listeners:
+                listener(room_code)
+
+
+def _player_from_row(row):
+    return Player(
+        id=row['id'],
+        room_id=row['room_id'],
+        player_name=row['player_name'],
+        character_role=intern_role(row['character_role']),
+        is_host=bool(row['is_host']),
+        joined_at=row['joined_at'],
+        last_active_at=row['last_active_at']
+    )
+
+
+def _room_from_row(conn, row):
+    player_ids = [r[0] for r in conn.execute('SELECT id FROM players WHERE room_id = ? ORDER BY id', (row['id'],))]
+    return Room(
+        id=row['id'],
+        room_code=row['room_code'],
+        host_player_id=row['host_player_id'],
+        status=row['status'],
+        optional_characters=tuple(intern_role(c) for c in json.loads(row['optional_characters'])),
+        created_at=row['created_at'],
+        player_ids=player_ids,
+        version=row['version'],
+        last_active_at=row['last_active_at']
+    )
+
+
+def _load_room(conn, room_code):
+    row = conn.execute('SELECT * FROM rooms WHERE room_code = ?', (room_code,)).fetchone()
+    return _room_from_row(conn, row) if row else None
+
+
+def _load_player(conn, player_id):
+    row = conn.execute('SELECT * FROM players WHERE id = ?', (player_id,)).fetchone()
+    return _player_from_row(row) if row else None
+
+
+def _load_players(conn, room_id):
+    rows = conn.execute('SELECT * FROM players WHERE room_id = ? ORDER BY id', (room_id,))
+    return [_player_from_row(row) for row in rows]
+
+
+def _expires_at(conn, room_id, status, now):
+    """Deadline for a room last active at `now`; empty rooms use the 'empty' TTL."""
+    has_players = conn.execute('SELECT 1 FROM players WHERE room_id = ? LIMIT 1', (room_id,)).fetchone()
+    return now + ROOM_TTL_SECONDS[status if has_players else 'empty']
+
+
+def _bump_version(conn, room_id):
+    """Mark a room as changed and push back its expiry. Every mutation must call this."""
+    now = int(time.time())
+    status, room_code, listed_status = conn.execute(
+        'SELECT status, room_code, listed_status FROM rooms WHERE id = ?', (room_id,)
+    ).fetchone()
+    _local.changed_rooms.append(room_code)
+    conn.execute(
+        'UPDATE rooms SET version = version + 1, last_active_at = ?, expires_at = ? WHERE id = ?',
+        (now, _expires_at(conn, room_id, status, now), room_id)
+    )
+    if listed_status != status:
+        conn.execute('UPDATE rooms SET listed_status = ?, listed_seq = ? WHERE id = ?',
+                     (status, _next_listed_seq(conn, status), room_id))
+    _log_change(conn, room_id)
+
+
+def _next_listed_seq(conn, status):
+    """
+    Directory position for a room entering `status`: after every room that
+    was ever there, so a cursor never skips a room that arrives later.
+    """
+    # A status without a counter yet starts after its live rooms, which
+    # matters for databases the directory columns were added to
+    conn.execute(
+        'INSERT INTO directory_seqs (status, next_seq) '
+        'SELECT ?, COALESCE(MAX(listed_seq), 0) + 1 FROM rooms WHERE listed_status = ? '
+        'ON CONFLICT (status) DO UPDATE SET next_seq = next_seq + 1',
+        (status, status)
+    )
+    return conn.execute('SELECT next_seq FROM directory_seqs WHERE status = ?', (status,)).fetchone()[0]
+
+
+def _log_change(conn, room_id):
+    """Append the room's current shape and its diff from the previous one to room_changes."""
+    room = _room_from_row(conn, conn.execute('SELECT * FROM rooms WHERE id = ?', (room_id,)).fetchone())
+    room_players = {player.id: player for player in _load_players(conn, room_id)}
+    shape = room_shape(room.status, room.host_player_id, room.optional_characters,
+                       [(pid, room_players[pid].character_role) for pid in room.player_ids])
+
+    previous = conn.execute(
+        'SELECT shape FROM room_changes WHERE room_id = ? ORDER BY version DESC LIMIT 1', (room_id,)
+    ).fetchone()
+    ops = None
+    if previous:
+        ops = json.dumps(diff_shapes(json.loads(previous[0]), shape, lambda pid: room_players[pid].to_dict()))
+
+    conn.execute('INSERT INTO room_changes (room_id, version, ops, shape) VALUES (?, ?, ?, ?)',
+                 (room_id, room.version, ops, json.dumps(shape)))
+    conn.execute('DELETE FROM room_changes WHERE room_id = ? AND version <= ?',
+                 (room_id, room.version - CHANGE_LOG_LENGTH))
+
+
+def reset():
+    """Drop all rooms and players. Used by benchmarks."""
+    with _transaction() as conn:
+        conn.execute('DELETE FROM room_changes')
+        conn.execute('DELETE FROM players')
+        conn.execute('DELETE FROM rooms')
+        conn.execute('DELETE FROM evictions')
+        conn.execute('DELETE FROM directory_seqs')
+
+
+def count_rooms():
+    """Number of live rooms."""
+    return _connection().execute('SELECT COUNT(*) FROM rooms').fetchone()[0]
+
+
+def get_room_stats():
+    """Live rooms by status and by player count, plus the number of live players."""
+    conn = _connection()
+    by_status = conn.execute('SELECT status, COUNT(*) FROM rooms GROUP BY status').fetchall()
+    by_player_count = conn.execute(
+        'SELECT player_count, COUNT(*) FROM ('
+        ' SELECT COUNT(players.id) AS player_count FROM rooms'
+        ' LEFT JOIN players ON players.room_id = rooms.id GROUP BY rooms.id'
+        ') GROUP BY player_count'
+    ).fetchall()
+    return {
+        'rooms_by_status': dict(by_status),
+        'rooms_by_player_count': dict(by_player_count),
+        'players': conn.execute('SELECT COUNT(*) FROM players').fetchone()[0]
+    }
+
+
+def add_room_removed_listener(listener):
+    """Call `listener(room_code)` whenever this process deletes a room."""
+    room_removed_listeners.append(listener)
+
+
+def add_room_changed_listener(listener):
+    """
+    Call `listener(room_code)` after this process commits a change to a room.
+
+    Changes committed by other processes are not reported; poll for those.
+    """
+    room_changed_listeners.append(listener)
+
+
+def reap_expired(now=None):
+    """
+    Evict every room whose TTL has passed.
+
+    Uses the index on expires_at, so cost is O(log n) per expired room.
+    Returns the number of rooms evicted.
+    """
+    if now is None:
+        now = int(time.time())
+
+    with _transaction() as conn:
+        expired = conn.execute(
+            'SELECT r.room_code, r.status, COUNT(p.id) AS player_count FROM rooms r '
+            'LEFT JOIN players p ON p.room_id = r.id WHERE r.expires_at <= ? GROUP BY r.id',
+            (now,)
+        ).fetchall()
+        for row in expired:
+            reason = row['status'] if row['player_count'] else 'empty'
+            conn.execute(
+                'INSERT INTO evictions (reason, count) VALUES (?, 1) '
+                'ON CONFLICT (reason) DO UPDATE SET count = count + 1',
+                (reason,)
+            )
+        conn.execute('DELETE FROM rooms WHERE expires_at <= ?', (now,))
+
+    for row in expired:
+        for listener in room_removed_listeners:
+            listener(row['room_code'])
+    return len(expired)
+
+
+def start_reaper(interval=None):
+    """Start the background thread that evicts idle rooms. Safe to call more than once."""
+    global _reaper_thread
+    if _reaper_thread and _reaper_thread.is_alive():
+        return
+
+    def run():
+        while True:
+            time.sleep(interval or REAP_INTERVAL_SECONDS)
+            reap_expired()
+
+    _reaper_thread = threading.Thread(target=run, name='room-reaper', daemon=True)
+    _reaper_thread.start()
+
+
+def get_expiry_stats():
+    """Eviction counters by reason plus the number of rooms awaiting expiry."""
+    conn = _connection()
+    evicted = {reason: 0 for reason in ROOM_TTL_SECONDS}
+    evicted.update(conn.execute('SELECT reason, count FROM evictions').fetchall())
+    return {
+        'evicted': evicted,
+        'scheduled': count_rooms()
+    }
+
+
+def touch_player(player_id):
+    """Record activity from a player without changing any state."""
+    now = int(time.time())
+    row = _connection().execute(
+        'SELECT room_id, last_active_at FROM players WHERE id = ?', (player_id,)
+    ).fetchone()
+    if not row or now - row['last_active_at'] < TOUCH_INTERVAL_SECONDS:
+        return
+
+    with _transaction() as conn:
+        conn.execute('UPDATE players SET last_active_at = ? WHERE id = ?', (now, player_id))
+        status = conn.execute('SELECT status FROM rooms WHERE id = ?', (row['room_id'],)).fetchone()
+        if status:
+            conn.execute(
+                'UPDATE rooms SET last_active_at = ?, expires_at = ? WHERE id = ?',
+                (now, _expires_at(conn, row['room_id'], status[0], now), row['room_id'])
+            )
+
+
+def create_room(player_name):
+    """Create a new room and add the creator as host."""
+    now = int(time.time())
+
+    with _transaction() as conn:
+        # The UNIQUE constraint on room_code rejects collisions
+        while True:
+            room_code = ''.join(random.choices(string.digits, k=6))
+            try:
+                room_id = conn.execute(
+                    'INSERT INTO rooms (room_code, status, optional_characters, created_at, version, '
+                    'last_active_at, expires_at, listed_status, listed_seq) VALUES (?, ?, ?, ?, 1, ?, ?, ?, ?)',
+                    (room_code, 'waiting', '[]', now, now,
+                     now + ROOM_TTL_SECONDS['waiting'], 'waiting', _next_listed_seq(conn, 'waiting'))
+                ).lastrowid
+                break
+            except sqlite3.IntegrityError:
+                continue
+
+        player_id = conn.execute(
+            'INSERT INTO players (room_id, player_name, character_role, is_host, joined_at, last_active_at) '
+            'VALUES (?, ?, NULL, 1, ?, ?)',
+            (room_id, player_name, now, now)
+        ).lastrowid
+        conn.execute('UPDATE rooms SET host_player_id = ? WHERE id = ?', (player_id, room_id))
+        _log_change(conn, room_id)
+
+        return _load_room(conn, room_code), _load_player(conn, player_id)
+
+
+def join_room(room_code, player_name):
+    """Join an existing room."""
+    with _transaction() as conn:
+        room = _load_room(conn, room_code)
+        if not room:
+            return None, None, 'Room not found'
+
+        if room.status == 'started':
+            return None, None, 'Game has already started'
+
+        # Check if player name is already taken
+        taken = conn.execute(
+            'SELECT 1 FROM players WHERE room_id = ? AND player_name = ?', (room.id, player_name)
+        ).fetchone()
+        if taken:
+            return None, None, 'Player name already taken in this room'
+
+        now = int(time.time())
+        player_id = conn.execute(
+            'INSERT INTO players (room_id, player_name, character_role, is_host, joined_at, last_active_at) '
+            'VALUES (?, ?, NULL, 0, ?, ?)',
+            (room.id, player_name, now, now)
+        ).lastrowid
+        _bump_version(conn, room.id)
+
+        return _load_room(conn, room_code), _load_player(conn, player_id), None
+
+
+def get_room(room_code):
+    """Get room by code."""
+    return _load_room(_connection(), room_code)
+
+
+def get_room_with_players(room_code, cleanup=False):
+    """Get the room and its full player list as one consistent API dict."""
+    conn = _connection()
+    conn.execute('BEGIN')
+    try:
+        room = _load_room(conn, room_code)
+        if not room:
+            return None
+        room_data = room.to_dict()
+        room_data['players'] = [player.to_dict() for player in _load_players(conn, room.id)]
+        return room_data
+    finally:
+        conn.execute('COMMIT')
+
+
+def get_room_changes(room_code, since):
+    """
+    Patch ops taking the room from version `since` to its current version.
+
+    Returns {'since', 'version', 'changes'}, or None if the room does not exist
+    or `since` is older than its change log.
+    """
+    conn = _connection()
+    conn.execute('BEGIN')
+    try:
+        room = conn.execute('SELECT id, version FROM rooms WHERE room_code = ?', (room_code,)).fetchone()
+        if not room:
+            return None
+        log = [
+            (row['version'], None if row['ops'] is None else json.loads(row['ops']))
+            for row in conn.execute(
+                'SELECT version, ops FROM room_changes WHERE room_id = ? ORDER BY version', (room['id'],)
+            )
+        ]
+        return collect_changes(log, since, room['version'])
+    finally:
+        conn.execute('COMMIT')
+
+
+def wait_for_change(room_code, since, timeout):
+    """
+    Block until the room's version is greater than `since` or `timeout` seconds pass.
+
+    Returns the room (changed or not), or None if the room does not exist or
+    is deleted while waiting.
+    """
+    conn = _connection()
+    row = conn.execute('SELECT id, version FROM rooms WHERE room_code = ?', (room_code,)).fetchone()
+    if not row:
+        return None
+
+    room_id = row['id']
+    deadline = time.monotonic() + timeout
+    while row['version'] <= since:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        time.sleep(min(WAIT_POLL_SECONDS, remaining))
+        row = conn.execute('SELECT id, version FROM rooms WHERE room_code = ?', (room_code,)).fetchone()
+        if not row or row['id'] != room_id:
+            return None
+
+    room = get_room(room_code)
+    return room if room and room.id == room_id else None
+
+
+def get_player(player_id):
+    """Get player by ID."""
+    return _load_player(_connection(), player_id)
+
+
+def configure_room(room_code, player_id, optional_characters):
+    """Configure optional characters for a room."""
+    with _transaction() as conn:
+        room = _load_room(conn, room_code)
+        if not room:
+            return None, 'Room not found'
+
+        if room.host_player_id != player_id:
+            return None, 'Only the host can configure the room'
+
+        if room.status != 'waiting':
+            return None, 'Cannot configure room after character selection has started'
+
+        conn.execute(
+            'UPDATE rooms SET optional_characters = ?, status = ? WHERE id = ?',
+            (json.dumps(optional_characters), 'character_selection', room.id)
+        )
+        _bump_version(conn, room.id)
+
+        return _load_room(conn, room_code), None
+
+
+def select_character(player_id, character):
+    """Player selects their character."""
+    with _transaction() as conn:
+        player = _load_player(conn, player_id)
+        if not player:
+            return None, 'Player not found'
+
+        room = conn.execute('SELECT id, status FROM rooms WHERE id = ?', (player.room_id,)).fetchone()
+        if not room:
+            return None, 'Room not found'
+
+        if room['status'] != 'character_selection':
+            return None, 'Character selection is not active'
+
+        # Unique characters can only be held by one player
+        if is_unique_role(character):
+            taken = conn.execute(
+                'SELECT 1 FROM players WHERE room_id = ? AND character_role = ? AND id != ?',
+                (room['id'], character, player_id)
+            ).fetchone()
+            if taken:
+                return None, 'Character already selected by another player'
+
+        conn.execute('UPDATE players SET character_role = ? WHERE id = ?', (character, player_id))
+        _bump_version(conn, room['id'])
+
+        player.character_role = intern_role(character)
+        return player, None
+
+
+def start_game(room_code, player_id):
+    """Start the game once the selection is complete and valid."""
+    with _transaction() as conn:
+        room = _load_room(conn, room_code)
+        if not room:
+            return None, 'Room not found'
+
+        if room.host_player_id != player_id:
+            return None, 'Only the host can start the game'
+
+        if room.status != 'character_selection':
+            return None, 'Cannot start game from current state'
+
+        # Check all players have selected characters
+        room_players = _load_players(conn, room.id)
+        for player in room_players:
+            if player.character_role is None:
+                return None, 'All players must select a character first'
+
+        roles = [{'character_role': player.character_role} for player in room_players]
+        is_valid, error = validate_character_selection(roles, room.optional_characters)
+        if not is_valid:
+            return None, error
+
+        conn.execute('UPDATE rooms SET status = ? WHERE id = ?', ('started', room.id))
+        _store_reveals(conn, room_players)
+        _bump_version(conn, room.id)
+
+        return _load_room(conn, room_code), None
+
+
+def deal_game(room_code, player_id, optional_characters=None):
+    """
+    Deal every player a random role and start the game in one step (host
+    only). Uses `optional_characters` if given, else the room's own.
+    """
+    with _transaction() as conn:
+        room = _load_room(conn, room_code)
+        if not room:
+            return None, 'Room not found'
+
+        if room.host_player_id != player_id:
+            return None, 'Only the host can deal characters'
+
+        if room.status not in ('waiting', 'character_selection'):
+            return None, 'Cannot deal characters from current state'
+
+        if optional_characters is None:
+            optional_characters = list(room.optional_characters)
+        room_players = _load_players(conn, room.id)
+        roles, error = deal_characters(len(room_players), optional_characters)
+        if error:
+            return None, error
+
+        # A deal must pass the same rules a hand-picked selection does
+        is_valid, error = validate_character_selection(
+            [{'character_role': role} for role in roles], optional_characters)
+        if not is_valid:
+            return None, error
+
+        conn.executemany('UPDATE players SET character_role = ? WHERE id = ?',
+                         [(role, player.id) for player, role in zip(room_players, roles)])
+        conn.execute(
+            'UPDATE rooms SET optional_characters = ?, status = ? WHERE id = ?',
+            (json.dumps(list(optional_characters)), 'started', room.id)
+        )
+        for player, role in zip(room_players, roles):
+            player.character_role = intern_role(role)
+        _store_reveals(conn, room_players)
+        _bump_version(conn, room.id)
+
+        return _load_room(conn, room_code), None
+
+
+def _store_reveals(conn, room_players):
+    """Compute every player's reveal once and keep it on their row."""
+    all_players = [{'player_name': p.player_name, 'character_role': p.character_role} for p in room_players]
+    conn.executemany('UPDATE players SET reveal = ? WHERE id = ?', [
+        (json.dumps(reveal), p.id) for p, reveal in zip(room_players, get_room_reveals(all_players))
+    ])
+
+
+def get_reveal(player_id):
+    """Get what a player's character knows once the game has started."""
+    query = ('SELECT p.character_role, p.reveal, r.status FROM players p '
+             'LEFT JOIN rooms r ON r.id = p.room_id WHERE p.id = ?')
+    row = _connection().execute(query, (player_id,)).fetchone()
+    if not row:
+        return None, 'Player not found'
+
+    # Reveals are cleared whenever the game leaves 'started', so a hit needs no checks
+    if row['reveal']:
+        return json.loads(row['reveal']), None
+
+    if row['status'] is None:
+        return None, 'Room not found'
+
+    if row['status'] != 'started':
+        return None, 'Game has not started yet'
+
+    if not row['character_role']:
+        return None, 'Player has not selected a character'
+
+    # Someone was kicked or left after the start; recompute for whoever remains
+    with _transaction() as conn:
+        room_id = conn.execute('SELECT room_id FROM players WHERE id = ?', (player_id,)).fetchone()
+        if not room_id:
+            return None, 'Player not found'
+        _store_reveals(conn, _load_players(conn, room_id[0]))
+        return json.loads(conn.execute('SELECT reveal FROM players WHERE id = ?', (player_id,)).fetchone()[0]), None
+
+
+def get_session(player_id):
+    """
+    Everything one player's client needs, read in a single transaction.
+
+    Returns (session, error). The session holds the room as an API dict with
+    its players, the player's own API dict, their reveal once the game has
+    started (None before that) and the Good and Evil slots still open.
+    """
+    conn = _connection()
+    conn.execute('BEGIN')
+    try:
+        row = conn.execute('SELECT * FROM players WHERE id = ?', (player_id,)).fetchone()
+        if not row:
+            return None, 'Player not found'
+
+        room_row = conn.execute('SELECT * FROM rooms WHERE id = ?', (row['room_id'],)).fetchone()
+        if not room_row:
+            return None, 'Player not found'
+
+        room = _room_from_row(conn, room_row)
+        room_players = _load_players(conn, room.id)
+        room_data = room.to_dict()
+        room_data['players'] = [p.to_dict() for p in room_players]
+
+        reveal = None
+        if room.status == 'started':
+            if row['reveal']:
+                reveal = json.loads(row['reveal'])
+            else:
+                # Reveals were dropped by a kick or leave; derive from this snapshot
+                all_players = [{'player_name': p.player_name, 'character_role': p.character_role}
+                               for p in room_players]
+                reveal = get_character_reveals(row['character_role'], all_players)
+
+        tally = SelectionTally([p.character_role for p in room_players])
+        return {
+            'room': room_data,
+            'player': _player_from_row(row).to_dict(),
+            'reveals': reveal,
+            'selected_characters': tally.selected_characters(),
+            'remaining_slots': tally.remaining_slots()
+        }, None
+    finally:
+        conn.execute('COMMIT')
+
+
+def get_selection(room_code):
+    """
+    The room's role selection so far: every role held, in role order, and
+    the Good and Evil slots still open. None if the room doesn't exist.
+    """
+    conn = _connection()
+    rows = conn.execute(
+        'SELECT p.character_role, COUNT(p.id) AS n FROM rooms r LEFT JOIN players p ON p.room_id = r.id '
+        'WHERE r.room_code = ? GROUP BY p.character_role', (room_code,)
+    ).fetchall()
+    if not rows:
+        return None
+    tally = SelectionTally()
+    for row in rows:
+        for _ in range(row['n']):
+            tally.add(row['character_role'])
+    return {'selected_characters': tally.selected_characters(), 'remaining_slots': tally.remaining_slots()}
+
+
+def list_rooms(status, min_players=1, cursor=0, limit=PAGE_SIZE):
+    """
+    A page of the public room directory: rooms in `status` with at least
+    `min_players` players, in the order they entered that status. `cursor`
+    is the previous page's next_cursor, or 0 for the first page.
+    """
+    conn = _connection()
+    rows = conn.execute(
+        'SELECT r.room_code, r.status, r.created_at, r.listed_seq, '
+        '(SELECT COUNT(*) FROM players p WHERE p.room_id = r.id) AS player_count, '
+        '(SELECT player_name FROM players h WHERE h.id = r.host_player_id) AS host_name '
+        'FROM rooms r WHERE r.listed_status = ? AND r.listed_seq > ? ORDER BY r.listed_seq LIMIT ?',
+        (status, cursor, SCAN_LIMIT)
+    )
+    listed = []
+    last_seq = cursor
+    for row in rows:
+        last_seq = row['listed_seq']
+        if row['player_count'] >= min_players:
+            listed.append({
+                'room_code': row['room_code'],
+                'status': row['status'],
+                'player_count': row['player_count'],
+                'host_name': row['host_name'],
+                'created_at': isoformat(row['created_at'])
+            })
+            if len(listed) == limit:
+                break
+    rows.close()
+
+    more = conn.execute('SELECT 1 FROM rooms WHERE listed_status = ? AND listed_seq > ? LIMIT 1',
+                        (status, last_seq)).fetchone()
+    return {'rooms': listed, 'next_cursor': last_seq if more else None}
+
+
+def get_players_in_room(room_code):
+    """Get all players in a room."""
+    conn = _connection()
+    row = conn.execute('SELECT id FROM rooms WHERE room_code = ?', (room_code,)).fetchone()
+    if not row:
+        return []
+
+    return _load_players(conn, row['id'])
+
+
+def get_room_by_player_id(player_id):
+    """Get the room a player is in."""
+    conn = _connection()
+    row = conn.execute(
+        'SELECT r.* FROM rooms r JOIN players p ON p.room_id = r.id WHERE p.id = ?', (player_id,)
+    ).fetchone()
+    return _room_from_row(conn, row) if row else None
+
+
+def get_room_by_id(room_id):
+    """Get room by its numeric ID."""
+    conn = _connection()
+    row = conn.execute('SELECT * FROM rooms WHERE id = ?', (room_id,)).fetchone()
+    return _room_from_row(conn, row) if row else None
+
+
+def reset_game(room_code, player_id):
+    """Reset game back to character selection (host only)."""
+    with _transaction() as conn:
+        room = _load_room(conn, room_code)
+        if not room:
+            return None, 'Room not found'
+
+        if room.host_player_id != player_id:
+            return None, 'Only the host can reset the game'
+
+        # Clear all player character selections and return to character selection
+        conn.execute('UPDATE players SET character_role = NULL, reveal = NULL WHERE room_id = ?', (room.id,))
+        conn.execute('UPDATE rooms SET status = ? WHERE id = ?', ('character_selection', room.id))
+        _bump_version(conn, room.id)
+
+        return _load_room(conn, room_code), None
+
+
+def kick_player(room_code, host_player_id, player_id_to_kick):
+    """Kick a player from the room (host only)."""
+    with _transaction() as conn:
+        room = _load_room(conn, room_code)
+        if not room:
+            return None, 'Room not found'
+
+        if room.host_player_id != host_player_id:
+            return None, 'Only the host can kick players'
+
+        if player_id_to_kick == host_player_id:
+            return None, 'Cannot kick yourself'
+
+        if player_id_to_kick not in room.player_ids:
+            return None, 'Player not in this room'
+
+        conn.execute('DELETE FROM players WHERE id = ?', (player_id_to_kick,))
+        conn.execute('UPDATE players SET reveal = NULL WHERE room_id = ?', (room.id,))
+        _bump_version(conn, room.id)
+
+        return _load_room(conn, room_code), None
+
+
+def leave_room(room_code, player_id):
+    """Player leaves the room. Reassigns host if needed."""
+    with _transaction() as conn:
+        room = _load_room(conn, room_code)
+        if not room:
+            return None, 'Room not found'
+
+        if player_id not in room.player_ids:
+            return None, 'Player not in this room'
+
+        conn.execute('DELETE FROM players WHERE id = ?', (player_id,))
+        conn.execute('UPDATE players SET reveal = NULL WHERE room_id = ?', (room.id,))
+
+        # If host left, assign new host to first remaining player
+        remaining = [pid for pid in room.player_ids if pid != player_id]
+        if room.host_player_id == player_id and remaining:
+            new_host_id = remaining[0]
+            conn.execute('UPDATE rooms SET host_player_id = ? WHERE id = ?', (new_host_id, room.id))
+            conn.execute('UPDATE players SET is_host = 1 WHERE id = ?', (new_host_id,))
+
+        _bump_version(conn, room.id)
+        return _load_room(conn, room_code), None
+
+
+def back_to_lobby(room_code, player_id):
+    """Go back to lobby/waiting stage (host only)."""
+    with _transaction() as conn:
+        room = _load_room(conn, room_code)
+        if not room:
+            return None, 'Room not found'
+
+        if room.host_player_id != player_id:
+            return None, 'Only the host can change room status'
+
+        # Clear all player character selections and return to waiting
+        conn.execute('UPDATE players SET character_role = NULL, reveal = NULL WHERE room_id = ?', (room.id,))
+        conn.execute('UPDATE rooms SET status = ? WHERE id = ?', ('waiting', room.id))
+        _bump_version(conn, room.id)
+
+        return _load_room(conn, room_code), None
@@ -1,5 +1,5 @@
 import React, { useState, useEffect, useCallback } from 'react';
-import { getRoom, getAvailableCharacters, selectCharacter, startGame, kickPlayer, backToLobby } from '../services/api';
+import { getSession, selectCharacter, startGame, dealGame, kickPlayer, backToLobby, subscribeToRoom } from '../services/api';
 
 function CharacterSelection({ navigateTo, sessionData, clearSession }) {
   const { roomCode, playerId, playerName, isHost } = sessionData;
@@ -13,10 +13,14 @@ function CharacterSelection({ navigateTo, sessionData, clearSession }) {
 
   const fetchData = useCallback(async () => {
     try {
-      const [roomData, charsData] = await Promise.all([
-        getRoom(roomCode, playerId),
-        getAvailableCharacters(roomCode)
-      ]);
+      // One request returns the room and the character pool from the same read
+      const session = await getSession(playerId);
+      const roomData = { room: session.room };
+      const charsData = {
+        available_characters: session.available_characters,
+        selected_characters: session.selected_characters,
+        remaining_slots: session.remaining_slots
+      };
 
       // Clear any previous errors on successful fetch
       setError('');
@@ -61,20 +65,24 @@ function CharacterSelection({ navigateTo, sessionData, clearSession }) {
 
       setLoading(false);
     } catch (err) {
+      // The player no longer exists, e.g. they were kicked
+      if (err.response?.status === 404) {
+        clearSession();
+        return;
+      }
       setError(err.response?.data?.error || 'Failed to fetch data');
       setLoading(false);
     }
-  }, [roomCode, playerId, navigateTo, clearSession]);
+  }, [playerId, navigateTo, clearSession]);
 
   useEffect(() => {
     if (!roomCode) {
       navigateTo('home');
       return;
     }
-    fetchData();
-    const interval = setInterval(fetchData, 2000);
-    return () => clearInterval(interval);
-  }, [roomCode, navigateTo, fetchData]);
+    // Every room change can affect the character pool, so refetch both on each event
+    return subscribeToRoom(roomCode, () => fetchData(), clearSession);
+  }, [roomCode, navigateTo, fetchData, clearSession]);
 
   // Initialize picker value when characters load and no selection has been made
   useEffect(() => {
@@ -123,6 +131,19 @@ function CharacterSelection({ navigateTo, sessionData, clearSession }) {
     }
   };
 
+  const handleDealGame = async () => {
+    setLoading(true);
+    setError('');
+
+    try {
+      await dealGame(roomCode, playerId);
+      navigateTo('reveal');
+    } catch (err) {
+      setError(err.response?.data?.error || 'Failed to deal characters');
+      setLoading(false);
+    }
+  };
+
   const handleKick = async (playerIdToKick) => {
     try {
       await kickPlayer(roomCode, playerId, playerIdToKick);
@@ -269,6 +290,9 @@ function CharacterSelection({ navigateTo, sessionData, clearSession }) {
         <div className="card">
           <p className="info-text">
             Need {availableCharacters?.available_characters?.good_count} Good, {availableCharacters?.available_characters?.evil_count} Evil
+            {availableCharacters?.remaining_slots && (
+              ` (${availableCharacters.remaining_slots.good} Good, ${availableCharacters.remaining_slots.evil} Evil still open)`
+            )}
           </p>
 
           <div className="wheel-picker-container">
@@ -343,6 +367,17 @@ function CharacterSelection({ navigateTo, sessionData, clearSession }) {
           </button>
         )}
 
+        {isHost && (
+          <button
+            className="button button-primary"
+            onClick={handleDealGame}
+            disabled={loading}
+            style={{ marginTop: '16px' }}
+          >
+            Deal Random Characters
+          </button>
+        )}
+
         {!isHost && !allPlayersReady() && (
           <p className="info-text">
             Waiting for all players to select characters...
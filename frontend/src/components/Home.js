@@ -1,5 +1,5 @@
-import React, { useState } from 'react';
-import { createRoom, joinRoom } from '../services/api';
+import React, { useCallback, useEffect, useState } from 'react';
+import { createRoom, joinRoom, listRooms } from '../services/api';
 
 function Home({ navigateTo }) {
   const [playerName, setPlayerName] = useState('');
@@ -7,6 +7,24 @@ function Home({ navigateTo }) {
   const [mode, setMode] = useState(null);
   const [error, setError] = useState('');
   const [loading, setLoading] = useState(false);
+  const [openRooms, setOpenRooms] = useState([]);
+  const [roomsCursor, setRoomsCursor] = useState(null);
+
+  const loadOpenRooms = useCallback(async (cursor = null) => {
+    try {
+      const data = await listRooms('waiting', cursor);
+      setOpenRooms((rooms) => (cursor ? [...rooms, ...data.rooms] : data.rooms));
+      setRoomsCursor(data.next_cursor);
+    } catch (err) {
+      // The directory is a convenience; typing a code still works without it
+    }
+  }, []);
+
+  useEffect(() => {
+    if (mode === 'join') {
+      loadOpenRooms();
+    }
+  }, [mode, loadOpenRooms]);
 
   const handleCreateRoom = async (e) => {
     e.preventDefault();
@@ -185,6 +203,33 @@ function Home({ navigateTo }) {
               {loading ? 'Joining...' : 'Join Room'}
             </button>
 
+            {openRooms.length > 0 && (
+              <div className="input-group">
+                <label>Open Rooms</label>
+                {openRooms.map((room) => (
+                  <button
+                    type="button"
+                    key={room.room_code}
+                    className="button button-secondary"
+                    onClick={() => setRoomCode(room.room_code)}
+                    disabled={loading}
+                  >
+                    {room.room_code} - {room.host_name}'s room ({room.player_count} players)
+                  </button>
+                ))}
+                {roomsCursor && (
+                  <button
+                    type="button"
+                    className="button button-secondary"
+                    onClick={() => loadOpenRooms(roomsCursor)}
+                    disabled={loading}
+                  >
+                    More Rooms
+                  </button>
+                )}
+              </div>
+            )}
+
             <button
               type="button"
               className="button button-secondary"
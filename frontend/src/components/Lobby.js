@@ -1,5 +1,5 @@
 import React, { useState, useEffect, useCallback } from 'react';
-import { getRoom, configureRoom, kickPlayer } from '../services/api';
+import { getRoom, configureRoom, kickPlayer, subscribeToRoom } from '../services/api';
 
 function Lobby({ navigateTo, sessionData, clearSession }) {
   const { roomCode, playerId, isHost } = sessionData;
@@ -15,41 +15,42 @@ function Lobby({ navigateTo, sessionData, clearSession }) {
     { name: 'Morgana', description: 'Appears as Merlin to Percival (Evil)' }
   ];
 
-  const fetchRoom = useCallback(async () => {
-    try {
-      const data = await getRoom(roomCode, playerId);
+  const handleRoom = useCallback((nextRoom) => {
+    // Check if current player was kicked
+    const currentPlayerInRoom = nextRoom.players.find(p => p.id === playerId);
+    if (!currentPlayerInRoom) {
+      clearSession();
+      return;
+    }
 
-      // Check if current player was kicked
-      const currentPlayerInRoom = data.room.players.find(p => p.id === playerId);
-      if (!currentPlayerInRoom) {
-        clearSession();
-        return;
-      }
+    setRoom(nextRoom);
+    setLoading(false);
 
-      setRoom(data.room);
-      setLoading(false);
+    // Navigate to character selection if status changed
+    if (nextRoom.status === 'character_selection') {
+      navigateTo('characters');
+    } else if (nextRoom.status === 'started') {
+      navigateTo('reveal');
+    }
+  }, [playerId, navigateTo, clearSession]);
 
-      // Navigate to character selection if status changed
-      if (data.room.status === 'character_selection') {
-        navigateTo('characters');
-      } else if (data.room.status === 'started') {
-        navigateTo('reveal');
-      }
+  const fetchRoom = useCallback(async () => {
+    try {
+      const data = await getRoom(roomCode, playerId);
+      handleRoom(data.room);
     } catch (err) {
       setError(err.response?.data?.error || 'Failed to fetch room');
       setLoading(false);
     }
-  }, [roomCode, playerId, navigateTo, clearSession]);
+  }, [roomCode, playerId, handleRoom]);
 
   useEffect(() => {
     if (!roomCode) {
       navigateTo('home');
       return;
     }
-    fetchRoom();
-    const interval = setInterval(fetchRoom, 2000);
-    return () => clearInterval(interval);
-  }, [roomCode, navigateTo, fetchRoom]);
+    return subscribeToRoom(roomCode, handleRoom, clearSession);
+  }, [roomCode, navigateTo, handleRoom, clearSession]);
 
   const handleToggleCharacter = (characterName) => {
     setOptionalCharacters(prev =>
@@ -1,5 +1,5 @@
 import React, { useState, useEffect, useCallback } from 'react';
-import { getPlayerReveal, resetGame, getRoom } from '../services/api';
+import { getPlayerReveal, resetGame, subscribeToRoom } from '../services/api';
 
 function Reveal({ navigateTo, sessionData, clearSession }) {
   const { playerId, playerName, roomCode, isHost } = sessionData;
@@ -24,17 +24,12 @@ function Reveal({ navigateTo, sessionData, clearSession }) {
     }
   }, [playerId, navigateTo]);
 
-  // Poll for game reset (non-host players)
-  const checkGameStatus = useCallback(async () => {
-    try {
-      const data = await getRoom(roomCode, playerId);
-      if (data.room.status === 'character_selection') {
-        navigateTo('characters');
-      }
-    } catch (err) {
-      // Ignore errors
+  // Watch for game reset (non-host players)
+  const checkGameStatus = useCallback((room) => {
+    if (room.status === 'character_selection') {
+      navigateTo('characters');
     }
-  }, [roomCode, playerId, navigateTo]);
+  }, [navigateTo]);
 
   useEffect(() => {
     if (!playerId) {
@@ -43,10 +38,8 @@ function Reveal({ navigateTo, sessionData, clearSession }) {
     }
     fetchReveal();
 
-    // Poll for game reset every 2 seconds
-    const interval = setInterval(checkGameStatus, 2000);
-    return () => clearInterval(interval);
-  }, [playerId, navigateTo, fetchReveal, checkGameStatus]);
+    return subscribeToRoom(roomCode, checkGameStatus);
+  }, [playerId, roomCode, navigateTo, fetchReveal, checkGameStatus]);
 
   const handleReveal = () => {
     setIsRevealed(true);
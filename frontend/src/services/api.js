@@ -9,13 +9,47 @@ const api = axios.create({
   },
 });
 
+// Mutations carry an Idempotency-Key, the same on every retry, so a retry
+// after a dropped connection gets the server's first answer instead of
+// creating a second room or failing a join that already went through.
+const MUTATION_RETRIES = 2;
+
+const newIdempotencyKey = () => (
+  window.crypto?.randomUUID
+    ? window.crypto.randomUUID()
+    : `${Date.now()}-${Math.random().toString(36).slice(2)}`
+);
+
+const postMutation = async (url, body) => {
+  const headers = { 'Idempotency-Key': newIdempotencyKey() };
+  for (let attempt = 0; ; attempt += 1) {
+    try {
+      return await api.post(url, body, { headers });
+    } catch (err) {
+      // Retry when no response arrived, or the first attempt is still running
+      const retryable = !err.response || err.response.status === 409;
+      if (!retryable || attempt >= MUTATION_RETRIES) throw err;
+      await new Promise((resolve) => setTimeout(resolve, 500 * (attempt + 1)));
+    }
+  }
+};
+
 export const createRoom = async (playerName) => {
-  const response = await api.post('/rooms', { player_name: playerName });
+  const response = await postMutation('/rooms', { player_name: playerName });
   return response.data;
 };
 
 export const joinRoom = async (roomCode, playerName) => {
-  const response = await api.post(`/rooms/${roomCode}/join`, { player_name: playerName });
+  const response = await postMutation(`/rooms/${roomCode}/join`, { player_name: playerName });
+  return response.data;
+};
+
+// One page of the public room directory. Pass the previous page's
+// next_cursor to continue; next_cursor is null on the last page.
+export const listRooms = async (status = 'waiting', cursor = null, minPlayers = 1) => {
+  const params = { status, min_players: minPlayers };
+  if (cursor) params.cursor = cursor;
+  const response = await api.get('/rooms', { params });
   return response.data;
 };
 
@@ -25,8 +59,24 @@ export const getRoom = async (roomCode, playerId = null) => {
   return response.data;
 };
 
+// Subscribe to server-sent room updates. `onRoom` is called with the full room
+// on connect and after every change. Returns a function that closes the stream.
+export const subscribeToRoom = (roomCode, onRoom, onGone) => {
+  const source = new EventSource(`${API_URL}/api/rooms/${roomCode}/events`);
+  const handleRoom = (event) => onRoom(JSON.parse(event.data).room);
+
+  source.addEventListener('snapshot', handleRoom);
+  source.addEventListener('change', handleRoom);
+  source.addEventListener('gone', () => {
+    source.close();
+    if (onGone) onGone();
+  });
+
+  return () => source.close();
+};
+
 export const configureRoom = async (roomCode, playerId, optionalCharacters) => {
-  const response = await api.post(`/rooms/${roomCode}/configure`, {
+  const response = await postMutation(`/rooms/${roomCode}/configure`, {
     player_id: playerId,
     optional_characters: optionalCharacters,
   });
@@ -38,13 +88,23 @@ export const getAvailableCharacters = async (roomCode) => {
   return response.data;
 };
 
+export const getSession = async (playerId) => {
+  const response = await api.get(`/players/${playerId}/session`);
+  return response.data;
+};
+
 export const selectCharacter = async (playerId, character) => {
-  const response = await api.post(`/players/${playerId}/select-character`, { character });
+  const response = await postMutation(`/players/${playerId}/select-character`, { character });
   return response.data;
 };
 
 export const startGame = async (roomCode, playerId) => {
-  const response = await api.post(`/rooms/${roomCode}/start`, { player_id: playerId });
+  const response = await postMutation(`/rooms/${roomCode}/start`, { player_id: playerId });
+  return response.data;
+};
+
+export const dealGame = async (roomCode, playerId) => {
+  const response = await postMutation(`/rooms/${roomCode}/deal`, { player_id: playerId });
   return response.data;
 };
 
@@ -54,12 +114,12 @@ export const getPlayerReveal = async (playerId) => {
 };
 
 export const resetGame = async (roomCode, playerId) => {
-  const response = await api.post(`/rooms/${roomCode}/reset`, { player_id: playerId });
+  const response = await postMutation(`/rooms/${roomCode}/reset`, { player_id: playerId });
   return response.data;
 };
 
 export const kickPlayer = async (roomCode, playerId, kickPlayerId) => {
-  const response = await api.post(`/rooms/${roomCode}/kick`, {
+  const response = await postMutation(`/rooms/${roomCode}/kick`, {
     player_id: playerId,
     kick_player_id: kickPlayerId
   });
@@ -67,12 +127,12 @@ export const kickPlayer = async (roomCode, playerId, kickPlayerId) => {
 };
 
 export const backToLobby = async (roomCode, playerId) => {
-  const response = await api.post(`/rooms/${roomCode}/back-to-lobby`, { player_id: playerId });
+  const response = await postMutation(`/rooms/${roomCode}/back-to-lobby`, { player_id: playerId });
   return response.data;
 };
 
 export const leaveRoom = async (roomCode, playerId) => {
-  const response = await api.post(`/rooms/${roomCode}/leave`, { player_id: playerId });
+  const response = await postMutation(`/rooms/${roomCode}/leave`, { player_id: playerId });
   return response.data;
 };
 